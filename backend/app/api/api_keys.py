@@ -9,7 +9,8 @@ from app.api.dependencies import get_current_user
 from app.schemas.api_key import (
     APIKeyCreate,
     APIKeyUpdate,
-    APIKeyResponse
+    APIKeyResponse,
+    APIKeyUsageStats
 )
 from app.services.api_key_service import APIKeyService
 
@@ -65,6 +66,25 @@ async def get_api_key(
     return APIKeyResponse.model_validate(api_key)
 
 
+@router.get("/{key_id}/usage", response_model=APIKeyUsageStats)
+async def get_api_key_usage(
+    key_id: UUID,
+    current_user: Any = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get metered calls, tokens and estimated cost of an API key"""
+    service = APIKeyService(db)
+    api_key = await service.get_api_key_by_id(key_id, current_user.id)
+
+    if not api_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
+
+    return await service.get_usage_stats(api_key)
+
+
 @router.patch("/{key_id}", response_model=APIKeyResponse)
 async def update_api_key(
     key_id: UUID,
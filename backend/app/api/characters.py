@@ -21,13 +21,14 @@ from app.schemas.character import (
     CharacterListItem
 )
 from app.services.character_service import CharacterService
+from app.services.character_embeddings import get_character_embedding_store
 from app.services.embedding_service import (
     get_embedding_service,
-    build_character_text,
-    build_topic_text,
-    compute_weighted_score
+    build_topic_text
 )
 from app.models.character import Character
+from app.services.participant_roster import ParticipantRosterService
+from app.core.redis import get_cache_service
 
 
 router = APIRouter(prefix="/api/characters", tags=["Characters"])
@@ -160,6 +161,10 @@ async def update_character(
             detail="Character not found"
         )
 
+    # Name/avatar may have changed; drop rosters of discussions using it
+    roster = ParticipantRosterService(await get_cache_service())
+    await roster.invalidate_for_character(db, character_id)
+
     return CharacterResponse.model_validate(character)
 
 
@@ -171,6 +176,11 @@ async def delete_character(
 ):
     """Delete a custom character"""
     service = CharacterService(db)
+
+    # Participants are removed with the character, so look them up first
+    roster = ParticipantRosterService(await get_cache_service())
+    await roster.invalidate_for_character(db, character_id)
+
     try:
         success = await service.delete_character(character_id, current_user.id)
     except ValueError as e:
@@ -223,92 +233,44 @@ async def recommend_characters(
         topic_text = build_topic_text(topic, enhanced=True)
         topic_embedding = await embedding_service.encode_text(topic_text)
 
-        # Fetch all template characters
-        result = await db.execute(
-            select(Character).where(Character.is_template == True)
+        # Score all template characters in the in-memory index (vectors,
+        # usage and rating columns) and keep the top N
+        ranked = await get_character_embedding_store().recommend(
+            db,
+            topic_embedding,
+            count,
+            weights={"similarity": 0.7, "usage_count": 0.2, "rating": 0.1}
         )
-        characters = result.scalars().all()
-
-        if not characters:
+        if not ranked:
             return []
+        logger.info(f"Top {len(ranked)} similarities: {[round(sim, 4) for _, _, sim in ranked]}")
 
-        # Build character texts
-        character_dicts = []
-        for char in characters:
-            char_dict = {
-                "id": str(char.id),
-                "name": char.name,
-                "config": char.config,
-                "avatar_url": char.avatar_url,
-                "is_template": char.is_template,
-                "is_public": char.is_public,
-                "usage_count": char.usage_count or 0,
-                "rating_avg": char.rating_avg or 0.0,
-                "rating_count": char.rating_count or 0
-            }
-            character_dicts.append(char_dict)
-
-        # Build character texts for embedding (using enhanced mode)
-        character_texts = [build_character_text(c, enhanced=True) for c in character_dicts]
-
-        # Encode all characters in batch
-        character_embeddings = await embedding_service.encode_texts_batch(character_texts)
-
-        # Debug: log embedding dimensions
-        logger.info(f"Topic embedding shape: {topic_embedding.shape}")
-        logger.info(f"Character embeddings shape: {character_embeddings.shape}")
-        logger.info(f"Service embedding_dim: {embedding_service.embedding_dim}")
-
-        # Compute semantic similarities
-        similarities = embedding_service.compute_similarities(
-            topic_embedding,
-            character_embeddings
+        # Load only the recommended characters
+        result = await db.execute(
+            select(Character).where(Character.id.in_([character_id for character_id, _, _ in ranked]))
         )
-
-        # Debug: log similarity stats
-        logger.info(f"Similarities computed: {len(similarities)} values")
-        logger.info(f"Similarity range: [{similarities.min():.4f}, {similarities.max():.4f}]")
-        logger.info(f"Top 5 similarities: {sorted(similarities, reverse=True)[:5]}")
-
-        # Compute weighted scores (semantic similarity + popularity + rating)
-        weighted_scores = []
-        for i, char_dict in enumerate(character_dicts):
-            semantic_sim = float(similarities[i])
-            weighted_score = compute_weighted_score(
-                semantic_sim,
-                char_dict,
-                weights={"similarity": 0.7, "usage_count": 0.2, "rating": 0.1}
-            )
-            weighted_scores.append((i, weighted_score, semantic_sim))
-
-        # Sort by weighted score (descending)
-        weighted_scores.sort(key=lambda x: x[1], reverse=True)
-
-        # Get top N characters
-        recommended_characters = []
-        for idx, weighted_score, semantic_sim in weighted_scores[:count]:
-            char_dict = character_dicts[idx].copy()
-            char_dict["similarity_score"] = semantic_sim
-            char_dict["weighted_score"] = weighted_score
-            recommended_characters.append(char_dict)
-
-        # Convert to response models
-        return [
-            CharacterListItem(
-                id=UUID(char["id"]),
-                name=char["name"],
-                avatar_url=char.get("avatar_url"),
-                is_template=char["is_template"],
-                is_public=char["is_public"],
-                config=char["config"],
-                usage_count=char["usage_count"],
-                rating_avg=char["rating_avg"],
-                rating_count=char["rating_count"],
-                similarity_score=float(char["similarity_score"]) if char.get("similarity_score") is not None else None,
-                weighted_score=float(char["weighted_score"]) if char.get("weighted_score") is not None else None
-            )
-            for char in recommended_characters
-        ]
+        characters = {char.id: char for char in result.scalars().all()}
+
+        # Convert to response models (in ranked order)
+        recommended = []
+        for character_id, weighted_score, semantic_sim in ranked:
+            char = characters.get(character_id)
+            if char is None:
+                continue  # Deleted since the index was loaded
+            recommended.append(CharacterListItem(
+                id=char.id,
+                name=char.name,
+                avatar_url=char.avatar_url,
+                is_template=char.is_template,
+                is_public=char.is_public,
+                config=char.config,
+                usage_count=char.usage_count or 0,
+                rating_avg=char.rating_avg or 0.0,
+                rating_count=char.rating_count or 0,
+                similarity_score=semantic_sim,
+                weighted_score=weighted_score
+            ))
+        return recommended
 
     except Exception as e:
         import traceback
@@ -27,14 +27,19 @@ async def get_current_user(
     2. 如果 Keycloak 验证失败，回退到本地 JWT
     3. 从数据库加载用户信息
     """
+    return await authenticate_token(credentials.credentials, db)
+
+
+async def authenticate_token(token: str, db: AsyncSession) -> User:
+    """
+    根据原始 token 获取用户（用于无法使用 HTTPBearer 的场景，如 WebSocket）
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token = credentials.credentials
-
     # 尝试验证 Keycloak token（如果启用）
     if keycloak_config.enabled:
         try:
@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import List, Optional, Dict, AsyncIterator
 from uuid import UUID
 from typing import Any
+import json
 
 if False:
     from app.models.user import User
 
 from app.core.database import get_db, async_session_factory
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, authenticate_token
 from app.schemas.discussion import (
     DiscussionCreate,
     DiscussionUpdate,
@@ -20,6 +22,8 @@ from app.schemas.message import MessageResponse
 from app.services.discussion_engine import DiscussionEngineService
 from app.services.report_generator import ReportGeneratorService
 from app.services.llm_orchestrator import LLMOrchestrator
+from app.services.api_key_service import APIKeyService
+from app.services.discussion_events import DiscussionEventType, TERMINAL_STATUSES, get_event_broker
 from app.core.redis import get_cache_service
 
 
@@ -131,6 +135,7 @@ async def delete_discussion(
     # TODO: Implement soft delete or cascade delete
     await db.delete(discussion)
     await db.commit()
+    await service.roster.invalidate(discussion_id)
 
 
 @router.post("/{discussion_id}/start", response_model=DiscussionResponse)
@@ -141,17 +146,9 @@ async def start_discussion(
     db: AsyncSession = Depends(get_db)
 ):
     """Start a discussion"""
-    from sqlalchemy import select
-    from app.models.api_key import UserAPIKey
-
     # Get user's API keys
-    result = await db.execute(
-        select(UserAPIKey).where(
-            UserAPIKey.user_id == current_user.id,
-            UserAPIKey.is_active == True
-        )
-    )
-    api_keys = result.scalars().all()
+    api_key_service = APIKeyService(db)
+    api_keys = await api_key_service.get_active_api_keys(current_user.id)
 
     if not api_keys:
         raise HTTPException(
@@ -159,12 +156,12 @@ async def start_discussion(
             detail="No active API key found. Please configure your API key first."
         )
 
-    # Create orchestrator and register providers
-    orchestrator = LLMOrchestrator()
-
-    # Use the first API key if provider_name is 'default', otherwise find the matching one
+    # Use the first API key if provider_name is 'default', route between all keys
+    # if it is 'auto', otherwise find the matching one
     selected_key = None
-    if provider_name and provider_name != "default":
+    if provider_name == LLMOrchestrator.AUTO_PROVIDER:
+        pass
+    elif provider_name and provider_name != "default":
         for api_key_obj in api_keys:
             if api_key_obj.key_name == provider_name:
                 selected_key = api_key_obj
@@ -172,20 +169,8 @@ async def start_discussion(
     else:
         selected_key = api_keys[0]  # Use first API key
 
-    # Register all user's API keys as providers
-    for api_key_obj in api_keys:
-        # Decrypt API key
-        from app.core.security import decrypt_api_key
-        decrypted_key = decrypt_api_key(api_key_obj.encrypted_key)
-
-        # Register provider
-        orchestrator.register_provider(
-            name=api_key_obj.key_name,
-            provider_type=api_key_obj.provider,
-            api_key=decrypted_key,
-            base_url=api_key_obj.api_base_url,
-            model=api_key_obj.default_model
-        )
+    # Register all user's API keys as providers (HTTP clients are pooled process-wide)
+    orchestrator = await api_key_service.build_orchestrator(current_user.id)
 
     service = DiscussionEngineService(
         db,
@@ -196,7 +181,12 @@ async def start_discussion(
 
     try:
         # Use the selected key's name as provider
-        actual_provider_name = selected_key.key_name
+        if provider_name == LLMOrchestrator.AUTO_PROVIDER:
+            actual_provider_name = LLMOrchestrator.AUTO_PROVIDER
+        elif selected_key:
+            actual_provider_name = selected_key.key_name
+        else:
+            raise ValueError(f"LLM provider not found: {provider_name}")
         discussion = await service.start_discussion(discussion_id, current_user.id, actual_provider_name)
 
         # Ensure all attributes are loaded before serialization
@@ -282,7 +272,9 @@ async def stop_discussion(
 
         # Generate report in background
         if discussion.status == "completed":
-            report_service = ReportGeneratorService(db, LLMOrchestrator())
+            report_service = ReportGeneratorService(
+                db, await APIKeyService(db).build_orchestrator(current_user.id)
+            )
             background_tasks.add_task(report_service.generate_report, discussion_id)
 
         return DiscussionResponse.model_validate(discussion)
@@ -337,77 +329,130 @@ async def get_discussion_messages(
     try:
         messages = await service.get_discussion_messages(discussion_id, current_user.id, skip, limit)
 
-        # Enrich with character info
-        from app.models.participant import DiscussionParticipant
-        from app.models.character import Character
-        from sqlalchemy import select
-
-        enriched_messages = []
-        for msg in messages:
-            # Check if this is a user-injected question (special UUID)
-            if msg.is_injected_question or str(msg.participant_id) == "00000000-0000-0000-0000-000000000000":
-                enriched_message = MessageResponse(
-                    id=msg.id,
-                    discussion_id=msg.discussion_id,
-                    participant_id=msg.participant_id,
-                    character_name="User",
-                    character_avatar_url=None,
-                    content=msg.content,
-                    phase=msg.phase,
-                    round=msg.round,
-                    token_count=msg.token_count,
-                    is_injected_question=msg.is_injected_question,
-                    metadata=msg.meta_data,
-                    created_at=msg.created_at
-                )
-                enriched_messages.append(enriched_message)
-            else:
-                # Get participant and character
-                result = await db.execute(
-                    select(DiscussionParticipant, Character)
-                    .join(Character, DiscussionParticipant.character_id == Character.id)
-                    .where(DiscussionParticipant.id == msg.participant_id)
-                )
-                participant_data = result.first()
-
-                if participant_data:
-                    participant, character = participant_data
-                    enriched_message = MessageResponse(
-                        id=msg.id,
-                        discussion_id=msg.discussion_id,
-                        participant_id=msg.participant_id,
-                        character_name=character.name,
-                        character_avatar_url=character.avatar_url,
-                        content=msg.content,
-                        phase=msg.phase,
-                        round=msg.round,
-                        token_count=msg.token_count,
-                        is_injected_question=msg.is_injected_question,
-                        metadata=msg.meta_data,
-                        created_at=msg.created_at
-                    )
-                    enriched_messages.append(enriched_message)
-                else:
-                    # Fallback for missing participant data
-                    enriched_message = MessageResponse(
-                        id=msg.id,
-                        discussion_id=msg.discussion_id,
-                        participant_id=msg.participant_id,
-                        character_name="Unknown",
-                        character_avatar_url=None,
-                        content=msg.content,
-                        phase=msg.phase,
-                        round=msg.round,
-                        token_count=msg.token_count,
-                        is_injected_question=msg.is_injected_question,
-                        metadata=msg.meta_data,
-                        created_at=msg.created_at
-                    )
-                    enriched_messages.append(enriched_message)
-
-        return enriched_messages
+        # Messages still being streamed live only in Redis until they complete
+        room = limit - len(messages)
+        if room > 0:
+            for draft in (await service.drafts.get_drafts(discussion_id))[:room]:
+                messages.append(MessageResponse(
+                    id=draft["message_id"],
+                    discussion_id=discussion_id,
+                    participant_id=draft["participant_id"],
+                    character_name=draft.get("character_name", "Unknown"),
+                    character_avatar_url=draft.get("character_avatar_url"),
+                    content=draft["content"],
+                    phase=draft["phase"],
+                    round=draft["round"],
+                    token_count=0,
+                    is_injected_question=False,
+                    metadata={"partial": True},
+                    created_at=draft["started_at"]
+                ))
+
+        return messages
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+
+
+async def _get_stream_snapshot(
+    db: AsyncSession,
+    discussion_id: UUID,
+    user_id: UUID
+) -> Optional[Dict[str, Any]]:
+    """Verify ownership and return the current state snapshot for a stream"""
+    service = DiscussionEngineService(
+        db,
+        LLMOrchestrator(),
+        await get_cache_service(),
+        session_factory=async_session_factory
+    )
+    discussion = await service.get_discussion_by_id(discussion_id, user_id)
+    if not discussion:
+        return None
+    return service.build_discussion_state(discussion)
+
+
+async def _discussion_events(
+    discussion_id: UUID,
+    snapshot: Dict[str, Any],
+    cursor: Optional[str]
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """Yield the state snapshot followed by live events (None = heartbeat)"""
+    # The snapshot carries no id so it never moves the client's cursor
+    yield {"id": None, "type": DiscussionEventType.STATE, "data": snapshot}
+    if snapshot["status"] in TERMINAL_STATUSES:
+        return
+
+    async for event in get_event_broker().subscribe(discussion_id, cursor):
+        yield event
+
+
+def _format_sse(event: Optional[Dict[str, Any]]) -> str:
+    """Encode an event as a Server-Sent Events frame"""
+    if event is None:
+        return ": keep-alive\n\n"
+    frame = f"event: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+    if event["id"] is not None:
+        frame = f"id: {event['id']}\n" + frame
+    return frame
+
+
+@router.get("/{discussion_id}/stream")
+async def stream_discussion(
+    discussion_id: UUID,
+    cursor: Optional[str] = Query(None, description="Resume after this event id"),
+    last_event_id: Optional[str] = Header(None),
+    current_user: Any = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream live discussion events (Server-Sent Events)"""
+    snapshot = await _get_stream_snapshot(db, discussion_id, current_user.id)
+    if not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Discussion not found"
+        )
+
+    # Release the connection now; the stream itself never touches the database
+    await db.close()
+
+    async def sse_frames():
+        async for event in _discussion_events(discussion_id, snapshot, last_event_id or cursor):
+            yield _format_sse(event)
+
+    return StreamingResponse(
+        sse_frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/{discussion_id}/ws")
+async def discussion_websocket(
+    websocket: WebSocket,
+    discussion_id: UUID,
+    token: str = Query(...),
+    cursor: Optional[str] = Query(None, description="Resume after this event id")
+):
+    """Stream live discussion events over WebSocket"""
+    async with async_session_factory() as db:
+        try:
+            user = await authenticate_token(token, db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        snapshot = await _get_stream_snapshot(db, discussion_id, user.id)
+
+    if not snapshot:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    try:
+        async for event in _discussion_events(discussion_id, snapshot, cursor):
+            await websocket.send_json(event if event is not None else {"type": "heartbeat"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
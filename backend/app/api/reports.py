@@ -11,6 +11,7 @@ from app.api.dependencies import get_current_user
 from app.schemas.report import ReportResponse
 from app.services.report_generator import ReportGeneratorService
 from app.services.llm_orchestrator import LLMOrchestrator
+from app.services.api_key_service import APIKeyService
 
 
 router = APIRouter(prefix="/api/reports", tags=["Reports"])
@@ -54,7 +55,7 @@ async def get_discussion_report(
     db: AsyncSession = Depends(get_db)
 ):
     """Get or generate report for a discussion"""
-    service = ReportGeneratorService(db, LLMOrchestrator())
+    service = ReportGeneratorService(db, await APIKeyService(db).build_orchestrator(current_user.id))
 
     # Try to get existing report
     from app.models.report import Report
@@ -90,7 +91,7 @@ async def regenerate_report(
     db: AsyncSession = Depends(get_db)
 ):
     """Regenerate report for a discussion"""
-    service = ReportGeneratorService(db, LLMOrchestrator())
+    service = ReportGeneratorService(db, await APIKeyService(db).build_orchestrator(current_user.id))
 
     # Verify user owns the discussion
     from app.models.discussion import Discussion
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 
@@ -32,6 +32,95 @@ class Settings(BaseSettings):
     EMBEDDING_API_KEY: str = ""
     EMBEDDING_BASE_URL: str = ""
     EMBEDDING_MODEL: str = "text-embedding-v3"
+    EMBEDDING_CACHE_TTL: int = 2592000  # Seconds embeddings stay in the shared Redis cache (0 = in-process cache only)
+    EMBEDDING_CACHE_DTYPE: str = "float32"  # Redis cache encoding: float32 or float16 (half the memory, ~3 significant digits)
+    EMBEDDING_BATCH_SIZE: int = 10  # Texts per embedding request to start with (DashScope accepts at most 10)
+    EMBEDDING_MAX_BATCH_SIZE: int = 64  # Batch size grows up to this while the provider accepts it
+    EMBEDDING_CONCURRENCY: int = 4  # Concurrent embedding requests per worker
+    CHARACTER_EMBEDDINGS_SYNC_ON_STARTUP: bool = True  # Embed new/changed template characters in the background at startup
+    CHARACTER_INDEX_DTYPE: str = "float32"  # Recommendation index storage dtype (float32 or float16 to halve memory)
+    CHARACTER_INDEX_FEATURE_TTL: float = 60.0  # Seconds between refreshes of usage/rating columns in the index
+    CHARACTER_INDEX_BACKEND: str = "ivf"  # Recommendation index: "exact" (score every character) or "ivf" (approximate)
+    CHARACTER_INDEX_IVF_NLIST: int = 0  # IVF lists (0 = square root of the number of characters)
+    CHARACTER_INDEX_IVF_NPROBE: int = 16  # IVF lists scored per query (higher = better recall, slower)
+    CHARACTER_INDEX_IVF_MIN_SIZE: int = 20000  # Below this many characters the IVF index scores exactly
+
+    # LLM HTTP clients (pooled per provider key, shared process-wide)
+    LLM_HTTP2: bool = True
+    LLM_HTTP_MAX_CONNECTIONS: int = 100  # Per provider key
+    LLM_HTTP_MAX_KEEPALIVE: int = 20  # Idle keep-alive connections per provider key
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection stays open
+    LLM_HTTP_TIMEOUT: float = 60.0  # Read/write timeout in seconds
+    LLM_CONNECT_TIMEOUT: float = 5.0  # Connection setup timeout in seconds
+    LLM_CLIENT_IDLE_TTL: float = 300.0  # Seconds before an unused client is closed
+
+    # LLM rate limiting (per provider key, shared across workers via Redis)
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    LLM_DEFAULT_RPM: int = 0  # Requests per minute per key (0 = limit reported by the provider)
+    LLM_DEFAULT_TPM: int = 0  # Tokens per minute per key (0 = limit reported by the provider)
+
+    # LLM resilience (retries per error class, circuit breaker, stream timeouts, hedging)
+    LLM_RETRY_ATTEMPTS: int = 3  # Attempts on connection and 5xx errors
+    LLM_RETRY_TIMEOUT_ATTEMPTS: int = 2  # Attempts on timeouts
+    LLM_RETRY_RATE_LIMIT_ATTEMPTS: int = 5  # Attempts on 429 (waits for the rate limiter between attempts)
+    LLM_RETRY_BACKOFF_INITIAL: float = 0.5  # Seconds, doubled per attempt with jitter
+    LLM_RETRY_BACKOFF_MAX: float = 8.0
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open a provider key's circuit
+    LLM_CIRCUIT_RESET_TIMEOUT: float = 30.0  # Seconds before a probe call is allowed
+    LLM_FIRST_TOKEN_TIMEOUT: float = 30.0  # Seconds to the first streamed token (0 = off)
+    LLM_INTER_TOKEN_TIMEOUT: float = 20.0  # Seconds between streamed tokens (0 = off)
+    LLM_HEDGE_AFTER: float = 0.0  # Send a second request when the first token is this late (0 = off)
+
+    # LLM routing (provider_name "auto": choose among the user's keys per request)
+    LLM_ROUTER_EWMA_ALPHA: float = 0.3  # Weight of the newest latency/error sample
+    LLM_ROUTER_ERROR_PENALTY: float = 4.0  # Latency multiplier (and seconds added) per unit of error rate
+    LLM_ROUTER_STICKY_TTL: float = 1800.0  # Seconds a participant keeps its last provider
+    LLM_ROUTER_SWITCH_RATIO: float = 1.5  # Leave the sticky provider when it is this much slower than the best
+
+    # LLM task classes: task class -> provider type -> model (JSON), e.g.
+    # {"round_summary": {"openai": "gpt-4o-mini", "anthropic": "claude-3-5-haiku-20241022"}}
+    LLM_TASK_MODELS: Dict[str, Dict[str, str]] = {}
+
+    # LLM response cache (opt-in; deterministic calls of the listed task classes, shared via Redis)
+    LLM_RESPONSE_CACHE_ENABLED: bool = False
+    LLM_RESPONSE_CACHE_TASK_CLASSES: List[str] = ["round_summary", "report_section", "extraction"]
+    LLM_RESPONSE_CACHE_MAX_TEMPERATURE: float = 0.5  # Calls with a higher temperature are never cached
+    LLM_RESPONSE_CACHE_TTL: int = 86400  # Seconds
+    LLM_RESPONSE_CACHE_MAX_ENTRIES: int = 10000  # Oldest entries are evicted beyond this
+
+    # LLM call scheduling (per provider key in each worker: turns > injected replies > summaries > reports)
+    LLM_SCHEDULER_SLOTS_PER_KEY: int = 8  # Concurrent calls per provider key (0 = unlimited)
+    LLM_SCHEDULER_AGING_SECONDS: float = 10.0  # Queued calls rise one priority level per this many seconds
+
+    # LLM usage metering (usage aggregated in Redis, flushed to Postgres in batches)
+    LLM_STREAM_USAGE: bool = True  # Ask OpenAI-compatible APIs for usage in streams (stream_options)
+    LLM_USAGE_FLUSH_INTERVAL: float = 10.0  # Seconds between flushes to Postgres
+    LLM_USAGE_FLUSH_BATCH: int = 500  # Discussions/participants flushed per batch
+    # Model name prefix -> USD per million tokens (input, output, cache_read, cache_write); longest prefix wins
+    LLM_MODEL_PRICES: Dict[str, Dict[str, float]] = {
+        "gpt-4o-mini": {"input": 0.15, "output": 0.6, "cache_read": 0.075},
+        "gpt-4o": {"input": 2.5, "output": 10.0, "cache_read": 1.25},
+        "gpt-4-turbo": {"input": 10.0, "output": 30.0},
+        "gpt-4": {"input": 30.0, "output": 60.0},
+        "gpt-3.5-turbo": {"input": 0.5, "output": 1.5},
+        "claude-3-5-haiku": {"input": 0.8, "output": 4.0, "cache_read": 0.08, "cache_write": 1.0},
+        "claude-3-5-sonnet": {"input": 3.0, "output": 15.0, "cache_read": 0.3, "cache_write": 3.75},
+        "claude-3-opus": {"input": 15.0, "output": 75.0, "cache_read": 1.5, "cache_write": 18.75},
+    }
+
+    # Discussion streaming
+    MESSAGE_DRAFT_FLUSH_INTERVAL: float = 1.0  # Seconds between draft flushes to Redis
+    MESSAGE_DRAFT_TTL: int = 86400  # Seconds an unfinished draft is kept for recovery
+
+    # Discussion scheduler
+    DISCUSSION_LEASE_TTL: int = 30  # Seconds before a dead worker's discussion is taken over
+    DISCUSSION_WORKER_CONCURRENCY: int = 20  # Discussions run concurrently per worker
+
+    # Discussion pacing
+    DISCUSSION_DEFAULT_PACING: str = "realtime"  # 'realtime', 'batch' or 'adaptive'
+    DISCUSSION_MESSAGE_DELAY: float = 2.0  # Seconds between messages when paced
+    DISCUSSION_PHASE_DELAY: float = 5.0  # Seconds between phases when paced
+    DISCUSSION_PARALLEL_TURNS: int = 4  # Concurrent generations per discussion in independent phases
 
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = True
@@ -1,11 +1,16 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from pathlib import Path
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Idempotent ALTERs for columns added to existing tables (create_all only creates missing tables)
+SCHEMA_UPGRADES = Path(__file__).resolve().parents[2] / "init-db" / "02-schema-upgrades.sql"
+
 # Create async engine
 engine = create_async_engine(
     settings.DATABASE_URL,
@@ -43,11 +48,23 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+async def apply_schema_upgrades(conn: AsyncConnection):
+    """Add columns that tables created by an earlier version lack"""
+    if not SCHEMA_UPGRADES.exists():
+        logger.warning(f"Schema upgrade script not found: {SCHEMA_UPGRADES}")
+        return
+    lines = [line for line in SCHEMA_UPGRADES.read_text().splitlines() if not line.lstrip().startswith("--")]
+    for statement in "\n".join(lines).split(";"):
+        if statement.strip():
+            await conn.execute(text(statement))
+
+
 async def init_db():
     """Initialize database tables and seed data"""
     # Create tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await apply_schema_upgrades(conn)
 
     # Seed template characters if table is empty
     from app.models.character import Character
@@ -1,11 +1,22 @@
 from redis import asyncio as aioredis
-from typing import Optional
+from typing import Optional, Dict, Any, List, Set, Callable, Tuple
+import asyncio
 import json
+import logging
+import time
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 # Global Redis client
 redis_client: Optional[aioredis.Redis] = None
 
+# Global binary-safe Redis client (raw bytes values, e.g. embedding vectors)
+redis_binary_client: Optional[aioredis.Redis] = None
+
+# Global discussion event bus (owns a shared pub/sub connection)
+event_bus: Optional["DiscussionEventBus"] = None
+
 
 async def get_redis() -> aioredis.Redis:
     """Get Redis client instance"""
@@ -20,12 +31,30 @@ async def get_redis() -> aioredis.Redis:
     return redis_client
 
 
+async def get_redis_binary() -> aioredis.Redis:
+    """Get Redis client instance that returns values as bytes (decode_responses=False)"""
+    global redis_binary_client
+    if redis_binary_client is None:
+        redis_binary_client = aioredis.from_url(
+            settings.REDIS_URL,
+            decode_responses=False,
+            max_connections=10,
+        )
+    return redis_binary_client
+
+
 async def close_redis():
-    """Close Redis connection"""
-    global redis_client
+    """Close Redis connections"""
+    global redis_client, redis_binary_client, event_bus
+    if event_bus:
+        await event_bus.close()
+        event_bus = None
     if redis_client:
         await redis_client.close()
         redis_client = None
+    if redis_binary_client:
+        await redis_binary_client.close()
+        redis_binary_client = None
 
 
 class CacheService:
@@ -123,3 +152,220 @@ async def get_rate_limit_service() -> RateLimitService:
     """Dependency for getting RateLimitService"""
     redis = await get_redis()
     return RateLimitService(redis)
+
+
+def stream_id_key(event_id: str) -> Tuple[int, int]:
+    """Parse a Redis Stream id ("<ms>-<seq>") into a sortable tuple"""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class DiscussionEventBus:
+    """
+    Per-discussion event fan-out across workers
+
+    Every event is appended to a bounded Redis Stream (for replay after a
+    reconnect) and published on a per-discussion pub/sub channel in the same
+    atomic script, so stream ids double as resume cursors. Each worker keeps
+    a single pub/sub connection and subscribes only to discussions that have
+    local listeners.
+    """
+
+    CHANNEL_PREFIX = "discussion_events"
+    STREAM_PREFIX = "discussion_stream"
+    VIEWERS_PREFIX = "discussion_viewers"  # sorted set: viewer id -> presence expiry
+
+    # XADD + PUBLISH atomically so live and replayed events share one order
+    _PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'type', ARGV[2], 'data', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('PUBLISH', KEYS[2], id .. '\\n' .. ARGV[2] .. '\\n' .. ARGV[3])
+return id
+"""
+
+    def __init__(self, redis: aioredis.Redis, stream_maxlen: int = 2000, stream_ttl: int = 86400):
+        """
+        Initialize event bus
+
+        Args:
+            redis: Redis client (decode_responses=True)
+            stream_maxlen: Approximate number of events retained per discussion
+            stream_ttl: Seconds a discussion's stream lives after its last event
+        """
+        self.redis = redis
+        self.stream_maxlen = stream_maxlen
+        self.stream_ttl = stream_ttl
+        self._publish_script = redis.register_script(self._PUBLISH_SCRIPT)
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        # channel -> handlers; a handler receives None when the feed was interrupted
+        self._handlers: Dict[str, Set[Callable[[Optional[Dict[str, Any]]], None]]] = {}
+
+    def _channel(self, discussion_id) -> str:
+        return f"{self.CHANNEL_PREFIX}:{discussion_id}"
+
+    def _stream(self, discussion_id) -> str:
+        return f"{self.STREAM_PREFIX}:{discussion_id}"
+
+    def _viewers(self, discussion_id) -> str:
+        return f"{self.VIEWERS_PREFIX}:{discussion_id}"
+
+    async def publish(
+        self,
+        discussion_id,
+        event_type: str,
+        data: Dict[str, Any],
+        ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Append an event to the discussion stream and fan it out to all workers"""
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        event_id = await self._publish_script(
+            keys=[self._stream(discussion_id), self._channel(discussion_id)],
+            args=[self.stream_maxlen, event_type, payload, ttl or self.stream_ttl]
+        )
+        return {"id": event_id, "type": event_type, "data": data}
+
+    async def latest_id(self, discussion_id) -> Optional[str]:
+        """Id of the newest retained event, if any"""
+        entries = await self.redis.xrevrange(self._stream(discussion_id), count=1)
+        return entries[0][0] if entries else None
+
+    async def replay(self, discussion_id, cursor: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get retained events after cursor
+
+        Args:
+            discussion_id: Discussion id
+            cursor: Last event id seen by the caller (None replays everything retained)
+
+        Returns:
+            Events in order, or None if the cursor is invalid or events after
+            it have already been trimmed from the stream
+        """
+        stream = self._stream(discussion_id)
+        start = "-"
+        if cursor:
+            try:
+                cursor_key = stream_id_key(cursor)
+            except ValueError:
+                return None
+            first = await self.redis.xrange(stream, count=1)
+            if first and stream_id_key(first[0][0]) > cursor_key:
+                return None
+            start = f"({cursor}"
+
+        entries = await self.redis.xrange(stream, min=start, max="+")
+        return [
+            {"id": entry_id, "type": fields["type"], "data": json.loads(fields["data"])}
+            for entry_id, fields in entries
+        ]
+
+    async def touch_viewer(self, discussion_id, viewer_id: str, ttl: float):
+        """Mark a viewer as connected for the next ttl seconds"""
+        key = self._viewers(discussion_id)
+        pipe = self.redis.pipeline()
+        pipe.zadd(key, {viewer_id: time.time() + ttl})
+        pipe.expire(key, int(ttl) + 1)
+        await pipe.execute()
+
+    async def remove_viewer(self, discussion_id, viewer_id: str):
+        """Mark a viewer as disconnected"""
+        await self.redis.zrem(self._viewers(discussion_id), viewer_id)
+
+    async def count_viewers(self, discussion_id) -> int:
+        """Number of viewers connected to a discussion on any worker"""
+        return await self.redis.zcount(self._viewers(discussion_id), time.time(), "+inf")
+
+    async def add_listener(self, discussion_id, handler: Callable[[Optional[Dict[str, Any]]], None]):
+        """Deliver live events for a discussion to handler (called in publish order)"""
+        channel = self._channel(discussion_id)
+        async with self._lock:
+            handlers = self._handlers.setdefault(channel, set())
+            handlers.add(handler)
+            if len(handlers) == 1:
+                if self._pubsub is None:
+                    self._pubsub = self.redis.pubsub()
+                await self._pubsub.subscribe(channel)
+            if self._listener is None or self._listener.done():
+                self._listener = asyncio.create_task(self._listen())
+
+    async def remove_listener(self, discussion_id, handler: Callable[[Optional[Dict[str, Any]]], None]):
+        """Stop delivering events to handler"""
+        channel = self._channel(discussion_id)
+        async with self._lock:
+            handlers = self._handlers.get(channel)
+            if not handlers:
+                return
+            handlers.discard(handler)
+            if not handlers:
+                del self._handlers[channel]
+                try:
+                    await self._pubsub.unsubscribe(channel)
+                except Exception as e:
+                    logger.warning(f"Failed to unsubscribe from {channel}: {e}")
+
+    async def _listen(self):
+        """Dispatch pub/sub messages to local handlers while anyone is listening"""
+        while self._handlers:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception as e:
+                logger.error(f"Discussion event listener error: {e}")
+                await self._reconnect()
+                continue
+
+            if message is None or message["type"] != "message":
+                continue
+
+            try:
+                event_id, event_type, payload = message["data"].split("\n", 2)
+                event = {"id": event_id, "type": event_type, "data": json.loads(payload)}
+            except Exception as e:
+                logger.error(f"Dropping malformed discussion event on {message['channel']}: {e}")
+                continue
+            self._dispatch(self._handlers.get(message["channel"], ()), event)
+
+    @staticmethod
+    def _dispatch(handlers, event: Optional[Dict[str, Any]]):
+        """Call each handler; one failing handler must not stop the listener or the others"""
+        for handler in list(handlers):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"Discussion event handler failed: {e}", exc_info=True)
+
+    async def _reconnect(self):
+        """Re-subscribe after a connection error and tell handlers to catch up"""
+        old_pubsub, self._pubsub = self._pubsub, self.redis.pubsub()
+        try:
+            await old_pubsub.close()
+        except Exception:
+            pass
+        await asyncio.sleep(1.0)
+        try:
+            if self._handlers:
+                await self._pubsub.subscribe(*self._handlers.keys())
+        except Exception as e:
+            logger.error(f"Failed to re-subscribe discussion event channels: {e}")
+        # Events may have been missed; handlers replay from the stream
+        for handlers in list(self._handlers.values()):
+            self._dispatch(handlers, None)
+
+    async def close(self):
+        """Stop the listener and close the pub/sub connection"""
+        self._handlers.clear()
+        if self._listener and not self._listener.done():
+            self._listener.cancel()
+        self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
+
+async def get_event_bus() -> DiscussionEventBus:
+    """Get the process-wide discussion event bus"""
+    global event_bus
+    if event_bus is None:
+        event_bus = DiscussionEventBus(await get_redis())
+    return event_bus
@@ -2,6 +2,7 @@ from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from app.core.config import settings
 from app.core.database import init_db
@@ -27,6 +28,33 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized")
 
+    # Embed template characters that have no current stored vector (recommendations)
+    embeddings_sync = None
+    if settings.CHARACTER_EMBEDDINGS_SYNC_ON_STARTUP and settings.EMBEDDING_API_KEY:
+        from app.services.character_embeddings import build_character_embeddings
+
+        async def sync_character_embeddings():
+            try:
+                await build_character_embeddings()
+            except Exception as e:
+                logger.error(f"Failed to build character embeddings: {e}")
+
+        embeddings_sync = asyncio.create_task(sync_character_embeddings())
+
+    # Pooled LLM HTTP clients shared by request handlers and discussion loops
+    from app.services.llm_registry import get_llm_registry, close_llm_registry
+    get_llm_registry().start()
+
+    # Flush metered LLM usage to Postgres in batches
+    from app.services.usage_meter import get_usage_meter
+    usage_meter = await get_usage_meter()
+    usage_meter.start()
+
+    # Start claiming discussion jobs (also takes over runs from dead workers)
+    from app.services.discussion_scheduler import get_discussion_scheduler
+    scheduler = await get_discussion_scheduler()
+    await scheduler.start()
+
     # Initialize Keycloak service if enabled
     from app.core.keycloak_config import keycloak_config
     if keycloak_config.enabled:
@@ -46,6 +74,16 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("Shutting down simFocus backend...")
+    if embeddings_sync is not None and not embeddings_sync.done():
+        embeddings_sync.cancel()
+    from app.services.character_embeddings import get_character_embedding_store
+    await get_character_embedding_store().drain()
+    await scheduler.stop()
+    logger.info("Discussion scheduler stopped")
+    await close_llm_registry()
+    logger.info("LLM clients closed")
+    await usage_meter.stop()
+    logger.info("LLM usage flushed")
     await close_redis()
     logger.info("Redis connection closed")
 
@@ -103,6 +141,20 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/llm")
+async def llm_health_check():
+    """LLM latency and token metrics and scheduler queues of this worker, and response cache counters"""
+    from app.services.llm_scheduler import get_llm_scheduler
+    from app.services.llm_tasks import get_llm_task_metrics
+
+    metrics = get_llm_task_metrics().snapshot()
+    metrics["scheduler"] = get_llm_scheduler().snapshot()
+    if settings.LLM_RESPONSE_CACHE_ENABLED:
+        from app.services.llm_response_cache import get_llm_response_cache
+        metrics["response_cache"] = await (await get_llm_response_cache()).stats()
+    return metrics
+
+
 # Global exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
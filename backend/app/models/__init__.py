@@ -5,9 +5,11 @@ from app.models.user import User
 from app.models.api_key import UserAPIKey
 from app.models.topic import Topic
 from app.models.character import Character
+from app.models.character_embedding import CharacterEmbedding
 from app.models.discussion import Discussion
 from app.models.participant import DiscussionParticipant
 from app.models.message import DiscussionMessage
+from app.models.round_summary import RoundSummary
 from app.models.report import Report
 from app.models.share_link import ShareLink
 from app.models.audit_log import AuditLog
@@ -17,9 +19,11 @@ __all__ = [
     'UserAPIKey',
     'Topic',
     'Character',
+    'CharacterEmbedding',
     'Discussion',
     'DiscussionParticipant',
     'DiscussionMessage',
+    'RoundSummary',
     'Report',
     'ShareLink',
     'AuditLog',
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -16,6 +16,9 @@ class UserAPIKey(Base):
     encrypted_key = Column(Text, nullable=False)  # AES-256 encrypted
     api_base_url = Column(String(500), nullable=True)  # Custom endpoint URL
     default_model = Column(String(100), nullable=True)
+    rpm_limit = Column(Integer, nullable=True)  # Requests per minute budget (NULL = default)
+    tpm_limit = Column(Integer, nullable=True)  # Tokens per minute budget (NULL = default)
+    task_models = Column(JSONB, nullable=True)  # Task class -> model this key serves it with
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     last_used_at = Column(DateTime(timezone=True), nullable=True)
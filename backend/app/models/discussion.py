@@ -18,6 +18,7 @@ class Discussion(Base):
     status = Column(String(20), default="initialized", nullable=False, index=True)  # 'initialized', 'running', 'paused', 'completed', 'failed', 'cancelled'
     current_round = Column(Integer, default=0, nullable=False)
     current_phase = Column(String(20), default="opening", nullable=False)  # 'opening', 'development', 'debate', 'closing'
+    pacing = Column(String(20), default="realtime", server_default="realtime", nullable=False)  # 'realtime', 'batch', 'adaptive'
     llm_provider = Column(String(50), nullable=True)  # Which API was used
     llm_model = Column(String(100), nullable=True)  # Which model
     total_tokens_used = Column(Integer, default=0, nullable=False)
@@ -32,6 +33,7 @@ class Discussion(Base):
     user = relationship("User", back_populates="discussions")
     participants = relationship("DiscussionParticipant", back_populates="discussion", cascade="all, delete-orphan")
     messages = relationship("DiscussionMessage", back_populates="discussion", cascade="all, delete-orphan")
+    round_summaries = relationship("RoundSummary", back_populates="discussion", cascade="all, delete-orphan")
     report = relationship("Report", back_populates="discussion", uselist=False, cascade="all, delete-orphan")
 
     @hybrid_property
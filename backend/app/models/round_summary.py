@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+import uuid
+from app.core.database import Base
+
+
+class RoundSummary(Base):
+    __tablename__ = "round_summaries"
+    __table_args__ = (
+        UniqueConstraint("discussion_id", "round", name="uq_round_summaries_discussion_round"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    discussion_id = Column(UUID(as_uuid=True), ForeignKey("discussions.id", ondelete="CASCADE"), nullable=False, index=True)
+    round = Column(Integer, nullable=False)  # 0-based, like DiscussionMessage.round
+    content = Column(Text, nullable=False)  # LLM-generated summary of the round
+    message_count = Column(Integer, default=0, nullable=False)  # Messages the summary covers
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # Relationships
+    discussion = relationship("Discussion", back_populates="round_summaries")
@@ -1,14 +1,36 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import Optional, Dict
 from datetime import datetime
 from uuid import UUID
 
 
+def _validate_task_models(value: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    from app.services.llm_tasks import LLMTaskClass
+
+    if value:
+        unknown = set(value) - set(LLMTaskClass.ALL)
+        if unknown:
+            raise ValueError(f"Unknown task classes: {', '.join(sorted(unknown))}")
+    return value
+
+
 class APIKeyBase(BaseModel):
     provider: str = Field(..., description="LLM provider: 'openai', 'anthropic', 'custom'")
     key_name: str = Field(..., min_length=1, max_length=100)
     api_base_url: Optional[str] = None
     default_model: Optional[str] = None
+    rpm_limit: Optional[int] = Field(None, ge=0, description="Requests per minute budget (0 = provider limit)")
+    tpm_limit: Optional[int] = Field(None, ge=0, description="Tokens per minute budget (0 = provider limit)")
+    task_models: Optional[Dict[str, str]] = Field(
+        None,
+        description="Task classes this key serves, mapped to the model to use "
+                    "(turn, round_summary, report_section, extraction)"
+    )
+
+    @field_validator("task_models")
+    @classmethod
+    def validate_task_models(cls, value):
+        return _validate_task_models(value)
 
 
 class APIKeyCreate(APIKeyBase):
@@ -19,8 +41,16 @@ class APIKeyUpdate(BaseModel):
     key_name: Optional[str] = None
     api_base_url: Optional[str] = None
     default_model: Optional[str] = None
+    rpm_limit: Optional[int] = Field(None, ge=0)
+    tpm_limit: Optional[int] = Field(None, ge=0)
+    task_models: Optional[Dict[str, str]] = None
     is_active: Optional[bool] = None
 
+    @field_validator("task_models")
+    @classmethod
+    def validate_task_models(cls, value):
+        return _validate_task_models(value)
+
 
 class APIKeyResponse(APIKeyBase):
     id: UUID
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
 from uuid import UUID
 
@@ -12,6 +12,9 @@ class DiscussionBase(BaseModel):
 
 class DiscussionCreate(DiscussionBase):
     character_ids: List[UUID] = Field(..., min_length=3, max_length=7, description="3-7 characters required")
+    pacing: Optional[Literal["realtime", "batch", "adaptive"]] = Field(
+        None, description="Pacing mode (default from server settings)"
+    )
 
 
 class DiscussionUpdate(BaseModel):
@@ -25,6 +28,7 @@ class DiscussionResponse(DiscussionBase):
     status: str
     current_round: int
     current_phase: str
+    pacing: str = "realtime"
     progress_percentage: float = 0.0
     llm_provider: Optional[str] = None
     llm_model: Optional[str] = None
@@ -7,7 +7,8 @@ from uuid import UUID
 from app.models.api_key import UserAPIKey
 from app.models.user import User
 from app.core.security import api_key_encryption
-from app.schemas.api_key import APIKeyCreate, APIKeyUpdate, APIKeyResponse, APIKeyWithDecrypted
+from app.schemas.api_key import APIKeyCreate, APIKeyUpdate, APIKeyResponse, APIKeyUsageStats, APIKeyWithDecrypted
+from app.services.llm_orchestrator import LLMOrchestrator
 
 
 class APIKeyService:
@@ -80,6 +81,9 @@ class APIKeyService:
             encrypted_key=encrypted_key,
             api_base_url=api_key_data.api_base_url,
             default_model=api_key_data.default_model,
+            rpm_limit=api_key_data.rpm_limit,
+            tpm_limit=api_key_data.tpm_limit,
+            task_models=api_key_data.task_models,
             is_active=True
         )
         self.db.add(api_key)
@@ -141,3 +145,44 @@ class APIKeyService:
             ).limit(1)
         )
         return result.scalar_one_or_none() is not None
+
+    async def get_active_api_keys(self, user_id: UUID) -> List[UserAPIKey]:
+        """Get all active API keys for a user (oldest first)"""
+        result = await self.db.execute(
+            select(UserAPIKey).where(
+                and_(
+                    UserAPIKey.user_id == user_id,
+                    UserAPIKey.is_active == True
+                )
+            ).order_by(UserAPIKey.created_at)
+        )
+        return list(result.scalars().all())
+
+    async def get_usage_stats(self, api_key: UserAPIKey) -> APIKeyUsageStats:
+        """Usage metered for a key (kept in Redis by the usage meter)"""
+        from app.services.usage_meter import get_usage_meter
+
+        meter = await get_usage_meter()
+        totals = await meter.totals("key", api_key.id)
+        return APIKeyUsageStats(
+            total_calls=totals["calls"],
+            total_tokens=totals["tokens"],
+            estimated_cost=totals["cost_micros"] / 1_000_000
+        )
+
+    async def build_orchestrator(self, user_id: UUID) -> LLMOrchestrator:
+        """Create an orchestrator with all of the user's active keys registered by key name"""
+        orchestrator = LLMOrchestrator()
+        for api_key_obj in await self.get_active_api_keys(user_id):
+            orchestrator.register_provider(
+                name=api_key_obj.key_name,
+                provider_type=api_key_obj.provider,
+                api_key=api_key_encryption.decrypt(api_key_obj.encrypted_key),
+                base_url=api_key_obj.api_base_url,
+                model=api_key_obj.default_model,
+                rpm_limit=api_key_obj.rpm_limit,
+                tpm_limit=api_key_obj.tpm_limit,
+                task_models=api_key_obj.task_models,
+                key_id=str(api_key_obj.id)
+            )
+        return orchestrator
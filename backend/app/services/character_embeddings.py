@@ -0,0 +1,311 @@
+"""
+Persisted embeddings of template characters for recommendations.
+
+Character vectors are stored in the character_embeddings table, keyed by
+character and embedding model and versioned by a hash of the embedded
+character text. A sync embeds only characters whose text changed (or that
+have no vector yet), so the full set is computed once - at startup or with
+`python -m scripts.build_character_embeddings` - and kept current when
+characters are saved. Saves only schedule the re-embedding in the
+background; a vector whose refresh failed keeps a stale hash and is
+re-embedded by the next sync.
+
+Each worker holds the vectors in a character index (exact or IVF, see
+character_index), updated in place from the rows changed since its last
+load, together with usage/rating columns refreshed every
+CHARACTER_INDEX_FEATURE_TTL seconds, so a recommendation costs one query
+embedding, one matrix-vector product and a top-k selection - no per-request
+scan of the characters table.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.character import Character
+from app.models.character_embedding import CharacterEmbedding
+from app.services.character_index import CharacterVectorIndex, create_character_index
+from app.services.embedding_service import EmbeddingService, build_character_text, get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+
+def character_text(character: Character) -> str:
+    """Text a character is embedded from (same as the recommend endpoint builds)"""
+    return build_character_text({"name": character.name, "config": character.config or {}}, enhanced=True)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CharacterEmbeddingStore:
+    """Postgres-backed character vectors with an in-memory recommendation index"""
+
+    # Vectors re-read before the last seen updated_at when applying changes,
+    # for writes whose transaction started before the last load
+    CHANGE_OVERLAP = timedelta(minutes=1)
+
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        self.embedding_service = embedding_service or get_embedding_service()
+        self.index = CharacterVectorIndex.empty()
+        self._features_loaded_at: Optional[float] = None
+        self._version: Optional[Tuple[Any, ...]] = None
+        self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def model(self) -> str:
+        return self.embedding_service.model
+
+    async def sync(
+        self,
+        db: AsyncSession,
+        characters: Optional[Sequence[Character]] = None,
+        force: bool = False
+    ) -> int:
+        """
+        Embed characters whose stored vector is missing or out of date
+
+        Args:
+            db: Database session
+            characters: Characters to check (default: all template characters)
+            force: Re-embed even if the stored hash matches
+
+        Returns:
+            Number of characters embedded
+        """
+        if characters is None:
+            result = await db.execute(select(Character).where(Character.is_template == True))
+            characters = result.scalars().all()
+        if not characters:
+            return 0
+
+        result = await db.execute(
+            select(CharacterEmbedding.character_id, CharacterEmbedding.content_hash).where(
+                CharacterEmbedding.model == self.model,
+                CharacterEmbedding.character_id.in_([c.id for c in characters])
+            )
+        )
+        stored = dict(result.all())
+
+        changed = []
+        for character in characters:
+            text = character_text(character)
+            digest = content_hash(text)
+            if force or stored.get(character.id) != digest:
+                changed.append((character.id, text, digest))
+        if not changed:
+            return 0
+
+        vectors = await self.embedding_service.encode_texts_batch([text for _, text, _ in changed], use_cache=False)
+        rows = [
+            {
+                "character_id": character_id,
+                "model": self.model,
+                "content_hash": digest,
+                "dim": int(vector.shape[0]),
+                "vector": np.asarray(vector, dtype="<f4").tobytes(),
+            }
+            for (character_id, _, digest), vector in zip(changed, vectors)
+            # Zero vectors mean the embedding call failed; retry on the next sync
+            if np.any(vector)
+        ]
+        if rows:
+            statement = insert(CharacterEmbedding).values(rows)
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=["character_id", "model"],
+                set_={
+                    "content_hash": statement.excluded.content_hash,
+                    "dim": statement.excluded.dim,
+                    "vector": statement.excluded.vector,
+                    "updated_at": func.now(),
+                }
+            ))
+            await db.commit()
+        if len(rows) < len(changed):
+            logger.warning(f"Failed to embed {len(changed) - len(rows)} characters, will retry on next sync")
+        logger.info(f"Stored embeddings of {len(rows)} characters for model {self.model}")
+        return len(rows)
+
+    def schedule_refresh(self, character: Character):
+        """Re-embed a saved character in the background (only template characters are recommended)"""
+        if not character.is_template:
+            return
+        task = asyncio.create_task(self._refresh_character(character.id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self):
+        """Wait for scheduled refreshes (e.g. before shutdown)"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def _refresh_character(self, character_id: UUID):
+        from app.core.database import async_session_factory
+
+        try:
+            async with async_session_factory() as db:
+                # Re-read the row: the request's session is gone and a later save may have won
+                character = await db.get(Character, character_id)
+                if character is not None and character.is_template:
+                    await self.sync(db, [character])
+        except Exception as e:
+            logger.warning(f"Failed to update embedding of character {character_id}: {e}")
+
+    async def _table_version(self, db: AsyncSession) -> Tuple[Any, ...]:
+        result = await db.execute(
+            select(func.count(), func.max(CharacterEmbedding.updated_at))
+            .where(CharacterEmbedding.model == self.model)
+        )
+        return tuple(result.one())
+
+    async def load(self, db: AsyncSession) -> bool:
+        """
+        Bring the index up to date if the stored vectors changed since the last load
+
+        Vectors written since the last load are applied to the index in
+        place; if the counts still disagree (e.g. after deletes) the index
+        is rebuilt from the table.
+        """
+        version = await self._table_version(db)
+        if version == self._version:
+            return False
+        async with self._lock:
+            if version == self._version:
+                return False
+            count = version[0]
+            if self._version is not None and self._version[1] is not None and self.index.size:
+                changed = await self._load_changed(db, self._version[1] - self.CHANGE_OVERLAP)
+                if self.index.size == count:
+                    self._features_loaded_at = None
+                    self._version = version
+                    logger.info(f"Updated {changed} character embeddings in the index")
+                    return True
+
+            result = await db.execute(
+                select(CharacterEmbedding.character_id, CharacterEmbedding.dim, CharacterEmbedding.vector)
+                .where(CharacterEmbedding.model == self.model)
+            )
+            rows = result.all()
+            dims = {dim for _, dim, _ in rows}
+            if len(dims) > 1:
+                logger.warning(f"Character embeddings of model {self.model} have mixed dimensions {dims}")
+            dim = max(dims, key=lambda d: sum(1 for _, row_dim, _ in rows if row_dim == d)) if rows else 0
+            rows = [row for row in rows if row[1] == dim]
+
+            # Building an IVF index trains k-means; keep it off the event loop
+            self.index = await asyncio.to_thread(
+                create_character_index,
+                [character_id for character_id, _, _ in rows],
+                self._matrix(rows, dim),
+                previous=self.index
+            )
+            self._features_loaded_at = None
+            self._version = version
+            logger.info(
+                f"Loaded {len(rows)} character embeddings ({dim} dims, {self.index.matrix.dtype}, "
+                f"{type(self.index).__name__})"
+            )
+            return True
+
+    @staticmethod
+    def _matrix(rows: Sequence[Tuple[UUID, int, bytes]], dim: int) -> np.ndarray:
+        matrix = np.empty((len(rows), dim), dtype=np.float32)
+        for i, (_, _, vector) in enumerate(rows):
+            matrix[i] = np.frombuffer(vector, dtype="<f4")
+        return matrix
+
+    async def _load_changed(self, db: AsyncSession, since: datetime) -> int:
+        """Upsert vectors updated since a time into the index"""
+        result = await db.execute(
+            select(CharacterEmbedding.character_id, CharacterEmbedding.dim, CharacterEmbedding.vector)
+            .where(
+                CharacterEmbedding.model == self.model,
+                CharacterEmbedding.dim == self.index.dim,
+                CharacterEmbedding.updated_at >= since
+            )
+        )
+        rows = result.all()
+        self.index.upsert([character_id for character_id, _, _ in rows], self._matrix(rows, self.index.dim))
+        return len(rows)
+
+    async def _load_features(self, db: AsyncSession) -> List[UUID]:
+        """Refresh usage/rating columns of the index; returns templates without a vector"""
+        result = await db.execute(
+            select(Character.id, Character.usage_count, Character.rating_avg, Character.rating_count)
+            .where(Character.is_template == True)
+        )
+        rows = result.all()
+        index = self.index
+        index.set_features(
+            [character_id for character_id, _, _, _ in rows],
+            [usage_count or 0 for _, usage_count, _, _ in rows],
+            [float(rating_avg or 0) for _, _, rating_avg, _ in rows],
+            [rating_count or 0 for _, _, _, rating_count in rows]
+        )
+        self._features_loaded_at = time.monotonic()
+        return [character_id for character_id, _, _, _ in rows if character_id not in index]
+
+    async def refresh(self, db: AsyncSession):
+        """
+        Keep the index current: reload vectors when the table changed, refresh
+        usage/rating at most every CHARACTER_INDEX_FEATURE_TTL seconds, and
+        embed template characters that have no vector yet
+        """
+        await self.load(db)
+        if (
+            self._features_loaded_at is not None
+            and time.monotonic() - self._features_loaded_at < settings.CHARACTER_INDEX_FEATURE_TTL
+        ):
+            return
+        missing = await self._load_features(db)
+        if missing:
+            result = await db.execute(select(Character).where(Character.id.in_(missing)))
+            if await self.sync(db, result.scalars().all()) and await self.load(db):
+                await self._load_features(db)
+
+    async def recommend(
+        self,
+        db: AsyncSession,
+        query: np.ndarray,
+        count: int,
+        weights: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[UUID, float, float]]:
+        """
+        Best template characters for a query embedding
+
+        Returns:
+            (character id, weighted score, similarity), best first
+        """
+        await self.refresh(db)
+        return self.index.top_k(query, count, weights)
+
+
+# Global singleton instance
+_store: Optional[CharacterEmbeddingStore] = None
+
+
+def get_character_embedding_store() -> CharacterEmbeddingStore:
+    """Get the process-wide character embedding store"""
+    global _store
+    if _store is None:
+        _store = CharacterEmbeddingStore()
+    return _store
+
+
+async def build_character_embeddings(force: bool = False) -> int:
+    """Sync the stored embeddings of all template characters (startup and CLI)"""
+    from app.core.database import async_session_factory
+
+    async with async_session_factory() as db:
+        return await get_character_embedding_store().sync(db, force=force)
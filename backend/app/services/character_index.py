@@ -0,0 +1,508 @@
+"""
+In-memory vector indexes of characters for recommendation scoring.
+
+Vectors are normalized once when they enter the index and kept in one
+C-contiguous matrix (float32, or float16 to halve memory), so scoring a
+query is a matrix-vector product. Popularity and rating bonuses are kept
+as NumPy columns and blended with the similarities in one vectorized
+expression (the same formula as compute_weighted_score), and the top k are
+selected with argpartition instead of sorting every candidate.
+
+Two backends share that layout (CHARACTER_INDEX_BACKEND):
+
+- exact (CharacterVectorIndex): scores every character.
+- ivf (IVFCharacterIndex): an inverted file over spherical k-means
+  centroids; a query scores only the characters of its nprobe nearest
+  lists. nlist/nprobe trade recall for latency, see
+  `python -m scripts.bench_character_index`. Below
+  CHARACTER_INDEX_IVF_MIN_SIZE characters it scores exactly.
+
+Both support incremental upsert() and remove(); removed rows are
+tombstoned and compacted away once they make up a quarter of the matrix.
+"""
+import math
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+# Weights of the blended recommendation score
+DEFAULT_WEIGHTS = {"similarity": 0.7, "usage_count": 0.2, "rating": 0.1}
+
+
+def _normalized(vectors: np.ndarray, count: int) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix = matrix.reshape(count, matrix.shape[-1] if matrix.ndim == 2 else -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class CharacterVectorIndex:
+    """Normalized character vectors plus feature columns, scored exactly"""
+
+    # Rows converted to float32 at a time when scoring a float16 matrix
+    # (BLAS has no half-precision kernels, so float16 trades scoring time
+    # for half the memory)
+    FLOAT16_BLOCK_ROWS = 1024
+
+    # Arrays with one entry per row (grown and compacted together)
+    _ROW_ARRAYS = ("_matrix", "_usage_bonus", "_rating_bonus", "_eligible")
+
+    def __init__(self, ids: Sequence[Hashable], vectors: np.ndarray, dtype: str = "float32"):
+        """
+        Build index
+
+        Args:
+            ids: Character ids, one per row of vectors
+            vectors: (n, dim) embedding matrix (any float dtype)
+            dtype: Storage dtype of the normalized matrix ("float32" or "float16")
+        """
+        self.dtype = np.dtype(dtype)
+        self._matrix = np.ascontiguousarray(_normalized(vectors, len(ids)), dtype=self.dtype)
+        self.ids: List[Optional[Hashable]] = list(ids)
+        self.positions: Dict[Hashable, int] = {character_id: i for i, character_id in enumerate(self.ids)}
+        self._rows = len(self.ids)  # Used rows, including removed ones
+        self._removed = 0
+        # Feature bonuses in [0, 1] and recommendable rows, see set_features()
+        self._usage_bonus = np.zeros(self._rows, dtype=np.float32)
+        self._rating_bonus = np.zeros(self._rows, dtype=np.float32)
+        self._eligible = np.ones(self._rows, dtype=bool)
+
+    @classmethod
+    def empty(cls) -> "CharacterVectorIndex":
+        return cls([], np.zeros((0, 0), dtype=np.float32))
+
+    @property
+    def size(self) -> int:
+        """Characters in the index"""
+        return len(self.positions)
+
+    @property
+    def dim(self) -> int:
+        return self._matrix.shape[1]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[:self._rows]
+
+    @property
+    def usage_bonus(self) -> np.ndarray:
+        return self._usage_bonus[:self._rows]
+
+    @property
+    def rating_bonus(self) -> np.ndarray:
+        return self._rating_bonus[:self._rows]
+
+    @property
+    def eligible(self) -> np.ndarray:
+        return self._eligible[:self._rows]
+
+    def __contains__(self, character_id: Hashable) -> bool:
+        return character_id in self.positions
+
+    def set_features(
+        self,
+        ids: Sequence[Hashable],
+        usage_counts: Sequence[float],
+        rating_avgs: Sequence[float],
+        rating_counts: Sequence[float]
+    ):
+        """
+        Replace popularity and rating of all recommendable characters
+
+        Rows missing from ids are excluded from top_k() until they reappear;
+        ids not in the index are ignored.
+        """
+        positions = np.fromiter((self.positions.get(i, -1) for i in ids), dtype=np.int64, count=len(ids))
+        known = positions >= 0
+        positions = positions[known]
+        self.eligible[:] = False
+        self.eligible[positions] = True
+        self.usage_bonus[:] = 0
+        self.rating_bonus[:] = 0
+        usage = np.asarray(usage_counts, dtype=np.float32)[known]
+        rating_avg = np.asarray(rating_avgs, dtype=np.float32)[known]
+        rating_count = np.asarray(rating_counts, dtype=np.float32)[known]
+        # Popularity caps at 100 uses; rating confidence is full at 10 ratings
+        self.usage_bonus[positions] = np.minimum(usage / 100.0, 1.0)
+        self.rating_bonus[positions] = (rating_avg / 5.0) * np.minimum(rating_count / 10.0, 1.0)
+
+    def upsert(self, ids: Sequence[Hashable], vectors: np.ndarray) -> np.ndarray:
+        """
+        Insert characters or replace their vectors (features are kept)
+
+        Returns:
+            Rows written
+        """
+        if not len(ids):
+            return np.zeros(0, dtype=np.int64)
+        vectors = _normalized(vectors, len(ids))
+        if vectors.shape[1] != self.dim:
+            if self.size:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+            self._reset(vectors.shape[1])
+
+        rows = np.empty(len(ids), dtype=np.int64)
+        new = 0
+        for i, character_id in enumerate(ids):
+            position = self.positions.get(character_id)
+            if position is None:
+                position = self._rows + new
+                new += 1
+                self.positions[character_id] = position
+                self.ids.append(character_id)
+            rows[i] = position
+        if new:
+            self._reserve(self._rows + new)
+            start = self._rows
+            self._rows += new
+            self.usage_bonus[start:] = 0
+            self.rating_bonus[start:] = 0
+            self.eligible[start:] = True
+        self.matrix[rows] = vectors
+        return rows
+
+    def remove(self, ids: Sequence[Hashable]) -> int:
+        """Remove characters; returns how many were in the index"""
+        removed = 0
+        for character_id in ids:
+            position = self.positions.pop(character_id, None)
+            if position is not None:
+                self.ids[position] = None
+                self.eligible[position] = False
+                removed += 1
+        self._removed += removed
+        if self._removed > self._rows // 4:
+            self.compact()
+        return removed
+
+    def compact(self):
+        """Drop removed rows from the arrays"""
+        keep = np.fromiter(
+            (i for i, character_id in enumerate(self.ids) if character_id is not None), dtype=np.int64
+        )
+        for name in self._ROW_ARRAYS:
+            setattr(self, name, np.ascontiguousarray(getattr(self, name)[keep]))
+        self.ids = [self.ids[i] for i in keep]
+        self.positions = {character_id: i for i, character_id in enumerate(self.ids)}
+        self._rows = len(self.ids)
+        self._removed = 0
+
+    def _reset(self, dim: int):
+        """Drop every row and switch to vectors of another dimension"""
+        self._matrix = np.zeros((0, dim), dtype=self.dtype)
+        for name in self._ROW_ARRAYS[1:]:
+            setattr(self, name, np.zeros(0, dtype=getattr(self, name).dtype))
+        self.ids = []
+        self.positions = {}
+        self._rows = 0
+        self._removed = 0
+
+    def _reserve(self, rows: int):
+        """Grow the row arrays (doubling) to hold at least rows"""
+        capacity = len(self._matrix)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 64)
+        for name in self._ROW_ARRAYS:
+            array = getattr(self, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self._rows] = array[:self._rows]
+            setattr(self, name, grown)
+
+    def _query(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Normalized float32 query, or None if it can't be compared"""
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or query.shape[0] != self.dim:
+            return None
+        return query / norm
+
+    def _rows_as_float32(self, rows: Optional[np.ndarray], start: int, stop: int, buffer: np.ndarray) -> np.ndarray:
+        """Rows start:stop (of all rows, or of the given rows) converted into buffer"""
+        block = self.matrix[start:stop] if rows is None else self.matrix[rows[start:stop]]
+        out = buffer[:len(block)]
+        out[...] = block
+        return out
+
+    def _similarities(self, query: Optional[np.ndarray], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        count = self._rows if rows is None else len(rows)
+        out = np.zeros(count, dtype=np.float32)
+        if query is None or not count:
+            return out
+        if self.dtype == np.float32:
+            matrix = self.matrix if rows is None else self.matrix[rows]
+            np.dot(matrix, query, out=out)
+        else:
+            buffer = np.empty((min(self.FLOAT16_BLOCK_ROWS, count), self.dim), dtype=np.float32)
+            for start in range(0, count, self.FLOAT16_BLOCK_ROWS):
+                stop = min(start + self.FLOAT16_BLOCK_ROWS, count)
+                np.dot(self._rows_as_float32(rows, start, stop, buffer), query, out=out[start:stop])
+        return out
+
+    def similarities(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every row to the query (zeros if it can't be compared)"""
+        return self._similarities(self._query(query))
+
+    def scores(
+        self,
+        similarities: np.ndarray,
+        weights: Optional[Dict[str, float]] = None,
+        rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Blended recommendation score of every row (or of rows), capped at 1.0"""
+        weights = weights or DEFAULT_WEIGHTS
+        usage_bonus = self.usage_bonus if rows is None else self.usage_bonus[rows]
+        rating_bonus = self.rating_bonus if rows is None else self.rating_bonus[rows]
+        scores = similarities * np.float32(weights["similarity"])
+        scores += usage_bonus * np.float32(weights["usage_count"])
+        scores += rating_bonus * np.float32(weights["rating"])
+        return np.minimum(scores, 1.0, out=scores)
+
+    def _rank(
+        self,
+        query: Optional[np.ndarray],
+        rows: Optional[np.ndarray],
+        k: int,
+        weights: Optional[Dict[str, float]]
+    ) -> List[Tuple[Hashable, float, float]]:
+        """Top k of the candidate rows (None = all rows)"""
+        eligible = self.eligible if rows is None else self.eligible[rows]
+        k = min(k, int(np.count_nonzero(eligible)))
+        if k <= 0:
+            return []
+        similarities = self._similarities(query, rows)
+        scores = self.scores(similarities, weights, rows)
+        scores[~eligible] = -np.inf
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        positions = top if rows is None else rows[top]
+        return [(self.ids[p], float(scores[i]), float(similarities[i])) for i, p in zip(top, positions)]
+
+    def top_k(
+        self,
+        query: np.ndarray,
+        k: int,
+        weights: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[Hashable, float, float]]:
+        """
+        Best k characters for a query embedding
+
+        Returns:
+            (character id, weighted score, similarity), best first
+        """
+        return self._rank(self._query(query), None, k, weights)
+
+
+class IVFCharacterIndex(CharacterVectorIndex):
+    """Inverted-file index: score only the lists nearest to the query"""
+
+    _ROW_ARRAYS = CharacterVectorIndex._ROW_ARRAYS + ("_assignments",)
+
+    # k-means training: sampled rows per list and Lloyd iterations
+    TRAIN_ROWS_PER_LIST = 64
+    TRAIN_ITERATIONS = 10
+
+    # Retrain when the index grew or shrank by this factor since training
+    RETRAIN_FACTOR = 2.0
+
+    def __init__(
+        self,
+        ids: Sequence[Hashable],
+        vectors: np.ndarray,
+        dtype: str = "float32",
+        nlist: int = None,
+        nprobe: int = None,
+        min_size: int = None,
+        centroids: Optional[np.ndarray] = None,
+        seed: int = 0
+    ):
+        """
+        Build index
+
+        Args:
+            ids: Character ids, one per row of vectors
+            vectors: (n, dim) embedding matrix
+            dtype: Storage dtype of the normalized matrix
+            nlist: Number of lists (0 = square root of the index size)
+            nprobe: Lists scored per query
+            min_size: Below this size every row is scored exactly
+            centroids: Trained centroids to reuse (e.g. of the index this one replaces)
+            seed: k-means seed
+        """
+        super().__init__(ids, vectors, dtype)
+        self.nlist = settings.CHARACTER_INDEX_IVF_NLIST if nlist is None else nlist
+        self.nprobe = settings.CHARACTER_INDEX_IVF_NPROBE if nprobe is None else nprobe
+        self.min_size = settings.CHARACTER_INDEX_IVF_MIN_SIZE if min_size is None else min_size
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self._assignments = np.zeros(self._rows, dtype=np.int32)
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        if centroids is not None and centroids.ndim == 2 and len(centroids) and centroids.shape[1] == self.dim:
+            self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+            self.trained_size = self.size
+            self._assign(np.arange(self._rows))
+        else:
+            self._maybe_train()
+
+    @classmethod
+    def empty(cls) -> "IVFCharacterIndex":
+        return cls([], np.zeros((0, 0), dtype=np.float32))
+
+    @property
+    def assignments(self) -> np.ndarray:
+        return self._assignments[:self._rows]
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _maybe_train(self):
+        if self.size < max(self.min_size, 1):
+            return
+        if (
+            not self.trained
+            or self.size > self.trained_size * self.RETRAIN_FACTOR
+            or self.size * self.RETRAIN_FACTOR < self.trained_size
+        ):
+            self.train()
+
+    def train(self, nlist: int = None):
+        """Fit the list centroids (spherical k-means) and reassign every row"""
+        live = np.fromiter(self.positions.values(), dtype=np.int64, count=self.size)
+        if not len(live):
+            return
+        nlist = nlist or self.nlist or int(round(math.sqrt(len(live))))
+        nlist = max(1, min(nlist, len(live)))
+        rng = np.random.default_rng(self.seed)
+        sample = np.sort(rng.choice(live, min(len(live), nlist * self.TRAIN_ROWS_PER_LIST), replace=False))
+        data = self.matrix[sample].astype(np.float32)
+
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(self.TRAIN_ITERATIONS):
+            labels = self._nearest(data, centroids)
+            counts = np.bincount(labels, minlength=nlist)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            centroids[filled] = np.add.reduceat(data[np.argsort(labels, kind="stable")], starts[filled], axis=0)
+            # Reseed empty lists with random sample rows
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms == 0, 1, norms)
+
+        self.centroids = centroids
+        self.trained_size = len(live)
+        self._assign(np.arange(self._rows))
+
+    @staticmethod
+    def _nearest(data: np.ndarray, centroids: np.ndarray, block: int = 4096) -> np.ndarray:
+        labels = np.empty(len(data), dtype=np.int32)
+        for start in range(0, len(data), block):
+            labels[start:start + block] = np.argmax(data[start:start + block] @ centroids.T, axis=1)
+        return labels
+
+    def _assign(self, rows: np.ndarray):
+        """Put rows in the list of their nearest centroid"""
+        if not self.trained or not len(rows):
+            return
+        buffer = np.empty((min(self.FLOAT16_BLOCK_ROWS, len(rows)), self.dim), dtype=np.float32)
+        for start in range(0, len(rows), self.FLOAT16_BLOCK_ROWS):
+            stop = min(start + self.FLOAT16_BLOCK_ROWS, len(rows))
+            block = self._rows_as_float32(rows, start, stop, buffer)
+            self.assignments[rows[start:stop]] = np.argmax(block @ self.centroids.T, axis=1)
+        self._lists = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows grouped by list, and where each list's group starts"""
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            offsets = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def upsert(self, ids: Sequence[Hashable], vectors: np.ndarray) -> np.ndarray:
+        if len(ids) and not self.size and np.asarray(vectors).shape[-1] != self.dim:
+            self.centroids = None
+            self.trained_size = 0
+        rows = super().upsert(ids, vectors)
+        self._assign(rows)
+        self._maybe_train()
+        return rows
+
+    def remove(self, ids: Sequence[Hashable]) -> int:
+        # Removed rows stay in their lists as ineligible until compaction
+        removed = super().remove(ids)
+        if removed:
+            self._maybe_train()
+        return removed
+
+    def compact(self):
+        super().compact()
+        self._lists = None
+
+    def top_k(
+        self,
+        query: np.ndarray,
+        k: int,
+        weights: Optional[Dict[str, float]] = None,
+        nprobe: int = None
+    ) -> List[Tuple[Hashable, float, float]]:
+        """
+        Best k characters for a query embedding, from the nprobe nearest lists
+
+        Returns:
+            (character id, weighted score, similarity), best first
+        """
+        query = self._query(query)
+        nprobe = nprobe or self.nprobe
+        if query is None or not self.trained or self.size < self.min_size or nprobe >= len(self.centroids):
+            return self._rank(query, None, k, weights)
+
+        order, offsets = self._inverted_lists()
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes]))
+        if np.count_nonzero(self.eligible[rows]) < k:
+            # Too few candidates in the probed lists
+            return self._rank(query, None, k, weights)
+        return self._rank(query, rows, k, weights)
+
+
+def create_character_index(
+    ids: Sequence[Hashable],
+    vectors: np.ndarray,
+    previous: Optional[CharacterVectorIndex] = None,
+    backend: str = None,
+    dtype: str = None
+) -> CharacterVectorIndex:
+    """
+    Build an index of the configured backend
+
+    Args:
+        ids: Character ids, one per row of vectors
+        vectors: (n, dim) embedding matrix
+        previous: Index being replaced (its IVF centroids are reused while the size is comparable)
+        backend: "exact" or "ivf" (default CHARACTER_INDEX_BACKEND)
+        dtype: Matrix dtype (default CHARACTER_INDEX_DTYPE)
+    """
+    backend = backend or settings.CHARACTER_INDEX_BACKEND
+    dtype = dtype or settings.CHARACTER_INDEX_DTYPE
+    if backend == "exact":
+        return CharacterVectorIndex(ids, vectors, dtype=dtype)
+    if backend == "ivf":
+        centroids = None
+        if (
+            isinstance(previous, IVFCharacterIndex)
+            and previous.trained
+            and len(ids) <= previous.trained_size * IVFCharacterIndex.RETRAIN_FACTOR
+            and len(ids) * IVFCharacterIndex.RETRAIN_FACTOR >= previous.trained_size
+        ):
+            centroids = previous.centroids
+        return IVFCharacterIndex(ids, vectors, dtype=dtype, centroids=centroids)
+    raise ValueError(f"Unknown character index backend: {backend}")
@@ -6,6 +6,7 @@ import random
 
 from app.models.character import Character
 from app.schemas.character import CharacterCreate, CharacterUpdate, CharacterResponse
+from app.services.character_embeddings import get_character_embedding_store
 
 
 class CharacterService:
@@ -77,6 +78,7 @@ class CharacterService:
         self.db.add(character)
         await self.db.commit()
         await self.db.refresh(character)
+        get_character_embedding_store().schedule_refresh(character)
         return character
 
     async def update_character(
@@ -112,6 +114,7 @@ class CharacterService:
 
         await self.db.commit()
         await self.db.refresh(character)
+        get_character_embedding_store().schedule_refresh(character)
         return character
 
     async def delete_character(
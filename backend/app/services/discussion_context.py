@@ -0,0 +1,174 @@
+"""
+Incremental conversation history for a running discussion.
+
+The discussion loop owns one DiscussionContext per discussion. Messages are
+appended once as they are produced, each round's history block is rendered
+once and cached, and prompts are assembled by concatenating cached blocks.
+Postgres is only read on cold start, on resume, or after the live feed of
+injected questions was interrupted. Rounds older than the history window are
+represented by the summaries stored in the background after each round.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.message import DiscussionMessage
+from app.services.discussion_events import DiscussionEventType
+from app.services.participant_roster import ParticipantRosterService
+from app.services.round_summaries import get_round_summaries
+
+logger = logging.getLogger(__name__)
+
+
+class DiscussionContext:
+    """Per-discussion transcript with cached, pre-rendered round blocks"""
+
+    PHASE_ORDER = ["opening", "development", "debate", "closing"]
+    PHASE_LABELS = {
+        "opening": "Opening",
+        "development": "Development",
+        "debate": "Debate",
+        "closing": "Closing"
+    }
+
+    # Previous rounds shown in full next to the current one
+    HISTORY_ROUNDS = 2
+
+    def __init__(self, discussion_id: UUID):
+        self.discussion_id = discussion_id
+        # round -> phase -> rendered "Name: content" lines
+        self._lines: Dict[int, Dict[str, List[str]]] = {}
+        # round -> rendered body, dropped when the round receives a message
+        self._round_blocks: Dict[int, str] = {}
+        # round -> stored summary, for rounds before the history window
+        self._summaries: Dict[int, str] = {}
+        # Set when live updates may have been missed; forces a reload
+        self.stale = False
+        # Set by an injected question until the next message answers it
+        self.pending_question = False
+
+    @classmethod
+    async def load(
+        cls,
+        db: AsyncSession,
+        discussion_id: UUID,
+        current_round: int,
+        roster: Dict[str, Dict[str, Any]]
+    ) -> "DiscussionContext":
+        """Build a context from the messages stored in Postgres"""
+        context = cls(discussion_id)
+        await context.reload(db, current_round, roster)
+        return context
+
+    async def reload(self, db: AsyncSession, current_round: int, roster: Dict[str, Dict[str, Any]]):
+        """Re-read the history window from Postgres, naming speakers from the roster"""
+        from_round = max(0, current_round - self.HISTORY_ROUNDS)
+        result = await db.execute(
+            select(
+                DiscussionMessage.participant_id,
+                DiscussionMessage.is_injected_question,
+                DiscussionMessage.round,
+                DiscussionMessage.phase,
+                DiscussionMessage.content
+            )
+            .where(
+                and_(
+                    DiscussionMessage.discussion_id == self.discussion_id,
+                    DiscussionMessage.round >= from_round,
+                    DiscussionMessage.round <= current_round
+                )
+            )
+            .order_by(DiscussionMessage.created_at.asc())
+        )
+
+        self._summaries = await get_round_summaries(db, self.discussion_id, before_round=from_round)
+        self._lines.clear()
+        self._round_blocks.clear()
+        self.stale = False
+        for participant_id, is_injected_question, round_num, phase, content in result.all():
+            name = ParticipantRosterService.speaker_name(roster, participant_id, is_injected_question)
+            self.add_message(round_num, phase, name, content)
+
+    def add_message(self, round: int, phase: str, name: str, content: str):
+        """Append a finished message to the transcript"""
+        self._lines.setdefault(round, {}).setdefault(phase, []).append(f"{name}: {content}")
+        self._round_blocks.pop(round, None)
+
+    def add_summary(self, round: int, summary: str):
+        """Record a round summary produced in the background"""
+        self._summaries[round] = summary
+
+    def missing_summaries(self, current_round: int) -> List[int]:
+        """Rounds before the history window that have no summary yet"""
+        return [
+            r for r in range(max(0, current_round - self.HISTORY_ROUNDS))
+            if r not in self._summaries
+        ]
+
+    def handle_event(self, event: Optional[Dict[str, Any]]):
+        """Event bus listener: pick up questions injected from any worker"""
+        if event is None:
+            self.stale = True
+        elif event["type"] == DiscussionEventType.QUESTION_INJECTED:
+            data = event["data"]
+            self.add_message(data["round"], data["phase"], "User", data["content"])
+            self.pending_question = True
+
+    def prune(self, current_round: int):
+        """Forget rounds that have left the history window"""
+        for round_num in [r for r in self._lines if r < current_round - self.HISTORY_ROUNDS]:
+            del self._lines[round_num]
+            self._round_blocks.pop(round_num, None)
+
+    def _render_round(self, round_num: int) -> str:
+        block = self._round_blocks.get(round_num)
+        if block is None:
+            parts = []
+            round_data = self._lines[round_num]
+            for phase_name in self.PHASE_ORDER:
+                if phase_name in round_data:
+                    parts.append(f"\n[{self.PHASE_LABELS[phase_name]} Phase]")
+                    parts.extend(round_data[phase_name])
+            block = "\n".join(parts)
+            self._round_blocks[round_num] = block
+        return block
+
+    def render_history_parts(self, current_round: int) -> Tuple[str, str]:
+        """
+        Conversation history split into (earlier, current) sections
+
+        The earlier section (header, summaries and previous rounds) stays
+        the same for a whole round, so it can be cached as a prompt prefix;
+        the current round section grows with every message.
+        """
+        first_full_round = current_round - self.HISTORY_ROUNDS
+        summarized = [r for r in sorted(self._summaries) if r < first_full_round]
+        rounds = [
+            r for r in sorted(self._lines)
+            if first_full_round <= r <= current_round
+        ]
+        if not rounds and not summarized:
+            return "", ""
+
+        earlier = ["\n=== Conversation History ==="]
+        # Earlier rounds: precomputed summaries
+        for round_num in summarized:
+            earlier.append(f"\n--- Round {round_num + 1} Summary ---")
+            earlier.append(self._summaries[round_num])
+        current = []
+        for round_num in rounds:
+            if round_num == current_round:
+                current.append(f"\n--- Current Round (Round {round_num + 1}) ---")
+                current.append(self._render_round(round_num))
+            else:
+                earlier.append(f"\n--- Round {round_num + 1} (Previous) ---")
+                earlier.append(self._render_round(round_num))
+        return "\n".join(earlier), "\n".join(current)
+
+    def render_history(self, current_round: int) -> str:
+        """Conversation history section of the prompt (empty if nothing was said)"""
+        earlier, current = self.render_history_parts(current_round)
+        return "\n".join(part for part in (earlier, current) if part)
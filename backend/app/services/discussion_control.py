@@ -0,0 +1,113 @@
+"""
+Control signals for a running discussion loop.
+
+pause/stop/inject publish their state change on the discussion event bus
+(Redis pub/sub), so the worker running the loop hears about it wherever the
+request was served. The loop waits on local asyncio events instead of
+re-reading the discussion from Postgres before every turn; a pause takes
+effect after the current message, a stop interrupts it mid-stream.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from app.services.discussion_events import DiscussionEventType, TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class DiscussionRunControl:
+    """Status of one running discussion as seen by its loop"""
+
+    def __init__(
+        self,
+        discussion_id: UUID,
+        on_question: Optional[Callable[[Optional[Dict[str, Any]]], None]] = None
+    ):
+        """
+        Initialize control
+
+        Args:
+            discussion_id: Discussion the loop runs
+            on_question: Called with QUESTION_INJECTED events, and with None
+                when the live feed was interrupted
+        """
+        self.discussion_id = discussion_id
+        self.on_question = on_question
+        self.status = "running"
+        # Set when the live feed was interrupted; status must be re-read
+        self.resync_needed = False
+        self._halted = asyncio.Event()
+        self._stopped = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+
+    def apply_status(self, status: str):
+        """Record a status change; leaving "running" is final for this loop"""
+        # A paused loop exits and resume schedules a new one, so "running"
+        # never revives this loop
+        if status == "running" or not self.running:
+            return
+        logger.info(f"Discussion {self.discussion_id} signalled: {status}")
+        self.status = status
+        self._halted.set()
+        if status in TERMINAL_STATUSES:
+            self._stopped.set()
+
+    def handle_event(self, event: Optional[Dict[str, Any]]):
+        """Event bus listener"""
+        if event is None:
+            self.resync_needed = True
+            if self.on_question:
+                self.on_question(None)
+        elif event["type"] == DiscussionEventType.STATE:
+            self.apply_status(event["data"].get("status"))
+        elif event["type"] == DiscussionEventType.QUESTION_INJECTED and self.on_question:
+            self.on_question(event)
+
+    async def wait_halted(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the discussion leaves "running"
+
+        Returns:
+            True if it did, False if the timeout elapsed first
+        """
+        if timeout is not None and timeout <= 0:
+            return self._halted.is_set()
+        try:
+            await asyncio.wait_for(self._halted.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def run_until_stopped(self, coro) -> bool:
+        """
+        Run a coroutine, cancelling it if the discussion is stopped meanwhile
+
+        A pause lets the coroutine finish; the loop exits after it.
+
+        Returns:
+            True if the coroutine completed, False if it was cancelled
+        """
+        task = asyncio.ensure_future(coro)
+        stopped = asyncio.ensure_future(self._stopped.wait())
+        try:
+            await asyncio.wait({task, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            stopped.cancel()
+        if task.done():
+            task.result()
+            return True
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return False
@@ -1,8 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select, and_, desc, update
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Awaitable
 from datetime import datetime
-from uuid import UUID
+from uuid import UUID, uuid4
 import asyncio
 import logging
 
@@ -11,9 +11,24 @@ from app.models.participant import DiscussionParticipant
 from app.models.message import DiscussionMessage
 from app.models.topic import Topic
 from app.models.character import Character
-from app.schemas.discussion import DiscussionCreate, DiscussionUpdate, DiscussionControl
+from app.schemas.discussion import DiscussionCreate, DiscussionUpdate
+from app.schemas.message import MessageResponse
 from app.services.llm_orchestrator import LLMOrchestrator
-from app.core.redis import CacheService
+from app.services.llm_messages import ChatPrompt, PromptBlock
+from app.services.llm_stream import LLMUsage
+from app.services.llm_scheduler import LLMPriority
+from app.services.llm_tasks import LLMTaskClass
+from app.services.discussion_events import DiscussionEventType, get_event_broker
+from app.services.message_drafts import MessageDraft, MessageDraftStore
+from app.services.discussion_scheduler import DiscussionLease, LeaseLostError, get_discussion_scheduler
+from app.services.discussion_context import DiscussionContext
+from app.services.discussion_control import DiscussionRunControl
+from app.services.discussion_pacing import PacingMode, PacingPolicy
+from app.services.participant_roster import ParticipantRosterService
+from app.services.round_summaries import RoundSummaryService
+from app.services.usage_meter import get_usage_meter
+from app.core.config import settings
+from app.core.redis import CacheService, get_event_bus
 
 logger = logging.getLogger(__name__)
 
@@ -29,14 +44,35 @@ class DiscussionEngineService:
         "closing": "Summarize your position and attempt to find common ground or clarify differences."
     }
 
-    # Track running discussions
-    _running_tasks: Dict[UUID, asyncio.Task] = {}
+    # Phases whose turns don't build on each other; all participants
+    # speak from the same history and are generated concurrently
+    INDEPENDENT_PHASES = {"opening"}
 
-    def __init__(self, db: AsyncSession, llm_orchestrator: LLMOrchestrator, cache: CacheService, session_factory: async_sessionmaker = None):
+    # Discussion modes in which every phase is independent
+    INDEPENDENT_MODES = set()
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        llm_orchestrator: LLMOrchestrator,
+        cache: CacheService,
+        session_factory: async_sessionmaker = None,
+        lease: Optional[DiscussionLease] = None
+    ):
         self.db = db
         self.llm_orchestrator = llm_orchestrator
         self.cache = cache
         self.session_factory = session_factory
+        # Scheduler lease the loop runs under; its writes stop once it is lost
+        self.lease = lease
+        self.event_broker = get_event_broker()
+        self.drafts = MessageDraftStore(cache.redis, lease=lease)
+        # Control of the loop this engine runs (None outside the loop)
+        self.control: Optional[DiscussionRunControl] = None
+        self.roster = ParticipantRosterService(cache)
+        self.summarizer = RoundSummaryService(llm_orchestrator, session_factory)
+        # Stable prompt prefixes per character (reused so providers can cache them)
+        self._persona_prompts: Dict[UUID, ChatPrompt] = {}
 
     async def get_discussion_by_id(
         self,
@@ -60,7 +96,7 @@ class DiscussionEngineService:
         if discussion:
             _ = discussion.id, discussion.topic_id, discussion.user_id
             _ = discussion.discussion_mode, discussion.max_rounds, discussion.status
-            _ = discussion.current_round, discussion.current_phase
+            _ = discussion.current_round, discussion.current_phase, discussion.pacing
             _ = discussion.llm_provider, discussion.llm_model
             _ = discussion.total_tokens_used, discussion.estimated_cost_usd
             _ = discussion.started_at, discussion.completed_at
@@ -100,6 +136,10 @@ class DiscussionEngineService:
         if not (3 <= len(characters) <= 7):
             raise ValueError("Discussion must have 3-7 characters")
 
+        pacing = discussion_data.pacing or PacingPolicy().mode
+        if pacing not in PacingMode.ALL:
+            raise ValueError(f"Unknown pacing mode: {pacing}")
+
         # Create discussion
         discussion = Discussion(
             topic_id=discussion_data.topic_id,
@@ -108,7 +148,8 @@ class DiscussionEngineService:
             max_rounds=discussion_data.max_rounds,
             status="initialized",
             current_round=0,
-            current_phase="opening"
+            current_phase="opening",
+            pacing=pacing
         )
         self.db.add(discussion)
         await self.db.flush()
@@ -128,6 +169,7 @@ class DiscussionEngineService:
 
         await self.db.commit()
         await self.db.refresh(discussion)
+        await self.roster.invalidate(discussion.id)
 
         # Cache discussion state
         await self._cache_discussion_state(discussion)
@@ -148,9 +190,8 @@ class DiscussionEngineService:
         if discussion.status != "initialized":
             raise ValueError(f"Discussion is not in initialized state: {discussion.status}")
 
-        # Get LLM provider
-        provider = self.llm_orchestrator.get_provider(provider_name)
-        if not provider:
+        # Get LLM provider ("auto" routes each request between the user's providers)
+        if not self.llm_orchestrator.is_available(provider_name):
             raise ValueError(f"LLM provider not found: {provider_name}")
 
         # Update discussion
@@ -165,17 +206,9 @@ class DiscussionEngineService:
         # Cache discussion state (do this before starting background task)
         await self._cache_discussion_state(discussion)
 
-        # Start background task to run discussion (with its own session)
-        # Don't await it - let it run in background
-        if discussion_id not in self._running_tasks or self._running_tasks[discussion_id].done():
-            if not self.session_factory:
-                logger.warning(f"No session factory provided, background task may fail for discussion {discussion_id}")
-            # Don't use asyncio.create_task here - it will be scheduled automatically
-            # Just return and let the task run
-            logger.info(f"Creating background task for discussion {discussion_id}")
-            task = asyncio.create_task(self._run_discussion_loop(discussion_id, provider_name))
-            self._running_tasks[discussion_id] = task
-            logger.info(f"Background task created and stored for discussion {discussion_id}, task done: {task.done()}")
+        # Hand the loop to the scheduler; any worker may claim and run it
+        scheduler = await get_discussion_scheduler()
+        await scheduler.enqueue(discussion_id, user_id, provider_name)
 
         # Return the discussion - it's still attached to session but that's OK
         # FastAPI will handle the session cleanup after response is sent
@@ -196,8 +229,8 @@ class DiscussionEngineService:
 
         discussion.status = "paused"
 
-        # Note: Background task will check status and stop on next iteration
-        # We don't cancel the task immediately to allow graceful shutdown
+        # The loop is signalled by the state event published below; it
+        # finishes the current message and exits, and resume schedules it again
 
         await self.db.commit()
 
@@ -229,6 +262,11 @@ class DiscussionEngineService:
 
         await self._cache_discussion_state(discussion)
 
+        # The loop exits when paused, so schedule it again
+        if discussion.llm_provider:
+            scheduler = await get_discussion_scheduler()
+            await scheduler.enqueue(discussion_id, user_id, discussion.llm_provider)
+
         return discussion
 
     async def stop_discussion(
@@ -246,13 +284,10 @@ class DiscussionEngineService:
         if discussion.status in ["completed", "failed"]:
             raise ValueError(f"Discussion is already {discussion.status}")
 
-        # Cancel background task if running
-        if discussion_id in self._running_tasks:
-            task = self._running_tasks[discussion_id]
-            if not task.done():
-                task.cancel()
-            del self._running_tasks[discussion_id]
-            logger.info(f"Cancelled background task for discussion {discussion_id}")
+        # Drop the scheduled job; the running loop, on whichever worker,
+        # is signalled by the state event published below
+        scheduler = await get_discussion_scheduler()
+        await scheduler.remove(discussion_id)
 
         discussion.status = "completed"
         discussion.completed_at = datetime.utcnow()
@@ -302,6 +337,16 @@ class DiscussionEngineService:
         await self.db.commit()
         await self.db.refresh(message)
 
+        await self.event_broker.publish(discussion.id, DiscussionEventType.QUESTION_INJECTED, {
+            "message_id": str(message.id),
+            "participant_id": str(message.participant_id),
+            "character_name": "User",
+            "content": message.content,
+            "round": message.round,
+            "phase": message.phase,
+            "created_at": message.created_at.isoformat() if message.created_at else None
+        })
+
         return message
 
     async def get_user_discussions(
@@ -326,21 +371,40 @@ class DiscussionEngineService:
         user_id: UUID,
         skip: int = 0,
         limit: int = 100
-    ) -> List[DiscussionMessage]:
-        """Get messages for a discussion"""
+    ) -> List[MessageResponse]:
+        """Get messages for a discussion, with their speakers' character info"""
         # Verify user owns discussion
         discussion = await self.get_discussion_by_id(discussion_id, user_id)
         if not discussion:
             raise ValueError("Discussion not found")
 
+        # Injected questions have no participant row, hence the outer joins
         result = await self.db.execute(
-            select(DiscussionMessage)
+            select(DiscussionMessage, Character.name, Character.avatar_url)
+            .outerjoin(DiscussionParticipant, DiscussionMessage.participant_id == DiscussionParticipant.id)
+            .outerjoin(Character, DiscussionParticipant.character_id == Character.id)
             .where(DiscussionMessage.discussion_id == discussion_id)
             .order_by(DiscussionMessage.created_at)
             .offset(skip)
             .limit(limit)
         )
-        return list(result.scalars().all())
+        return [
+            MessageResponse(
+                id=msg.id,
+                discussion_id=msg.discussion_id,
+                participant_id=msg.participant_id,
+                character_name="User" if msg.is_injected_question else (character_name or "Unknown"),
+                character_avatar_url=None if msg.is_injected_question else character_avatar_url,
+                content=msg.content,
+                phase=msg.phase,
+                round=msg.round,
+                token_count=msg.token_count,
+                is_injected_question=msg.is_injected_question,
+                metadata=msg.meta_data,
+                created_at=msg.created_at
+            )
+            for msg, character_name, character_avatar_url in result.all()
+        ]
 
     async def get_discussion_state(
         self,
@@ -361,24 +425,10 @@ class DiscussionEngineService:
         if not discussion:
             return None
 
-        # Calculate progress including phases
-        phases = list(self.PHASES.keys())
-        current_phase_index = phases.index(discussion.current_phase) if discussion.current_phase in phases else 0
-        total_phases = len(phases)
-        phase_progress = current_phase_index / total_phases
-        progress_percentage = ((discussion.current_round + phase_progress) / discussion.max_rounds * 100) if discussion.max_rounds > 0 else 0
-
-        return {
-            "id": str(discussion.id),
-            "status": discussion.status,
-            "current_round": discussion.current_round,
-            "max_rounds": discussion.max_rounds,
-            "current_phase": discussion.current_phase,
-            "progress_percentage": min(progress_percentage, 100)
-        }
+        return self.build_discussion_state(discussion)
 
-    async def _cache_discussion_state(self, discussion: Discussion):
-        """Cache discussion state"""
+    def build_discussion_state(self, discussion: Discussion) -> Dict[str, Any]:
+        """Build the state snapshot shared by the cache and live viewers"""
         # Calculate progress including phases (each round has 4 phases)
         phases = list(self.PHASES.keys())
         current_phase_index = phases.index(discussion.current_phase) if discussion.current_phase in phases else 0
@@ -399,14 +449,37 @@ class DiscussionEngineService:
             "current_phase": discussion.current_phase,
             "progress_percentage": min(progress_percentage, 100)  # Cap at 100%
         }
+        return state
+
+    async def _cache_discussion_state(self, discussion: Discussion):
+        """Cache discussion state"""
+        state = self.build_discussion_state(discussion)
+        if self.control is not None and discussion.status == "running":
+            # The loop's row is not refreshed on pause/stop; its control is
+            state["status"] = self.control.status
 
         cache_key = f"discussion_state:{discussion.id}"
         # Cache for 1 hour or until discussion completes
-        ttl = 3600 if discussion.status == "running" else 86400
+        ttl = 3600 if state["status"] == "running" else 86400
         await self.cache.set(cache_key, state, ttl=ttl)
 
-    async def _run_discussion_loop(self, discussion_id: UUID, provider_name: str):
-        """Run the discussion loop in background"""
+        # Push phase/round/status transitions to live viewers
+        await self.event_broker.publish(discussion.id, DiscussionEventType.STATE, state)
+
+    async def _run_discussion_loop(
+        self,
+        discussion_id: UUID,
+        provider_name: str,
+        on_phase_complete: Optional[Callable[[], Awaitable[bool]]] = None
+    ):
+        """
+        Run the discussion loop in background
+
+        Each iteration runs one phase and checkpoints it by advancing the
+        discussion in Postgres. on_phase_complete is awaited after every
+        checkpoint; returning False means the lease was lost and the loop
+        stops with LeaseLostError, leaving the discussion to its new owner.
+        """
         logger.info(f"Starting discussion loop for {discussion_id}")
 
         # Create a new session for the background task
@@ -418,24 +491,71 @@ class DiscussionEngineService:
 
         async with self.session_factory() as db:
             logger.info(f"Database session created for discussion {discussion_id}")
+
+            # In-memory transcript, kept current with questions injected
+            # through any worker
+            context = DiscussionContext(discussion_id)
+            # Pause/stop arrive as state events over the event bus
+            control = DiscussionRunControl(discussion_id, on_question=context.handle_event)
+            self.control = control
+            bus = None
             try:
+                # Persist drafts left behind by a previous loop that died mid-stream
+                await self.drafts.recover(db, discussion_id)
+
+                # Listen before reading the status so no signal is missed
+                bus = await get_event_bus()
+                await bus.add_listener(discussion_id, control.handle_event)
+
+                result = await db.execute(
+                    select(Discussion).where(Discussion.id == discussion_id)
+                )
+                discussion = result.scalar_one_or_none()
+                if not discussion:
+                    logger.warning(f"Discussion {discussion_id} not found, stopping loop")
+                    return
+                control.apply_status(discussion.status)
+                pacing = self.get_pacing_policy(discussion)
+
+                # Participants and topic don't change while a discussion runs
+                participants_result = await db.execute(
+                    select(DiscussionParticipant, Character)
+                    .join(Character, DiscussionParticipant.character_id == Character.id)
+                    .where(DiscussionParticipant.discussion_id == discussion_id)
+                    .order_by(DiscussionParticipant.position)
+                )
+                participants = participants_result.all()
+
+                if not participants:
+                    logger.error(f"No participants found for discussion {discussion_id}")
+                    return
+
+                topic_result = await db.execute(
+                    select(Topic).where(Topic.id == discussion.topic_id)
+                )
+                topic = topic_result.scalar_one_or_none()
+
+                if not topic:
+                    logger.error(f"Topic not found for discussion {discussion_id}")
+                    return
+
+                roster = await self.roster.get_roster(db, discussion_id)
+                await context.reload(db, discussion.current_round, roster)
+                self._schedule_missing_summaries(discussion, provider_name, context)
+
                 iteration = 0
                 while True:
                     iteration += 1
                     logger.info(f"Discussion {discussion_id}: Starting iteration {iteration}")
-                    # Refresh discussion from database
-                    result = await db.execute(
-                        select(Discussion).where(Discussion.id == discussion_id)
-                    )
-                    discussion = result.scalar_one_or_none()
 
-                    if not discussion:
-                        logger.warning(f"Discussion {discussion_id} not found, stopping loop")
-                        break
+                    if control.resync_needed:
+                        # Signals may have been missed; read the status once
+                        control.resync_needed = False
+                        await self._refresh_status(db, discussion, control)
 
                     # Check if discussion is still running
-                    if discussion.status != "running":
-                        logger.info(f"Discussion {discussion_id} status is {discussion.status}, stopping loop")
+                    if not control.running:
+                        logger.info(f"Discussion {discussion_id} status is {control.status}, stopping loop")
                         break
 
                     # Check if discussion is complete
@@ -443,80 +563,102 @@ class DiscussionEngineService:
                         logger.info(f"Discussion {discussion_id} reached max rounds, completing")
                         discussion.status = "completed"
                         discussion.completed_at = datetime.utcnow()
+                        await self._check_lease()
                         await db.commit()
                         await self._cache_discussion_state(discussion)
                         break
 
-                    # Get participants
-                    participants_result = await db.execute(
-                        select(DiscussionParticipant, Character)
-                        .join(Character, DiscussionParticipant.character_id == Character.id)
-                        .where(DiscussionParticipant.discussion_id == discussion_id)
-                        .order_by(DiscussionParticipant.position)
+                    if context.stale:
+                        roster = await self.roster.get_roster(db, discussion_id)
+                        await context.reload(db, discussion.current_round, roster)
+                        self._schedule_missing_summaries(discussion, provider_name, context)
+                    else:
+                        context.prune(discussion.current_round)
+
+                    # Resuming mid-phase: skip participants who already spoke
+                    spoken_result = await db.execute(
+                        select(DiscussionMessage.participant_id).where(
+                            and_(
+                                DiscussionMessage.discussion_id == discussion_id,
+                                DiscussionMessage.round == discussion.current_round,
+                                DiscussionMessage.phase == discussion.current_phase,
+                                DiscussionMessage.is_injected_question == False
+                            )
+                        )
                     )
-                    participants = participants_result.all()
-
-                    if not participants:
-                        logger.error(f"No participants found for discussion {discussion_id}")
-                        break
+                    spoken = set(spoken_result.scalars().all())
 
-                    # Get topic
-                    topic_result = await db.execute(
-                        select(Topic).where(Topic.id == discussion.topic_id)
-                    )
-                    topic = topic_result.scalar_one_or_none()
+                    pending = [(p, c) for p, c in participants if p.id not in spoken]
 
-                    if not topic:
-                        logger.error(f"Topic not found for discussion {discussion_id}")
-                        break
+                    if len(pending) > 1 and self._is_independent_phase(discussion):
+                        # No turn depends on another: generate them all at once
+                        logger.info(f"Generating {len(pending)} independent messages in round {discussion.current_round}, phase {discussion.current_phase}")
+                        completed = await control.run_until_stopped(self._generate_independent_messages(
+                            db, discussion, pending, topic, provider_name, context
+                        ))
+                        if not completed:
+                            logger.info(f"Discussion {discussion_id} stopped during message generation")
+                            await self.drafts.recover(db, discussion_id)
+                            return
+                        pending = []
 
                     # Generate messages for each participant in this round
-                    for participant, character in participants:
+                    for participant, character in pending:
                         # Check if discussion is still running
-                        result = await db.execute(
-                            select(Discussion).where(Discussion.id == discussion_id)
-                        )
-                        current_discussion = result.scalar_one_or_none()
-                        if not current_discussion or current_discussion.status != "running":
+                        if not control.running:
                             logger.info(f"Discussion {discussion_id} stopped during message generation")
                             return
 
                         logger.info(f"Generating message for {character.name} in round {discussion.current_round}, phase {discussion.current_phase}")
 
-                        # Generate message for this participant
+                        # Generate message for this participant; a stop cancels
+                        # it mid-stream and keeps the partial content
                         try:
-                            message = await self._generate_message(
-                                db, discussion, participant, character, topic, provider_name
-                            )
+                            completed = await control.run_until_stopped(self._generate_message(
+                                db, discussion, participant, character, topic, provider_name,
+                                context=context
+                            ))
+                            if not completed:
+                                logger.info(f"Discussion {discussion_id} stopped while {character.name} was speaking")
+                                await self.drafts.recover(db, discussion_id)
+                                return
                             logger.info(f"Generated message for {character.name} in round {discussion.current_round}")
 
-                            # Small delay between messages to simulate natural conversation
-                            await asyncio.sleep(2)
+                            # Delay between messages so viewers can follow
+                            await control.wait_halted(await pacing.after_message(discussion_id))
 
+                        except LeaseLostError:
+                            raise
                         except Exception as e:
                             logger.error(f"Error generating message for {character.name}: {e}")
                             # Continue with next participant
                             continue
 
-                    # Move to next phase/round
-                    await self._advance_discussion(db, discussion)
+                    if not control.running:
+                        # Halted between turns: leave the phase to be resumed
+                        return
 
-                    # Refresh discussion after advance
-                    result = await db.execute(
-                        select(Discussion).where(Discussion.id == discussion_id)
-                    )
-                    discussion = result.scalar_one_or_none()
+                    # Move to next phase/round (checkpoint)
+                    await self._advance_discussion(db, discussion, provider_name, on_summary=context.add_summary)
 
-                    if discussion and discussion.status == "running":
-                        # Delay between rounds
-                        await asyncio.sleep(5)
+                    if on_phase_complete and not await on_phase_complete():
+                        raise LeaseLostError(f"Lease on discussion {discussion_id} lost at checkpoint")
 
+                    # Delay between phases, cut short by a pause or stop
+                    await control.wait_halted(await pacing.after_phase(discussion_id))
+
+            except LeaseLostError:
+                # Another worker owns the discussion now; leave it as it is
+                logger.warning(f"Discussion {discussion_id} was taken over, stopping loop")
+                raise
             except Exception as e:
                 logger.error(f"Error in discussion loop for {discussion_id}: {e}")
                 # Try to mark discussion as failed
                 try:
                     result = await db.execute(
-                        select(Discussion).where(Discussion.id == discussion_id)
+                        select(Discussion)
+                        .where(Discussion.id == discussion_id)
+                        .execution_options(populate_existing=True)
                     )
                     discussion = result.scalar_one_or_none()
                     if discussion and discussion.status == "running":
@@ -526,96 +668,43 @@ class DiscussionEngineService:
                 except Exception as e2:
                     logger.error(f"Failed to mark discussion as failed: {e2}")
             finally:
-                # Clean up task reference
-                if discussion_id in self._running_tasks:
-                    del self._running_tasks[discussion_id]
+                # Summaries use the loop's LLM clients, which close after it returns
+                await self.summarizer.drain()
+                try:
+                    if bus:
+                        await bus.remove_listener(discussion_id, control.handle_event)
+                except Exception as e:
+                    logger.warning(f"Failed to detach context listener for {discussion_id}: {e}")
                 logger.info(f"Discussion loop for {discussion_id} ended")
 
-    async def _summarize_round_messages(
-        self,
-        db: AsyncSession,
-        discussion: Discussion,
-        round_messages: dict,
-        round_num: int,
-        provider_name: str
-    ) -> str:
-        """Summarize messages from a round using LLM with caching"""
-        import json
-        import hashlib
-
-        # Create a cache key based on discussion ID, round number, and message content hash
-        # This ensures we only re-summarize if new messages were added to this round
-        messages_hash = hashlib.md5(
-            json.dumps(round_messages, sort_keys=True).encode()
-        ).hexdigest()[:8]
-        cache_key = f"round_summary:{discussion.id}:{round_num}:{messages_hash}"
-
-        # Try to get from cache first
-        cached_summary = await self.cache.get(cache_key)
-        if cached_summary:
-            logger.info(f"Using cached summary for round {round_num + 1}")
-            return cached_summary
-
-        # Build conversation text for this round
-        conversation_parts = []
-        phase_translations = {
-            'opening': 'Opening',
-            'development': 'Development',
-            'debate': 'Debate',
-            'closing': 'Closing'
-        }
-
-        for phase_name in ['opening', 'development', 'debate', 'closing']:
-            if phase_name in round_messages:
-                conversation_parts.append(f"\n[{phase_translations.get(phase_name, phase_name)} Phase]")
-                for msg in round_messages[phase_name]:
-                    conversation_parts.append(f"{msg['name']}: {msg['content']}")
-
-        conversation_text = "\n".join(conversation_parts)
+    async def _check_lease(self):
+        """Raise LeaseLostError if the loop's scheduler lease was lost (no-op without one)"""
+        if self.lease is not None:
+            await self.lease.check()
 
-        # Build summarization prompt
-        summary_prompt = f"""Please summarize the following discussion round (Round {round_num + 1}) in Chinese.
-Focus on:
-1. Key arguments presented by each participant
-2. Main points of agreement and disagreement
-3. Important conclusions reached
-
-Keep the summary under 500 words. Preserve the names of participants.
-
-Discussion to summarize:
-{conversation_text}
-
-Summary:"""
-
-        try:
-            logger.info(f"Generating summary for round {round_num + 1} using LLM")
-            # Generate summary using LLM
-            response = await self.llm_orchestrator.generate(
-                provider_name,
-                summary_prompt,
-                max_tokens=800,
-                temperature=0.5
-            )
-
-            if isinstance(response, dict):
-                summary = response.get("content", "").strip()
-            else:
-                summary = str(response).strip()
-
-            if not summary:
-                summary = "Summary not available"
+    def _is_independent_phase(self, discussion: Discussion) -> bool:
+        """Whether the turns of the current phase can be generated concurrently"""
+        return (
+            discussion.current_phase in self.INDEPENDENT_PHASES
+            or discussion.discussion_mode in self.INDEPENDENT_MODES
+        )
 
-            # Cache the summary for 1 hour
-            await self.cache.set(cache_key, summary, ttl=3600)
-            logger.info(f"Cached summary for round {round_num + 1}")
+    def _schedule_missing_summaries(self, discussion: Discussion, provider_name: str, context: DiscussionContext):
+        """Summarize earlier rounds whose summary was never stored (e.g. after a crash)"""
+        for round_num in context.missing_summaries(discussion.current_round):
+            self.summarizer.schedule(discussion.id, round_num, provider_name, on_done=context.add_summary)
 
-            return summary
+    def get_pacing_policy(self, discussion: Discussion) -> PacingPolicy:
+        """Pacing policy selected for a discussion"""
+        return PacingPolicy(discussion.pacing)
 
-        except Exception as e:
-            logger.error(f"Error summarizing round {round_num}: {e}")
-            # Fallback: return truncated first few messages
-            fallback_summary = conversation_text[:1000] + "..." if len(conversation_text) > 1000 else conversation_text
-            return f"[Round {round_num + 1} discussion excerpt]\n{fallback_summary}"
+    async def _refresh_status(self, db: AsyncSession, discussion: Discussion, control: DiscussionRunControl):
+        """Re-read the discussion status from Postgres after missed signals"""
+        result = await db.execute(
+            select(Discussion.status).where(Discussion.id == discussion.id)
+        )
+        status = result.scalar_one_or_none()
+        control.apply_status(status or "cancelled")
 
     async def _generate_message(
         self,
@@ -624,144 +713,172 @@ Summary:"""
         participant: DiscussionParticipant,
         character: Character,
         topic: Topic,
-        provider_name: str
+        provider_name: str,
+        context: Optional[DiscussionContext] = None
     ) -> DiscussionMessage:
         """Generate a message from a participant using streaming"""
 
-        # Get messages organized by rounds for context
-        # Show current round fully, and last 2 rounds briefly
-        context_rounds = max(0, discussion.current_round - 2)
-        messages_result = await db.execute(
-            select(DiscussionMessage)
-            .where(
-                and_(
-                    DiscussionMessage.discussion_id == discussion.id,
-                    DiscussionMessage.round >= context_rounds,
-                    DiscussionMessage.round <= discussion.current_round
+        # Conversation history is kept in memory by the loop; only a
+        # standalone call has to read it from Postgres
+        if context is None:
+            roster = await self.roster.get_roster(db, discussion.id)
+            context = await DiscussionContext.load(db, discussion.id, discussion.current_round, roster)
+
+        prompt = self._build_prompt(discussion, character, topic, context)
+        draft, content, usage = await self._stream_message(
+            discussion, participant, character, topic, provider_name, prompt, self._turn_priority(context)
+        )
+        return await self._save_message(db, discussion, participant, character, draft, content, usage, context)
+
+    async def _generate_independent_messages(
+        self,
+        db: AsyncSession,
+        discussion: Discussion,
+        pending: List[Any],
+        topic: Topic,
+        provider_name: str,
+        context: DiscussionContext
+    ) -> List[DiscussionMessage]:
+        """
+        Generate the turns of an independent phase concurrently
+
+        All prompts are built from the same history, streams run concurrently
+        (at most DISCUSSION_PARALLEL_TURNS at once against the provider) and
+        the messages are persisted in participant position order.
+        """
+        slots = asyncio.Semaphore(settings.DISCUSSION_PARALLEL_TURNS)
+
+        async def stream(participant: DiscussionParticipant, character: Character, prompt: ChatPrompt):
+            async with slots:
+                draft, content, usage = await self._stream_message(
+                    discussion, participant, character, topic, provider_name, prompt, priority
                 )
-            )
-            .order_by(DiscussionMessage.created_at.asc())
+                # Keep the full text recoverable until it is persisted below
+                await draft.flush()
+                return draft, content, usage
+
+        priority = self._turn_priority(context)
+        prompts = [self._build_prompt(discussion, character, topic, context) for _, character in pending]
+        results = await asyncio.gather(
+            *[stream(participant, character, prompt) for (participant, character), prompt in zip(pending, prompts)],
+            return_exceptions=True
         )
-        all_messages = list(messages_result.scalars().all())
-
-        # Group messages by round and phase
-        from collections import defaultdict
-        rounds_messages = defaultdict(lambda: defaultdict(list))
-        participant_names = {}  # Cache participant names
-
-        for msg in all_messages:
-            if msg.is_injected_question:
-                rounds_messages[msg.round][msg.phase].append({
-                    'name': 'User',
-                    'content': msg.content
-                })
-            else:
-                # Get character name
-                if msg.participant_id not in participant_names:
-                    participant_result = await db.execute(
-                        select(DiscussionParticipant, Character)
-                        .join(Character, DiscussionParticipant.character_id == Character.id)
-                        .where(DiscussionParticipant.id == msg.participant_id)
-                    )
-                    pt_data = participant_result.first()
-                    if pt_data:
-                        _, msg_character = pt_data
-                        participant_names[msg.participant_id] = msg_character.name
-                    else:
-                        participant_names[msg.participant_id] = 'Unknown'
-
-                rounds_messages[msg.round][msg.phase].append({
-                    'name': participant_names[msg.participant_id],
-                    'content': msg.content
-                })
-
-        # Build context
-        context_parts = [
-            f"You are {character.name}.",
-            f"Topic: {topic.title}",
-            f"Description: {topic.description}",
-            f"Current Round: {discussion.current_round + 1}/{discussion.max_rounds}",
+
+        messages = []
+        for (participant, character), result in zip(pending, results):
+            if isinstance(result, LeaseLostError):
+                raise result
+            if isinstance(result, BaseException):
+                logger.error(f"Error generating message for {character.name}: {result}")
+                continue
+            draft, content, usage = result
+            # Stamp messages as they are saved so reads follow position order
+            messages.append(await self._save_message(
+                db, discussion, participant, character, draft, content, usage, context,
+                created_at=datetime.utcnow()
+            ))
+        return messages
+
+    @staticmethod
+    def _turn_priority(context: DiscussionContext) -> int:
+        """Scheduling priority of the next turns (replies to an injected question rank below live turns)"""
+        return LLMPriority.INJECTED_REPLY if context.pending_question else LLMPriority.TURN
+
+    def _persona_prompt(self, character: Character, topic: Topic) -> ChatPrompt:
+        """A participant's stable prompt prefix (persona and topic), built once per character"""
+        prompt = self._persona_prompts.get(character.id)
+        if prompt is None:
+            persona_parts = [f"You are {character.name}."]
+
+            # Add character configuration
+            if character.config:
+                if character.config.get("stance"):
+                    persona_parts.append(f"Your Stance: {character.config['stance']}")
+                if character.config.get("personality"):
+                    persona_parts.append(f"Your Personality: {character.config['personality']}")
+                if character.config.get("expression_style"):
+                    persona_parts.append(f"Expression Style: {character.config['expression_style']}")
+
+            persona_parts.append(f"Topic: {topic.title}")
+            persona_parts.append(f"Description: {topic.description}")
+            prompt = ChatPrompt().extend(PromptBlock("\n".join(persona_parts), cache=True), system=True)
+            self._persona_prompts[character.id] = prompt
+        return prompt
+
+    def _build_prompt(
+        self,
+        discussion: Discussion,
+        character: Character,
+        topic: Topic,
+        context: DiscussionContext
+    ) -> ChatPrompt:
+        """
+        Build a participant's prompt for the current phase
+
+        Ordered from most to least stable so providers can reuse the cached
+        prefix: persona and topic, history of earlier rounds, the current
+        round so far, then the turn instruction.
+        """
+        earlier_history, current_history = context.render_history_parts(discussion.current_round)
+
+        turn_parts = [
+            f"\nCurrent Round: {discussion.current_round + 1}/{discussion.max_rounds}",
             f"Current Phase: {discussion.current_phase}",
         ]
-
-        # Add character configuration
-        if character.config:
-            if character.config.get("stance"):
-                context_parts.append(f"Your Stance: {character.config['stance']}")
-            if character.config.get("personality"):
-                context_parts.append(f"Your Personality: {character.config['personality']}")
-            if character.config.get("expression_style"):
-                context_parts.append(f"Expression Style: {character.config['expression_style']}")
-
         # Add phase instruction
         phase_instruction = self.PHASES.get(discussion.current_phase, "")
         if phase_instruction:
-            context_parts.append(f"Phase Instruction: {phase_instruction}")
-
-        # Add conversation history organized by rounds and phases
-        if rounds_messages:
-            context_parts.append("\n=== Conversation History ===")
-
-            for round_num in sorted(rounds_messages.keys()):
-                if round_num == discussion.current_round:
-                    # Current round: show full messages
-                    context_parts.append(f"\n--- Current Round (Round {round_num + 1}) ---")
-                    round_data = rounds_messages[round_num]
-                    for phase_name in ['opening', 'development', 'debate', 'closing']:
-                        if phase_name in round_data:
-                            phase_translations = {
-                                'opening': 'Opening',
-                                'development': 'Development',
-                                'debate': 'Debate',
-                                'closing': 'Closing'
-                            }
-                            context_parts.append(f"\n[{phase_translations.get(phase_name, phase_name)} Phase]")
-                            for msg in round_data[phase_name]:
-                                context_parts.append(f"{msg['name']}: {msg['content']}")
-
-                elif round_num >= discussion.current_round - 2:
-                    # Recent rounds (within last 2 rounds): show full messages
-                    context_parts.append(f"\n--- Round {round_num + 1} (Previous) ---")
-                    round_data = rounds_messages[round_num]
-                    for phase_name in ['opening', 'development', 'debate', 'closing']:
-                        if phase_name in round_data:
-                            phase_translations = {
-                                'opening': 'Opening',
-                                'development': 'Development',
-                                'debate': 'Debate',
-                                'closing': 'Closing'
-                            }
-                            context_parts.append(f"\n[{phase_translations.get(phase_name, phase_name)} Phase]")
-                            for msg in round_data[phase_name]:
-                                context_parts.append(f"{msg['name']}: {msg['content']}")
-
-                else:
-                    # Earlier rounds: use LLM summary
-                    context_parts.append(f"\n--- Round {round_num + 1} Summary ---")
-                    round_summary = await self._summarize_round_messages(
-                        db, discussion, rounds_messages[round_num], round_num, provider_name
-                    )
-                    context_parts.append(round_summary)
+            turn_parts.append(f"Phase Instruction: {phase_instruction}")
+        turn_parts.append(f"\n{character.name}, please respond:")
 
-        # Build prompt
-        prompt = "\n".join(context_parts) + f"\n\n{character.name}, please respond:"
+        return self._persona_prompt(character, topic).extend(
+            PromptBlock(earlier_history, cache=True),
+            PromptBlock(current_history),
+            PromptBlock("\n".join(turn_parts))
+        )
 
-        # Create message with empty content first
-        message = DiscussionMessage(
-            discussion_id=discussion.id,
+    async def _stream_message(
+        self,
+        discussion: Discussion,
+        participant: DiscussionParticipant,
+        character: Character,
+        topic: Topic,
+        provider_name: str,
+        prompt: ChatPrompt,
+        priority: int = LLMPriority.TURN
+    ):
+        """
+        Stream a message into a Redis draft
+
+        Returns:
+            (draft, content, usage); content is None when the streamed
+            draft content should be used. If cancelled, the draft is left
+            in Redis and recovered as a partial message.
+        """
+        # Partial content lives in a Redis draft while streaming; Postgres
+        # only sees a single INSERT once the message is complete
+        draft = await self.drafts.open(
+            discussion.id,
+            uuid4(),
             participant_id=participant.id,
             round=discussion.current_round,
             phase=discussion.current_phase,
-            content="",
-            token_count=0,
-            is_injected_question=False
+            character_name=character.name,
+            character_avatar_url=character.avatar_url
         )
-        db.add(message)
-        await db.commit()  # Commit to get the message ID
+
+        await self.event_broker.publish(discussion.id, DiscussionEventType.MESSAGE_START, {
+            "message_id": str(draft.message_id),
+            "participant_id": str(participant.id),
+            "character_name": character.name,
+            "character_avatar_url": character.avatar_url,
+            "round": discussion.current_round,
+            "phase": discussion.current_phase
+        })
 
         # Generate response using LLM with streaming
-        content = ""
-        tokens = 0
+        content = None
+        usage = None
         chunk_count = 0
         try:
             # Stream the response
@@ -770,56 +887,136 @@ Summary:"""
             async for chunk in self.llm_orchestrator.generate_stream(
                 provider_name,
                 prompt,
+                sticky_key=f"{discussion.id}:{participant.id}",
+                task_class=LLMTaskClass.TURN,
+                priority=priority,
                 max_tokens=500,
                 temperature=0.8
             ):
-                if chunk.get('is_complete'):
-                    logger.info(f"Stream complete for {character.name}, finish_reason: {chunk.get('finish_reason')}")
+                if chunk.is_complete:
+                    usage = chunk.usage
+                    logger.info(f"Stream complete for {character.name}, finish_reason: {chunk.finish_reason}")
                     break
 
-                chunk_content = chunk.get('content', '')
+                chunk_content = chunk.content
                 if chunk_content:
-                    content += chunk_content
                     chunk_count += 1
+                    await draft.append(chunk_content)
 
-                    # Update message content in database every few chunks
-                    # This allows the frontend to see the progress
-                    if chunk_count % 3 == 0:  # Update every 3 chunks to reduce DB calls
-                        message.content = content
-                        await db.commit()
-                        logger.debug(f"Updated message {message.id} with {len(content)} characters")
+                    await self.event_broker.publish(discussion.id, DiscussionEventType.TOKEN, {
+                        "message_id": str(draft.message_id),
+                        "delta": chunk_content
+                    })
+
+            logger.info(
+                f"Streaming completed for {character.name}: {len(draft.content)} characters, "
+                f"{chunk_count} chunks, {draft.flush_count} draft flushes"
+            )
+
+        except asyncio.CancelledError:
+            # Stopped mid-stream: keep what was generated so far for recovery
+            try:
+                await draft.flush()
+            except LeaseLostError:
+                pass
+            raise
 
-            # Final update with complete content
-            message.content = content
-            logger.info(f"Streaming completed for {character.name}: {len(content)} characters, {chunk_count} chunks")
+        except LeaseLostError:
+            raise
 
         except Exception as e:
             logger.error(f"LLM streaming error: {e}", exc_info=True)
             # Fallback message
             content = f"I'm {character.name}, and I believe {topic.title} is an important topic that needs careful consideration."
-            message.content = content
 
-        # Final update
-        message.token_count = tokens
-        discussion.total_tokens_used += tokens
+        return draft, content, usage
+
+    async def _save_message(
+        self,
+        db: AsyncSession,
+        discussion: Discussion,
+        participant: DiscussionParticipant,
+        character: Character,
+        draft: MessageDraft,
+        content: Optional[str],
+        usage: Optional[LLMUsage],
+        context: DiscussionContext,
+        **fields
+    ) -> DiscussionMessage:
+        """
+        Persist a streamed message with a single INSERT and announce it
+
+        Token and cost totals of the discussion and participant are updated
+        by the usage meter's batched flushes, not here.
+        """
+        usage = usage or LLMUsage()
+        message = draft.build_message(
+            content,
+            token_count=usage.total_tokens,
+            meta_data={"usage": {
+                "input_tokens": usage.input_tokens,
+                "output_tokens": usage.output_tokens,
+                "cache_read_tokens": usage.cache_read_tokens,
+                "cache_write_tokens": usage.cache_write_tokens,
+                "model": usage.model,
+                "estimated": usage.estimated
+            }},
+            **fields
+        )
+        db.add(message)
 
+        await self._check_lease()
         await db.commit()
+        await draft.discard()
+
+        meter = await get_usage_meter()
+        await meter.record(
+            usage,
+            discussion_id=discussion.id,
+            participant_id=participant.id,
+            user_id=discussion.user_id,
+            messages=1
+        )
+
+        context.add_message(message.round, message.phase, character.name, message.content)
+        context.pending_question = False
+
+        await self.event_broker.publish(discussion.id, DiscussionEventType.MESSAGE_COMPLETE, {
+            "message_id": str(message.id),
+            "participant_id": str(participant.id),
+            "content": message.content,
+            "token_count": message.token_count
+        })
+
         await self._cache_discussion_state(discussion)
 
         return message
 
-    async def _advance_discussion(self, db: AsyncSession, discussion: Discussion):
+    async def _advance_discussion(
+        self,
+        db: AsyncSession,
+        discussion: Discussion,
+        provider_name: Optional[str] = None,
+        on_summary: Optional[Callable[[int, str], None]] = None
+    ):
         """Advance discussion to next phase/round"""
         phases = list(self.PHASES.keys())
         current_index = phases.index(discussion.current_phase)
+        completed_round = None
 
         # Move to next phase
         if current_index < len(phases) - 1:
             discussion.current_phase = phases[current_index + 1]
         else:
             # All phases done, move to next round
+            completed_round = discussion.current_round
             discussion.current_phase = phases[0]
             discussion.current_round += 1
 
+        await self._check_lease()
         await db.commit()
         await self._cache_discussion_state(discussion)
+
+        # Summarize the finished round off the critical path
+        if completed_round is not None and provider_name and self.session_factory:
+            self.summarizer.schedule(discussion.id, completed_round, provider_name, on_done=on_summary)
@@ -0,0 +1,206 @@
+"""
+Live event broker for running discussions.
+
+The discussion loop publishes token deltas, message lifecycle events and
+phase/round transitions here. Events travel over the Redis event bus, so a
+viewer connected to any worker receives them, and can resume from the last
+event id it received.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+from uuid import UUID, uuid4
+
+from app.core.redis import get_event_bus, stream_id_key
+
+logger = logging.getLogger(__name__)
+
+
+class DiscussionEventType:
+    """Event types pushed to discussion viewers"""
+
+    MESSAGE_START = "message_start"
+    TOKEN = "token"
+    MESSAGE_COMPLETE = "message_complete"
+    STATE = "state"
+    QUESTION_INJECTED = "question_injected"
+    # Sent when the requested cursor is older than the replay buffer;
+    # the client should reload messages over REST and continue streaming.
+    RESYNC = "resync"
+
+
+# Discussion statuses after which no more events will be published
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def _is_terminal(event: Dict[str, Any]) -> bool:
+    return event["type"] == DiscussionEventType.STATE and event["data"].get("status") in TERMINAL_STATUSES
+
+
+class _Subscription:
+    """Events delivered by the bus to one local viewer"""
+
+    def __init__(self, max_pending: int):
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self.max_pending = max_pending
+        self.interrupted = False
+        self._waiter = asyncio.Event()
+
+    def deliver(self, event: Optional[Dict[str, Any]]):
+        if event is None or len(self.pending) >= self.max_pending:
+            # Feed interrupted or viewer too slow: catch up from the stream
+            self.interrupted = True
+            self.pending.clear()
+        else:
+            self.pending.append(event)
+        self._waiter.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for new events; returns False on timeout"""
+        try:
+            await asyncio.wait_for(self._waiter.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiter.clear()
+
+
+class DiscussionEventBroker:
+    """Publish/subscribe hub for discussion events"""
+
+    def __init__(
+        self,
+        heartbeat_interval: float = 15.0,
+        closed_retention: int = 3600,
+        max_pending: int = 2000
+    ):
+        """
+        Initialize event broker
+
+        Args:
+            heartbeat_interval: Seconds of silence before a heartbeat is yielded
+            closed_retention: Seconds a finished discussion's stream is kept
+                so late or reconnecting viewers can still replay its end
+            max_pending: Undelivered events per viewer before it falls back
+                to replaying from the stream
+        """
+        self.heartbeat_interval = heartbeat_interval
+        self.closed_retention = closed_retention
+        self.max_pending = max_pending
+
+    async def publish(
+        self,
+        discussion_id: UUID,
+        event_type: str,
+        data: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Publish an event to all viewers of a discussion
+
+        Args:
+            discussion_id: Discussion the event belongs to
+            event_type: One of DiscussionEventType
+            data: JSON-serializable payload
+
+        Returns:
+            The stored event ({"id", "type", "data"}), or None if publishing failed
+        """
+        ttl = None
+        if event_type == DiscussionEventType.STATE and data.get("status") in TERMINAL_STATUSES:
+            ttl = self.closed_retention
+
+        # Live updates are best-effort; never let them break the discussion loop
+        try:
+            bus = await get_event_bus()
+            return await bus.publish(discussion_id, event_type, data, ttl=ttl)
+        except Exception as e:
+            logger.warning(f"Failed to publish {event_type} event for discussion {discussion_id}: {e}")
+            return None
+
+    async def subscribe(
+        self,
+        discussion_id: UUID,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Stream events for a discussion
+
+        Args:
+            discussion_id: Discussion to follow
+            cursor: Id of the last event the client has seen; retained
+                events after it are replayed first
+
+        Yields:
+            Events in publish order, or None as a heartbeat when idle.
+            The stream ends after a terminal state event.
+        """
+        bus = await get_event_bus()
+        subscription = _Subscription(self.max_pending)
+        viewer_id = uuid4().hex
+        presence_ttl = self.heartbeat_interval * 3
+        last_presence = 0.0
+
+        # Listen before replaying so nothing published in between is lost
+        await bus.add_listener(discussion_id, subscription.deliver)
+        try:
+            position = cursor
+            catch_up = True
+            while True:
+                # Viewer presence lets adaptive pacing skip delays nobody watches
+                if time.monotonic() - last_presence >= self.heartbeat_interval:
+                    last_presence = time.monotonic()
+                    try:
+                        await bus.touch_viewer(discussion_id, viewer_id, presence_ttl)
+                    except Exception as e:
+                        logger.warning(f"Failed to record viewer of discussion {discussion_id}: {e}")
+
+                if catch_up or subscription.interrupted:
+                    subscription.interrupted = False
+                    events = await bus.replay(discussion_id, position)
+                    if events is None:
+                        position = await bus.latest_id(discussion_id)
+                        events = [{
+                            "id": position,
+                            "type": DiscussionEventType.RESYNC,
+                            "data": {"reason": "cursor_expired"}
+                        }]
+                    catch_up = False
+                else:
+                    events = list(subscription.pending)
+                    subscription.pending.clear()
+
+                for event in events:
+                    # Skip live events already covered by the replay
+                    if position and event["type"] != DiscussionEventType.RESYNC \
+                            and stream_id_key(event["id"]) <= stream_id_key(position):
+                        continue
+                    yield event
+                    position = event["id"]
+                    if _is_terminal(event):
+                        return
+
+                if subscription.pending or subscription.interrupted:
+                    continue
+                if not await subscription.wait(self.heartbeat_interval):
+                    yield None
+        finally:
+            await bus.remove_listener(discussion_id, subscription.deliver)
+            try:
+                await bus.remove_viewer(discussion_id, viewer_id)
+            except Exception as e:
+                logger.warning(f"Failed to remove viewer of discussion {discussion_id}: {e}")
+
+
+# Global singleton instance
+_event_broker: DiscussionEventBroker = None
+
+
+def get_event_broker() -> DiscussionEventBroker:
+    """Get or create global discussion event broker"""
+    global _event_broker
+    if _event_broker is None:
+        _event_broker = DiscussionEventBroker()
+    return _event_broker
@@ -0,0 +1,75 @@
+"""
+Pacing of a running discussion.
+
+Delays between messages and phases exist only so a human watching the
+discussion can follow it. Each discussion picks a pacing mode when it is
+created:
+
+- realtime: always wait between messages and phases
+- batch: no delays, the discussion runs at LLM speed
+- adaptive: wait only while viewers are connected
+"""
+import logging
+from uuid import UUID
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PacingMode:
+    """Pacing modes selectable per discussion"""
+
+    REALTIME = "realtime"
+    BATCH = "batch"
+    ADAPTIVE = "adaptive"
+
+    ALL = (REALTIME, BATCH, ADAPTIVE)
+
+
+class PacingPolicy:
+    """Delays applied by the discussion loop"""
+
+    def __init__(
+        self,
+        mode: str = None,
+        message_delay: float = None,
+        phase_delay: float = None
+    ):
+        """
+        Initialize pacing policy
+
+        Args:
+            mode: One of PacingMode (default from settings)
+            message_delay: Seconds between messages in realtime pacing
+            phase_delay: Seconds between phases in realtime pacing
+        """
+        self.mode = mode if mode in PacingMode.ALL else settings.DISCUSSION_DEFAULT_PACING
+        self.message_delay = settings.DISCUSSION_MESSAGE_DELAY if message_delay is None else message_delay
+        self.phase_delay = settings.DISCUSSION_PHASE_DELAY if phase_delay is None else phase_delay
+
+    async def _has_viewers(self, discussion_id: UUID) -> bool:
+        from app.core.redis import get_event_bus
+
+        try:
+            bus = await get_event_bus()
+            return await bus.count_viewers(discussion_id) > 0
+        except Exception as e:
+            # Err on the side of the realtime experience
+            logger.warning(f"Failed to count viewers of discussion {discussion_id}: {e}")
+            return True
+
+    async def _delay(self, discussion_id: UUID, seconds: float) -> float:
+        if self.mode == PacingMode.BATCH or seconds <= 0:
+            return 0.0
+        if self.mode == PacingMode.ADAPTIVE and not await self._has_viewers(discussion_id):
+            return 0.0
+        return seconds
+
+    async def after_message(self, discussion_id: UUID) -> float:
+        """Seconds to wait after a message"""
+        return await self._delay(discussion_id, self.message_delay)
+
+    async def after_phase(self, discussion_id: UUID) -> float:
+        """Seconds to wait after a phase"""
+        return await self._delay(discussion_id, self.phase_delay)
@@ -0,0 +1,327 @@
+"""
+Durable, distributed scheduler for discussion loops.
+
+Running discussions are kept as jobs in Redis. Any backend worker can claim
+a job by taking its lease; the owner renews the lease with heartbeats and
+after every completed phase. If a worker dies, its lease expires and another
+worker takes the discussion over, resuming from the last checkpoint stored
+in Postgres (current round/phase plus the messages already written).
+
+A loop writes only while its worker holds the lease (DiscussionLease):
+draft writes check it atomically in Redis and messages and checkpoints are
+checked before they are committed, so a loop that lost its lease cannot
+write over the new owner's recovery.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Dict, Optional
+from uuid import UUID, uuid4
+
+from redis import asyncio as aioredis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLostError(Exception):
+    """This worker no longer holds the lease of the discussion it runs"""
+
+
+class DiscussionLease:
+    """A worker's lease on one discussion, checked before the loop writes"""
+
+    def __init__(self, redis: aioredis.Redis, key: str, owner: str):
+        self.redis = redis
+        self.key = key
+        self.owner = owner
+        self.lost = False
+
+    def mark_lost(self):
+        self.lost = True
+
+    async def check(self):
+        """Raise LeaseLostError unless this worker still holds the lease"""
+        if not self.lost:
+            try:
+                owner = await self.redis.get(self.key)
+            except Exception as e:
+                # Transient error: the lease TTL bounds any overlap
+                logger.warning(f"Failed to check lease {self.key}: {e}")
+                return
+            if owner != self.owner:
+                self.lost = True
+        if self.lost:
+            raise LeaseLostError(f"Lease {self.key} is no longer held by {self.owner}")
+
+
+class DiscussionScheduler:
+    """Redis-backed job queue with leases, heartbeats and takeover"""
+
+    QUEUE_KEY = "discussion_jobs"  # sorted set: discussion id -> next claimable time
+    JOB_PREFIX = "discussion_job"  # hash: job payload
+    LEASE_PREFIX = "discussion_lease"  # string: owning worker id, with TTL
+
+    # Renew the lease only if we still own it
+    _RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+    # Release the lease only if we still own it
+    _RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    # Finish a job unless it was re-enqueued (e.g. resumed) while running
+    _FINISH_SCRIPT = """
+if redis.call('HGET', KEYS[2], 'token') == ARGV[2] then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('DEL', KEYS[2])
+    return 1
+end
+return 0
+"""
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        session_factory: async_sessionmaker,
+        lease_ttl: int = None,
+        concurrency: int = None,
+        poll_interval: float = 1.0
+    ):
+        """
+        Initialize scheduler
+
+        Args:
+            redis: Redis client (decode_responses=True)
+            session_factory: Session factory for the discussion loops
+            lease_ttl: Seconds a lease lives without a heartbeat
+            concurrency: Max discussions run by this worker at once
+            poll_interval: Seconds between queue polls
+        """
+        self.redis = redis
+        self.session_factory = session_factory
+        self.lease_ttl = lease_ttl or settings.DISCUSSION_LEASE_TTL
+        self.concurrency = concurrency or settings.DISCUSSION_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._renew = redis.register_script(self._RENEW_SCRIPT)
+        self._release = redis.register_script(self._RELEASE_SCRIPT)
+        self._finish = redis.register_script(self._FINISH_SCRIPT)
+        self._running: Dict[UUID, asyncio.Task] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    def _job_key(self, discussion_id) -> str:
+        return f"{self.JOB_PREFIX}:{discussion_id}"
+
+    def _lease_key(self, discussion_id) -> str:
+        return f"{self.LEASE_PREFIX}:{discussion_id}"
+
+    async def enqueue(self, discussion_id: UUID, user_id: UUID, provider_name: str):
+        """Schedule a discussion loop to be run by any worker"""
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job_key(discussion_id), mapping={
+            "user_id": str(user_id),
+            "provider_name": provider_name,
+            "token": uuid4().hex,
+            "enqueued_at": time.time()
+        })
+        pipe.zadd(self.QUEUE_KEY, {str(discussion_id): time.time()})
+        await pipe.execute()
+        logger.info(f"Enqueued discussion {discussion_id}")
+
+    async def remove(self, discussion_id: UUID):
+        """Drop a discussion's job (e.g. when it is stopped)"""
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.QUEUE_KEY, str(discussion_id))
+        pipe.delete(self._job_key(discussion_id))
+        await pipe.execute()
+
+    async def start(self):
+        """Re-queue orphaned discussions and start polling for jobs"""
+        try:
+            await self._reconcile()
+        except Exception as e:
+            logger.error(f"Failed to reconcile running discussions: {e}")
+        self._poller = asyncio.create_task(self._poll())
+        logger.info(f"Discussion scheduler started as {self.worker_id}")
+
+    async def stop(self):
+        """Stop polling and hand running discussions back for takeover"""
+        if self._poller:
+            self._poller.cancel()
+            self._poller = None
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _reconcile(self):
+        """Enqueue discussions marked running in Postgres that have no job"""
+        from app.models.discussion import Discussion
+
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Discussion.id, Discussion.user_id, Discussion.llm_provider)
+                .where(Discussion.status == "running")
+            )
+            rows = result.all()
+
+        for discussion_id, user_id, provider_name in rows:
+            if await self.redis.zscore(self.QUEUE_KEY, str(discussion_id)) is None and provider_name:
+                await self.enqueue(discussion_id, user_id, provider_name)
+
+    async def _poll(self):
+        while True:
+            try:
+                if len(self._running) < self.concurrency:
+                    await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Discussion scheduler poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _claim(self):
+        """Take leases on claimable jobs up to the concurrency limit"""
+        now = time.time()
+        candidates = await self.redis.zrangebyscore(
+            self.QUEUE_KEY, "-inf", now, start=0, num=self.concurrency
+        )
+        for raw_id in candidates:
+            if len(self._running) >= self.concurrency:
+                break
+            discussion_id = UUID(raw_id)
+            if discussion_id in self._running:
+                continue
+
+            acquired = await self.redis.set(
+                self._lease_key(discussion_id), self.worker_id,
+                nx=True, px=self.lease_ttl * 1000
+            )
+            if not acquired:
+                continue
+
+            # Hide the job from other pollers until the lease could have expired
+            await self.redis.zadd(self.QUEUE_KEY, {raw_id: now + self.lease_ttl}, xx=True)
+            self._running[discussion_id] = asyncio.create_task(self._run_job(discussion_id))
+            logger.info(f"Worker {self.worker_id} claimed discussion {discussion_id}")
+
+    def lease(self, discussion_id: UUID) -> DiscussionLease:
+        """Fencing handle of this worker's lease on a discussion"""
+        return DiscussionLease(self.redis, self._lease_key(discussion_id), self.worker_id)
+
+    async def renew_lease(self, discussion_id: UUID, lease: Optional[DiscussionLease] = None) -> bool:
+        """Extend this worker's lease on a discussion; False if it was lost"""
+        try:
+            renewed = await self._renew(
+                keys=[self._lease_key(discussion_id)],
+                args=[self.worker_id, self.lease_ttl * 1000]
+            )
+            if renewed:
+                await self.redis.zadd(
+                    self.QUEUE_KEY, {str(discussion_id): time.time() + self.lease_ttl}, xx=True
+                )
+            elif lease is not None:
+                lease.mark_lost()
+            return bool(renewed)
+        except Exception as e:
+            logger.warning(f"Failed to renew lease for discussion {discussion_id}: {e}")
+            # Keep running on transient errors; the lease TTL bounds any overlap
+            return True
+
+    async def _keep_alive(self, discussion_id: UUID, job_task: asyncio.Task, lease: DiscussionLease):
+        """Renew the lease periodically; cancel the job if it was taken over"""
+        while not job_task.done():
+            await asyncio.sleep(self.lease_ttl / 3)
+            if not await self.renew_lease(discussion_id, lease):
+                logger.warning(f"Lost lease on discussion {discussion_id}, stopping local loop")
+                job_task.cancel()
+                return
+
+    async def _run_job(self, discussion_id: UUID):
+        from app.services.api_key_service import APIKeyService
+        from app.services.discussion_engine import DiscussionEngineService
+        from app.core.redis import get_cache_service
+
+        lease = self.lease(discussion_id)
+        keep_alive = asyncio.create_task(self._keep_alive(discussion_id, asyncio.current_task(), lease))
+        job = {}
+        finished = False
+        try:
+            job = await self.redis.hgetall(self._job_key(discussion_id))
+            if not job:
+                # Job was removed (e.g. stopped) after we saw it in the queue
+                finished = True
+                return
+
+            async with self.session_factory() as db:
+                orchestrator = await APIKeyService(db).build_orchestrator(UUID(job["user_id"]))
+
+            engine = DiscussionEngineService(
+                None,
+                orchestrator,
+                await get_cache_service(),
+                session_factory=self.session_factory,
+                lease=lease
+            )
+            try:
+                await engine._run_discussion_loop(
+                    discussion_id,
+                    job["provider_name"],
+                    on_phase_complete=lambda: self.renew_lease(discussion_id, lease)
+                )
+            finally:
+                await orchestrator.close_all()
+            finished = True
+
+        except asyncio.CancelledError:
+            # Stopped, shut down or taken over; leave the job for the next owner
+            raise
+        except LeaseLostError:
+            logger.warning(f"Lost lease on discussion {discussion_id}, left it to the new owner")
+        except Exception as e:
+            logger.error(f"Discussion job {discussion_id} failed: {e}", exc_info=True)
+            finished = True
+        finally:
+            keep_alive.cancel()
+            self._running.pop(discussion_id, None)
+            try:
+                if finished and job and not lease.lost:
+                    await self._finish(
+                        keys=[self.QUEUE_KEY, self._job_key(discussion_id)],
+                        args=[str(discussion_id), job.get("token", "")]
+                    )
+                elif not finished and not lease.lost:
+                    # Make the job claimable again right away (unless another
+                    # worker already owns it)
+                    await self.redis.zadd(self.QUEUE_KEY, {str(discussion_id): time.time()}, xx=True)
+                await self._release(keys=[self._lease_key(discussion_id)], args=[self.worker_id])
+            except Exception as e:
+                logger.warning(f"Failed to release discussion {discussion_id}: {e}")
+
+
+# Global singleton instance
+_scheduler: DiscussionScheduler = None
+
+
+async def get_discussion_scheduler() -> DiscussionScheduler:
+    """Get or create the process-wide discussion scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        from app.core.database import async_session_factory
+        from app.core.redis import get_redis
+        _scheduler = DiscussionScheduler(await get_redis(), async_session_factory)
+    return _scheduler
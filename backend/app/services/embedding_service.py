@@ -2,11 +2,16 @@
 Text embedding service for semantic similarity calculations.
 Uses OpenAI Embeddings API for efficient text encoding.
 
-Optimized with caching and improved text weighting.
+Optimized with caching and improved text weighting. Embeddings are cached
+in two tiers: a per-process LRU in front of a Redis cache shared by all
+workers and restarts, which stores vectors as raw float32/float16 bytes
+keyed by model and text md5.
 """
+import asyncio
 import logging
 import hashlib
 import json
+import time
 from typing import List, Dict, Any, Optional, Tuple
 from functools import lru_cache
 from collections import OrderedDict
@@ -39,10 +44,80 @@ class LRUCache:
             self.cache.popitem(last=False)
 
 
+class EmbeddingRedisCache:
+    """Shared embedding cache in Redis (values are raw little-endian float bytes)"""
+
+    KEY_PREFIX = "embedding"
+
+    # Keys per MGET / SET pipeline round trip
+    CHUNK_SIZE = 500
+
+    def __init__(self, redis, model: str, ttl: int, dtype: str = "float32"):
+        """
+        Initialize cache
+
+        Args:
+            redis: Binary-safe Redis client (decode_responses=False)
+            model: Embedding model the vectors belong to
+            ttl: Seconds a vector stays cached
+            dtype: Stored precision ("float32" or "float16")
+        """
+        self.redis = redis
+        self.model = model
+        self.ttl = ttl
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+
+    def _key(self, text_key: str) -> str:
+        return f"{self.KEY_PREFIX}:{self.model}:{self.dtype.name}:{text_key}"
+
+    async def get_many(self, text_keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors of text keys (None for misses; all None if Redis fails)"""
+        if not text_keys:
+            return []
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for start in range(0, len(text_keys), self.CHUNK_SIZE):
+                pipe.mget([self._key(k) for k in text_keys[start:start + self.CHUNK_SIZE]])
+            values = [value for chunk in await pipe.execute() for value in chunk]
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            return [None] * len(text_keys)
+        return [
+            np.frombuffer(value, dtype=self.dtype).astype(np.float32) if value else None
+            for value in values
+        ]
+
+    async def put_many(self, items: List[Tuple[str, np.ndarray]]):
+        """Cache vectors by text key"""
+        if not items:
+            return
+        try:
+            for start in range(0, len(items), self.CHUNK_SIZE):
+                pipe = self.redis.pipeline(transaction=False)
+                for text_key, embedding in items[start:start + self.CHUNK_SIZE]:
+                    pipe.set(self._key(text_key), np.asarray(embedding, dtype=self.dtype).tobytes(), ex=self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+
 class EmbeddingService:
     """Service for computing text embeddings and similarities using OpenAI API"""
 
-    def __init__(self, api_key: str = None, base_url: str = None, model: str = None):
+    # Seconds a batch size limit learned from a rejected batch is kept
+    BATCH_LIMIT_TTL = 600.0
+
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        model: str = None,
+        cache_ttl: int = 0,
+        cache_dtype: str = "float32",
+        batch_size: int = 10,
+        max_batch_size: int = 10,
+        concurrency: int = 4
+    ):
         """
         Initialize embedding service
 
@@ -50,14 +125,32 @@ class EmbeddingService:
             api_key: OpenAI API key
             base_url: Custom base URL for OpenAI-compatible API
             model: Embedding model name (default: text-embedding-3-small)
+            cache_ttl: TTL of the shared Redis cache in seconds (0 = in-process cache only)
+            cache_dtype: Precision of vectors in the Redis cache
+            batch_size: Texts per API request to start with
+            max_batch_size: Upper bound the batch size may grow to
+            concurrency: Concurrent API requests per process
         """
         self.api_key = api_key
         self.base_url = base_url or "https://api.openai.com/v1"
         self.model = model or "text-embedding-3-small"
         self.embedding_dim = None  # Will be detected from first API response
         self._client = None
-        # Cache for embeddings
+        # Cache for embeddings (L1 per process, L2 in Redis)
         self._text_cache = LRUCache(maxsize=2000)
+        self.cache_ttl = cache_ttl
+        self.cache_dtype = cache_dtype
+        self._redis_cache: Optional[EmbeddingRedisCache] = None
+        # Request batching: texts per request (adapted to the provider, see
+        # _embed_chunk) and concurrent requests
+        self.batch_size = min(batch_size, max_batch_size)
+        self.max_batch_size = max_batch_size
+        self.batch_size_ceiling = max_batch_size
+        self._batch_limit_expires = 0.0
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # In-flight embeddings by cache key (single-flight across concurrent calls)
+        self._inflight: Dict[str, asyncio.Future] = {}
 
     def _get_client(self):
         """Get HTTP client"""
@@ -69,6 +162,173 @@ class EmbeddingService:
         """Generate cache key from text"""
         return hashlib.md5(text.encode('utf-8')).hexdigest()
 
+    async def _get_redis_cache(self) -> Optional[EmbeddingRedisCache]:
+        """Shared Redis cache (None if disabled)"""
+        if self._redis_cache is None and self.cache_ttl > 0:
+            from app.core.redis import get_redis_binary
+            self._redis_cache = EmbeddingRedisCache(
+                await get_redis_binary(), self.model, self.cache_ttl, self.cache_dtype
+            )
+        return self._redis_cache
+
+    async def _get_cached(self, cache_keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up cache keys in the process LRU, then the misses in Redis"""
+        cached = [self._text_cache.get(key) for key in cache_keys]
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        redis_cache = await self._get_redis_cache() if missing else None
+        if redis_cache is not None:
+            found = await redis_cache.get_many([cache_keys[i] for i in missing])
+            for i, embedding in zip(missing, found):
+                if embedding is not None:
+                    self._text_cache.put(cache_keys[i], embedding)
+                    cached[i] = embedding
+        return cached
+
+    async def _put_cached(self, items: List[Tuple[str, np.ndarray]]):
+        """Store new embeddings in both cache tiers"""
+        for key, embedding in items:
+            self._text_cache.put(key, embedding)
+        redis_cache = await self._get_redis_cache()
+        if redis_cache is not None:
+            await redis_cache.put_many(items)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def _zero_vector(self) -> np.ndarray:
+        """Placeholder for texts that failed (detected dimension, or default 1536)"""
+        return np.zeros(self.embedding_dim if self.embedding_dim else 1536)
+
+    @staticmethod
+    def _log_request_error(e: Exception, count: int):
+        # Try to get more detailed error info
+        if hasattr(e, 'response') and e.response is not None:
+            try:
+                error_detail = e.response.json()
+                logger.error(f"Failed to encode {count} texts: {e} - Detail: {error_detail}")
+            except Exception:
+                logger.error(f"Failed to encode {count} texts: {e} - Response: {e.response.text[:200]}")
+        else:
+            logger.error(f"Failed to encode {count} texts: {e}")
+
+    async def _post_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """One embeddings API request (at most `concurrency` in flight per process)"""
+        client = self._get_client()
+
+        # Use custom base URL if provided (for DeepSeek, etc.)
+        url = f"{self.base_url}/embeddings"
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "input": [text[:8000] for text in texts],  # Limit text length
+            "model": self.model  # Use configured model
+        }
+
+        async with self._get_semaphore():
+            response = await client.post(url, headers=headers, json=payload)
+        response.raise_for_status()
+
+        data = response.json()
+        items = sorted(data["data"], key=lambda item: item.get("index", 0))
+        embeddings = [np.array(item["embedding"], dtype=np.float32) for item in items]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+
+        # Detect and set embedding dimension from first response
+        if self.embedding_dim is None and embeddings:
+            self.embedding_dim = len(embeddings[0])
+            logger.info(f"Detected embedding dimension: {self.embedding_dim} for model {self.model}")
+
+        return embeddings
+
+    async def _embed_chunk(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embed one chunk, adapting the batch size to the provider
+
+        A full chunk that succeeds doubles the batch size (up to
+        max_batch_size). A chunk rejected as a bad request is split in
+        halves; only if every text of the halves then succeeds was it a
+        size limit, and max_batch_size drops to the half size for
+        BATCH_LIMIT_TTL seconds. If some texts still fail they were bad
+        inputs: they come back as None and the limits are left alone.
+        """
+        try:
+            embeddings = await self._post_embeddings(texts)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in (400, 413) or len(texts) == 1:
+                self._log_request_error(e, len(texts))
+                return [None] * len(texts)
+            half = len(texts) // 2
+            first, second = await asyncio.gather(self._embed_chunk(texts[:half]), self._embed_chunk(texts[half:]))
+            if all(embedding is not None for embedding in first + second):
+                # Over the provider's batch limit: stop growing past the half size for a while
+                self.max_batch_size = max(1, min(self.max_batch_size, half))
+                self.batch_size = min(self.batch_size, self.max_batch_size)
+                self._batch_limit_expires = time.monotonic() + self.BATCH_LIMIT_TTL
+                logger.info(f"Embedding batch of {len(texts)} rejected, batch size limited to {self.batch_size}")
+            return first + second
+        except Exception as e:
+            self._log_request_error(e, len(texts))
+            return [None] * len(texts)
+
+        if self.max_batch_size < self.batch_size_ceiling and time.monotonic() >= self._batch_limit_expires:
+            # Probe the provider's limit again
+            self.max_batch_size = self.batch_size_ceiling
+        if len(texts) >= self.batch_size and self.batch_size < self.max_batch_size:
+            self.batch_size = min(self.batch_size * 2, self.max_batch_size)
+        return embeddings
+
+    async def _embed_texts(self, texts: List[str], keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embed texts through the API
+
+        Identical texts (same key) are sent once, and a text already being
+        embedded by a concurrent call joins that call instead of being sent
+        again. The rest go out in chunks of batch_size, concurrently.
+
+        Returns:
+            One embedding per text (None for texts that failed)
+        """
+        futures: Dict[str, asyncio.Future] = {}
+        owned: Dict[str, str] = {}
+        for text, key in zip(texts, keys):
+            if key in futures:
+                continue
+            future = self._inflight.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                owned[key] = text
+            futures[key] = future
+
+        if owned:
+            try:
+                owned_keys = list(owned)
+                size = self.batch_size
+                chunks = [owned_keys[i:i + size] for i in range(0, len(owned_keys), size)]
+                results = await asyncio.gather(
+                    *(self._embed_chunk([owned[key] for key in chunk]) for chunk in chunks)
+                )
+                for chunk, embeddings in zip(chunks, results):
+                    for key, embedding in zip(chunk, embeddings):
+                        futures[key].set_result(embedding)
+            finally:
+                for key in owned:
+                    if not futures[key].done():
+                        futures[key].set_result(None)
+                    if self._inflight.get(key) is futures[key]:
+                        del self._inflight[key]
+
+        # shield: a cancelled waiter must not cancel the shared call
+        embeddings = {key: await asyncio.shield(future) for key, future in futures.items()}
+        return [embeddings[key] for key in keys]
+
     async def encode_text(self, text: str, provider_name: str = None, use_cache: bool = True) -> np.ndarray:
         """
         Encode text to embedding vector using OpenAI API
@@ -83,62 +343,25 @@ class EmbeddingService:
         """
         if not text or not text.strip():
             # Return zero vector with detected dimension, or default 1536
-            dim = self.embedding_dim if self.embedding_dim else 1536
-            return np.zeros(dim)
+            return self._zero_vector()
 
         # Check cache
+        cache_key = self._cache_key(text)
         if use_cache:
-            cache_key = self._cache_key(text)
-            cached = self._text_cache.get(cache_key)
+            cached = (await self._get_cached([cache_key]))[0]
             if cached is not None:
                 return cached
 
-        try:
-            client = self._get_client()
-
-            # Use custom base URL if provided (for DeepSeek, etc.)
-            url = f"{self.base_url}/embeddings"
-
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-
-            payload = {
-                "input": text[:8000],  # Limit text length
-                "model": self.model  # Use configured model
-            }
-
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-
-            data = response.json()
-            embedding = np.array(data["data"][0]["embedding"], dtype=np.float32)
-
-            # Detect and set embedding dimension from first response
-            if self.embedding_dim is None:
-                self.embedding_dim = len(embedding)
-                logger.info(f"Detected embedding dimension: {self.embedding_dim} for model {self.model}")
-
-            # Cache the result
-            if use_cache:
-                self._text_cache.put(cache_key, embedding)
+        embedding = (await self._embed_texts([text], [cache_key]))[0]
+        if embedding is None:
+            # Return zero vector on error
+            return self._zero_vector()
 
-            return embedding
+        # Cache the result
+        if use_cache:
+            await self._put_cached([(cache_key, embedding)])
 
-        except Exception as e:
-            # Try to get more detailed error info
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_detail = e.response.json()
-                    logger.error(f"Failed to encode text: {e} - Detail: {error_detail}")
-                except:
-                    logger.error(f"Failed to encode text: {e} - Response: {e.response.text[:200]}")
-            else:
-                logger.error(f"Failed to encode text: {e}")
-            # Return zero vector on error
-            dim = self.embedding_dim if self.embedding_dim else 1536
-            return np.zeros(dim)
+        return embedding
 
     async def encode_texts_batch(self, texts: List[str], provider_name: str = None, use_cache: bool = True) -> np.ndarray:
         """
@@ -158,82 +381,38 @@ class EmbeddingService:
 
         # Filter empty texts
         cleaned_texts = [t if t and t.strip() else " " for t in texts]
+        cache_keys = [self._cache_key(text) for text in cleaned_texts]
 
         # Check cache for each text
         embeddings = []
         uncached_indices = []
-        uncached_texts = []
 
         if use_cache:
-            for i, text in enumerate(cleaned_texts):
-                cache_key = self._cache_key(text)
-                cached = self._text_cache.get(cache_key)
+            for i, cached in enumerate(await self._get_cached(cache_keys)):
                 if cached is not None:
                     embeddings.append((i, cached))
                 else:
                     uncached_indices.append(i)
-                    uncached_texts.append(text)
         else:
             uncached_indices = list(range(len(cleaned_texts)))
-            uncached_texts = cleaned_texts
 
-        # Encode uncached texts in batch
-        if uncached_texts:
-            try:
-                client = self._get_client()
-                url = f"{self.base_url}/embeddings"
-
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-
-                # Process in batches of 10 (API limit for Alibaba DashScope)
-                batch_size = 10
-                all_new_embeddings = []
-
-                for i in range(0, len(uncached_texts), batch_size):
-                    batch = uncached_texts[i:i + batch_size]
-
-                    payload = {
-                        "input": batch,
-                        "model": self.model
-                    }
-
-                    response = await client.post(url, headers=headers, json=payload)
-                    response.raise_for_status()
-
-                    data = response.json()
-                    batch_embeddings = [np.array(item["embedding"], dtype=np.float32) for item in data["data"]]
-
-                    # Detect embedding dimension from first response
-                    if self.embedding_dim is None and batch_embeddings:
-                        self.embedding_dim = len(batch_embeddings[0])
-                        logger.info(f"Detected embedding dimension: {self.embedding_dim} for model {self.model}")
-
-                    all_new_embeddings.extend(batch_embeddings)
-
-                # Cache new embeddings
-                for idx, text, emb in zip(uncached_indices, uncached_texts, all_new_embeddings):
-                    if use_cache:
-                        cache_key = self._cache_key(text)
-                        self._text_cache.put(cache_key, emb)
-                    embeddings.append((idx, emb))
-
-            except Exception as e:
-                # Try to get more detailed error info
-                if hasattr(e, 'response') and e.response is not None:
-                    try:
-                        error_detail = e.response.json()
-                        logger.error(f"Failed to encode texts batch: {e} - Detail: {error_detail}")
-                    except:
-                        logger.error(f"Failed to encode texts batch: {e} - Response: {e.response.text[:200]}")
+        # Encode uncached texts (deduplicated, in concurrent batches)
+        if uncached_indices:
+            new_embeddings = await self._embed_texts(
+                [cleaned_texts[i] for i in uncached_indices], [cache_keys[i] for i in uncached_indices]
+            )
+            fresh = {}
+            for idx, emb in zip(uncached_indices, new_embeddings):
+                if emb is None:
+                    # Zero vector for failed texts
+                    emb = self._zero_vector()
                 else:
-                    logger.error(f"Failed to encode texts batch: {e}")
-                # Return zero vectors for failed batch
-                dim = self.embedding_dim if self.embedding_dim else 1536
-                for idx in uncached_indices:
-                    embeddings.append((idx, np.zeros(dim)))
+                    fresh[cache_keys[idx]] = emb
+                embeddings.append((idx, emb))
+
+            # Cache new embeddings
+            if use_cache and fresh:
+                await self._put_cached(list(fresh.items()))
 
         # Sort by original index and return
         embeddings.sort(key=lambda x: x[0])
@@ -299,7 +478,7 @@ class EmbeddingService:
         return similarities
 
     def clear_cache(self):
-        """Clear the embedding cache and reset dimension"""
+        """Clear the in-process embedding cache and reset dimension (the Redis cache expires by TTL)"""
         self._text_cache = LRUCache(maxsize=2000)
         self.embedding_dim = None  # Reset dimension to allow re-detection
         logger.info("Embedding cache cleared and dimension reset")
@@ -328,7 +507,16 @@ def get_embedding_service() -> EmbeddingService:
         if not api_key:
             logger.warning("No Embedding API key found, embeddings will return zero vectors")
 
-        _embedding_service = EmbeddingService(api_key=api_key, base_url=base_url, model=model)
+        _embedding_service = EmbeddingService(
+            api_key=api_key,
+            base_url=base_url,
+            model=model,
+            cache_ttl=settings.EMBEDDING_CACHE_TTL,
+            cache_dtype=settings.EMBEDDING_CACHE_DTYPE,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+            concurrency=settings.EMBEDDING_CONCURRENCY
+        )
     return _embedding_service
 
 
@@ -0,0 +1,94 @@
+"""
+Structured chat prompts with cache breakpoints.
+
+A ChatPrompt is a system section and a user message, each made of text
+blocks. Blocks are ordered from most to least stable (persona and topic,
+then history, then the per-turn instruction) so consecutive requests share
+the longest possible prefix:
+
+- Anthropic gets cache_control breakpoints after the blocks marked cache=True.
+- OpenAI caches matching prefixes automatically; it only needs the stable
+  ordering.
+
+Prompts are immutable; extend() returns a new prompt sharing the prefix.
+"""
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+class PromptBlock:
+    """A piece of prompt text, optionally followed by a cache breakpoint"""
+
+    __slots__ = ("text", "cache")
+
+    def __init__(self, text: str, cache: bool = False):
+        self.text = text
+        self.cache = cache
+
+
+class ChatPrompt:
+    """System blocks plus user blocks, rendered per provider"""
+
+    # Anthropic accepts at most four cache breakpoints per request
+    MAX_CACHE_BREAKPOINTS = 4
+
+    __slots__ = ("system", "user")
+
+    def __init__(self, system: Tuple[PromptBlock, ...] = (), user: Tuple[PromptBlock, ...] = ()):
+        self.system = tuple(system)
+        self.user = tuple(user)
+
+    def extend(self, *blocks: PromptBlock, system: bool = False) -> "ChatPrompt":
+        """New prompt with blocks appended to the system or user section"""
+        blocks = tuple(block for block in blocks if block.text)
+        if system:
+            return ChatPrompt(self.system + blocks, self.user)
+        return ChatPrompt(self.system, self.user + blocks)
+
+    @property
+    def system_text(self) -> str:
+        return "\n".join(block.text for block in self.system)
+
+    @property
+    def user_text(self) -> str:
+        return "\n".join(block.text for block in self.user)
+
+    def to_text(self) -> str:
+        """Flattened prompt (for token estimates and single-string providers)"""
+        return "\n".join(part for part in (self.system_text, self.user_text) if part)
+
+    def to_openai_messages(self) -> List[Dict[str, Any]]:
+        """Chat Completions messages (system first, so the stable prefix leads)"""
+        messages = []
+        if self.system:
+            messages.append({"role": "system", "content": self.system_text})
+        messages.append({"role": "user", "content": self.user_text})
+        return messages
+
+    def _anthropic_blocks(self, blocks: Tuple[PromptBlock, ...], breakpoints: set) -> List[Dict[str, Any]]:
+        # Consecutive blocks without a breakpoint are merged into one text block
+        result = []
+        pending = []
+        for block in blocks:
+            pending.append(block.text)
+            if id(block) in breakpoints:
+                result.append({"type": "text", "text": "\n".join(pending), "cache_control": {"type": "ephemeral"}})
+                pending = []
+        if pending:
+            result.append({"type": "text", "text": "\n".join(pending)})
+        return result
+
+    def to_anthropic(self) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """Messages API (system, messages) with cache_control on the last breakpoints"""
+        marked = [block for block in self.system + self.user if block.cache]
+        breakpoints = {id(block) for block in marked[-self.MAX_CACHE_BREAKPOINTS:]}
+        system = self._anthropic_blocks(self.system, breakpoints) if self.system else None
+        messages = [{"role": "user", "content": self._anthropic_blocks(self.user, breakpoints)}]
+        return system, messages
+
+
+Prompt = Union[str, ChatPrompt]
+
+
+def prompt_text(prompt: Prompt) -> str:
+    """Plain text of a prompt"""
+    return prompt if isinstance(prompt, str) else prompt.to_text()
@@ -1,19 +1,53 @@
-from typing import Optional, Dict, Any, AsyncGenerator
-import httpx
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any, AsyncGenerator, Awaitable, Callable, List, Tuple
 from abc import ABC, abstractmethod
 
+import httpx
+
+from app.core.config import settings
+from app.services.llm_registry import LLMClientRegistry, get_llm_registry, key_fingerprint
+from app.services.llm_messages import ChatPrompt, Prompt, prompt_text
+from app.services.llm_rate_limiter import LLMRateLimiter, estimate_tokens
+from app.services.llm_response_cache import LLMResponseCache
+from app.services.llm_stream import LLMStreamError, LLMUsage, StreamChunk, aiter_sse
+from app.services.llm_resilience import ResiliencePolicy, get_circuit_breaker
+from app.services.llm_router import LLMRouter, get_llm_router
+from app.services.llm_scheduler import LLMPriority, LLMScheduler, get_llm_scheduler
+from app.services.llm_tasks import LLMTaskMetrics, get_llm_task_metrics, global_task_model
+
+logger = logging.getLogger(__name__)
+
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
 
+    # Provider family ("openai", "anthropic", "custom") and models per task class
+    provider_type: str = ""
+    task_models: Dict[str, str] = {}
+    # Identity of the provider key for rate limiting, and its budgets (None = default)
+    limit_key: str = ""
+    # UserAPIKey id the provider was registered from (usage metering per key)
+    key_id: Optional[str] = None
+    rpm_limit: Optional[int] = None
+    tpm_limit: Optional[int] = None
+    # Called with every HTTP response (rate limit header feedback)
+    on_response: Optional[Callable[["LLMProvider", httpx.Response], Awaitable[None]]] = None
+
+    async def _observe(self, response: httpx.Response):
+        """Report a response to the orchestrator before its status is checked"""
+        if self.on_response is not None:
+            await self.on_response(self, response)
+
     @abstractmethod
-    async def generate(self, prompt: str, **kwargs) -> str:
-        """Generate text from prompt"""
+    async def generate(self, prompt: Prompt, **kwargs) -> str:
+        """Generate text from prompt (a string or a ChatPrompt)"""
         pass
 
     @abstractmethod
-    async def generate_stream(self, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
-        """Generate text from prompt with streaming"""
+    async def generate_stream(self, prompt: Prompt, **kwargs) -> AsyncGenerator[StreamChunk, None]:
+        """Generate text from prompt (a string or a ChatPrompt) with streaming"""
         pass
 
 
@@ -24,93 +58,110 @@ class OpenAIProvider(LLMProvider):
         self,
         api_key: str,
         base_url: Optional[str] = None,
-        model: str = "gpt-4"
+        model: str = "gpt-4",
+        registry: Optional[LLMClientRegistry] = None
     ):
         self.api_key = api_key
         self.base_url = base_url or "https://api.openai.com/v1"
         self.model = model
-        self.client = httpx.AsyncClient(
-            base_url=self.base_url,
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            },
-            timeout=60.0
-        )
+        self.registry = registry or get_llm_registry()
+        self.limit_key = f"openai:{key_fingerprint(api_key)}"
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _client(self):
+        """Borrow the pooled HTTP client for this key"""
+        return self.registry.borrow("openai", self.base_url, self.api_key, self.headers)
+
+    @staticmethod
+    def _messages(prompt: Prompt) -> List[Dict[str, Any]]:
+        # Prefix caching is automatic; the system message keeps the stable part first
+        if isinstance(prompt, ChatPrompt):
+            return prompt.to_openai_messages()
+        return [{"role": "user", "content": prompt}]
 
     async def generate(
         self,
-        prompt: str,
+        prompt: Prompt,
         max_tokens: Optional[int] = None,
         temperature: float = 0.7,
+        model: Optional[str] = None,
         **kwargs
     ) -> str:
         """Generate text from OpenAI API"""
         payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "model": model or self.model,
+            "messages": self._messages(prompt),
             "temperature": temperature,
             "max_tokens": max_tokens or 500,
         }
 
-        response = await self.client.post("/chat/completions", json=payload)
+        async with self._client() as client:
+            response = await client.post("/chat/completions", json=payload)
+        await self._observe(response)
         response.raise_for_status()
         data = response.json()
 
         content = data["choices"][0]["message"]["content"]
-        usage = data.get("usage", {})
+        usage = LLMUsage.from_openai(data.get("usage") or {}, data.get("model") or payload["model"])
 
         return {
             "content": content,
-            "tokens": usage.get("total_tokens", 0)
+            "tokens": usage.total_tokens,
+            "usage": usage.to_dict()
         }
 
     async def generate_stream(
         self,
-        prompt: str,
+        prompt: Prompt,
         max_tokens: Optional[int] = None,
         temperature: float = 0.7,
+        model: Optional[str] = None,
         **kwargs
-    ) -> AsyncGenerator[Dict[str, Any], None]:
+    ) -> AsyncGenerator[StreamChunk, None]:
         """Generate text from OpenAI API with streaming"""
         payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "model": model or self.model,
+            "messages": self._messages(prompt),
             "temperature": temperature,
             "max_tokens": max_tokens or 500,
             "stream": True
         }
-
-        async with self.client.stream("POST", "/chat/completions", json=payload) as response:
+        if settings.LLM_STREAM_USAGE:
+            # Usage arrives in a last chunk (empty choices) after the finish reason
+            payload["stream_options"] = {"include_usage": True}
+
+        finish_reason = None
+        usage = None
+        async with self._client() as client, client.stream("POST", "/chat/completions", json=payload) as response:
+            await self._observe(response)
             response.raise_for_status()
-            async for line in response.aiter_lines():
-                if line.startswith("data: "):
-                    data_str = line[6:]
-                    if data_str == "[DONE]":
-                        break
-                    try:
-                        import json
-                        data = json.loads(data_str)
-                        if "choices" in data and len(data["choices"]) > 0:
-                            delta = data["choices"][0].get("delta", {})
-                            if "content" in delta:
-                                yield {
-                                    "content": delta["content"],
-                                    "is_complete": False
-                                }
-                            finish_reason = data["choices"][0].get("finish_reason")
-                            if finish_reason:
-                                yield {
-                                    "content": "",
-                                    "is_complete": True,
-                                    "finish_reason": finish_reason
-                                }
-                    except json.JSONDecodeError:
-                        pass
+            async for event in aiter_sse(response.aiter_bytes()):
+                if event.raw == b"[DONE]":
+                    break
+                try:
+                    data = event.json()
+                except ValueError:
+                    continue
+                if "error" in data:
+                    raise LLMStreamError(str(data["error"]))
+                if data.get("usage"):
+                    usage = LLMUsage.from_openai(data["usage"], data.get("model") or payload["model"])
+                choices = data.get("choices")
+                if not choices:
+                    continue
+                choice = choices[0]
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield StreamChunk(content)
+                finish_reason = choice.get("finish_reason") or finish_reason
+        if finish_reason or usage:
+            yield StreamChunk(is_complete=True, finish_reason=finish_reason, usage=usage)
 
     async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        """Release the provider; its HTTP client is pooled by the registry"""
 
 
 class AnthropicProvider(LLMProvider):
@@ -119,95 +170,136 @@ class AnthropicProvider(LLMProvider):
     def __init__(
         self,
         api_key: str,
-        model: str = "claude-3-5-sonnet-20241022"
+        model: str = "claude-3-5-sonnet-20241022",
+        registry: Optional[LLMClientRegistry] = None
     ):
         self.api_key = api_key
         self.model = model
-        self.client = httpx.AsyncClient(
-            base_url="https://api.anthropic.com/v1",
-            headers={
-                "x-api-key": self.api_key,
-                "Content-Type": "application/json",
-                "anthropic-version": "2023-06-01"
-            },
-            timeout=60.0
-        )
+        self.base_url = "https://api.anthropic.com/v1"
+        self.registry = registry or get_llm_registry()
+        self.limit_key = f"anthropic:{key_fingerprint(api_key)}"
+        self.headers = {
+            "x-api-key": self.api_key,
+            "Content-Type": "application/json",
+            "anthropic-version": "2023-06-01"
+        }
+
+    def _client(self):
+        """Borrow the pooled HTTP client for this key"""
+        return self.registry.borrow("anthropic", self.base_url, self.api_key, self.headers)
+
+    @staticmethod
+    def _messages(prompt: Prompt) -> Dict[str, Any]:
+        """system and messages fields, with cache_control at the prompt's breakpoints"""
+        if not isinstance(prompt, ChatPrompt):
+            return {"messages": [{"role": "user", "content": prompt}]}
+        system, messages = prompt.to_anthropic()
+        fields = {"messages": messages}
+        if system:
+            fields["system"] = system
+        return fields
 
     async def generate(
         self,
-        prompt: str,
+        prompt: Prompt,
         max_tokens: Optional[int] = None,
         temperature: float = 0.7,
+        model: Optional[str] = None,
         **kwargs
     ) -> str:
         """Generate text from Anthropic API"""
         payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "model": model or self.model,
+            **self._messages(prompt),
             "temperature": temperature,
             "max_tokens": max_tokens or 500,
         }
 
-        response = await self.client.post("/messages", json=payload)
+        async with self._client() as client:
+            response = await client.post("/messages", json=payload)
+        await self._observe(response)
         response.raise_for_status()
         data = response.json()
 
         content = data["content"][0]["text"]
-        usage = data.get("usage", {})
+        usage = LLMUsage(model=data.get("model") or payload["model"])
+        usage.update_anthropic(data.get("usage") or {})
 
         return {
             "content": content,
-            "tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+            "tokens": usage.total_tokens,
+            "usage": usage.to_dict()
         }
 
     async def generate_stream(
         self,
-        prompt: str,
+        prompt: Prompt,
         max_tokens: Optional[int] = None,
         temperature: float = 0.7,
+        model: Optional[str] = None,
         **kwargs
-    ) -> AsyncGenerator[Dict[str, Any], None]:
+    ) -> AsyncGenerator[StreamChunk, None]:
         """Generate text from Anthropic API with streaming"""
         payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "model": model or self.model,
+            **self._messages(prompt),
             "temperature": temperature,
             "max_tokens": max_tokens or 500,
             "stream": True
         }
 
-        async with self.client.stream("POST", "/messages", json=payload) as response:
+        # Input usage comes with message_start, output usage with message_delta
+        usage = LLMUsage(model=payload["model"])
+        stop_reason = None
+        async with self._client() as client, client.stream("POST", "/messages", json=payload) as response:
+            await self._observe(response)
             response.raise_for_status()
-            async for line in response.aiter_lines():
-                if line.startswith("data: "):
-                    data_str = line[6:]
-                    try:
-                        import json
-                        data = json.loads(data_str)
-                        if data["type"] == "content_block_delta":
-                            yield {
-                                "content": data["delta"]["text"],
-                                "is_complete": False
-                            }
-                        elif data["type"] == "message_stop":
-                            yield {
-                                "content": "",
-                                "is_complete": True,
-                                "finish_reason": "stop"
-                            }
-                    except json.JSONDecodeError:
-                        pass
+            async for event in aiter_sse(response.aiter_bytes()):
+                try:
+                    data = event.json()
+                except ValueError:
+                    continue
+                event_type = data.get("type")
+                if event_type == "content_block_delta":
+                    text = data["delta"].get("text")
+                    if text:
+                        yield StreamChunk(text)
+                elif event_type == "message_start":
+                    message = data.get("message") or {}
+                    usage.model = message.get("model") or usage.model
+                    usage.update_anthropic(message.get("usage") or {})
+                elif event_type == "message_delta":
+                    stop_reason = (data.get("delta") or {}).get("stop_reason") or stop_reason
+                    usage.update_anthropic(data.get("usage") or {})
+                elif event_type == "message_stop":
+                    yield StreamChunk(is_complete=True, finish_reason=stop_reason or "stop", usage=usage)
+                elif event_type == "error":
+                    raise LLMStreamError(str(data.get("error")))
 
     async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        """Release the provider; its HTTP client is pooled by the registry"""
 
 
 class LLMOrchestrator:
     """Orchestrator for managing multiple LLM providers"""
 
-    def __init__(self):
+    # Provider name that routes each request to the best registered provider
+    AUTO_PROVIDER = "auto"
+
+    def __init__(
+        self,
+        rate_limiter: Optional[LLMRateLimiter] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        router: Optional[LLMRouter] = None,
+        task_metrics: Optional[LLMTaskMetrics] = None,
+        scheduler: Optional[LLMScheduler] = None
+    ):
         self._providers: Dict[str, LLMProvider] = {}
+        self._rate_limiter = rate_limiter
+        self.resilience = resilience or ResiliencePolicy()
+        self.router = router or get_llm_router()
+        self.task_metrics = task_metrics or get_llm_task_metrics()
+        self.scheduler = scheduler or get_llm_scheduler()
 
     def register_provider(
         self,
@@ -215,17 +307,27 @@ class LLMOrchestrator:
         provider_type: str,
         api_key: str,
         base_url: Optional[str] = None,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        rpm_limit: Optional[int] = None,
+        tpm_limit: Optional[int] = None,
+        task_models: Optional[Dict[str, str]] = None,
+        key_id: Optional[str] = None
     ):
-        """Register a new LLM provider"""
+        """
+        Register a new LLM provider
+
+        rpm_limit/tpm_limit override the default budgets of its key;
+        task_models maps task classes this key should serve to their model;
+        key_id (the UserAPIKey id) attributes the provider's usage to its key.
+        """
         if provider_type == "openai":
-            self._providers[name] = OpenAIProvider(
+            provider = OpenAIProvider(
                 api_key=api_key,
                 base_url=base_url,
                 model=model or "gpt-4"
             )
         elif provider_type == "anthropic":
-            self._providers[name] = AnthropicProvider(
+            provider = AnthropicProvider(
                 api_key=api_key,
                 model=model or "claude-3-5-sonnet-20241022"
             )
@@ -234,7 +336,7 @@ class LLMOrchestrator:
             # base_url must be provided for custom providers
             if not base_url:
                 raise ValueError(f"base_url is required for custom providers")
-            self._providers[name] = OpenAIProvider(
+            provider = OpenAIProvider(
                 api_key=api_key,
                 base_url=base_url,
                 model=model or "gpt-4"
@@ -242,39 +344,380 @@ class LLMOrchestrator:
         else:
             raise ValueError(f"Unknown provider type: {provider_type}")
 
+        provider.provider_type = provider_type
+        provider.task_models = dict(task_models or {})
+        provider.rpm_limit = rpm_limit
+        provider.tpm_limit = tpm_limit
+        provider.key_id = key_id
+        provider.on_response = self._observe_response
+        self._providers[name] = provider
+
     def get_provider(self, name: str) -> Optional[LLMProvider]:
         """Get a registered provider"""
         return self._providers.get(name)
 
+    def is_available(self, provider_name: str) -> bool:
+        """Whether requests for provider_name (a provider or AUTO_PROVIDER) can be served"""
+        if provider_name == self.AUTO_PROVIDER:
+            return bool(self._providers)
+        return provider_name in self._providers
+
+    def _candidates(
+        self,
+        provider_name: str,
+        sticky_key: Optional[str],
+        task_class: Optional[str] = None
+    ) -> List[Tuple[str, LLMProvider]]:
+        """Providers to try for a request, in order"""
+        if provider_name != self.AUTO_PROVIDER:
+            provider = self.get_provider(provider_name)
+            if not provider:
+                raise ValueError(f"Provider not found: {provider_name}")
+            requested = [(provider_name, provider)]
+        elif not self._providers:
+            raise ValueError("No providers registered")
+        else:
+            ranked = self.router.rank(
+                {name: provider.limit_key for name, provider in self._providers.items()},
+                sticky_key
+            )
+            requested = [(name, self._providers[name]) for name in ranked]
+
+        if task_class:
+            # Keys configured for the task class go first; the requested provider is the fallback
+            dedicated = {
+                name: provider.limit_key
+                for name, provider in self._providers.items()
+                if task_class in provider.task_models
+            }
+            if dedicated:
+                ranked = self.router.rank(dedicated, sticky_key)
+                return [(name, self._providers[name]) for name in ranked] + [
+                    (name, provider) for name, provider in requested if name not in dedicated
+                ]
+        return requested
+
+    @staticmethod
+    def _task_kwargs(provider: LLMProvider, task_class: Optional[str], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Call arguments with the model selected for the task class on this provider"""
+        if not task_class or kwargs.get("model"):
+            return kwargs
+        model = provider.task_models.get(task_class) or global_task_model(task_class, provider.provider_type)
+        return {**kwargs, "model": model} if model else kwargs
+
+    async def _get_rate_limiter(self) -> Optional[LLMRateLimiter]:
+        if self._rate_limiter is None and settings.LLM_RATE_LIMIT_ENABLED:
+            from app.services.llm_rate_limiter import get_llm_rate_limiter
+            self._rate_limiter = await get_llm_rate_limiter()
+        return self._rate_limiter
+
+    async def _reserve(self, provider: LLMProvider, prompt: Prompt, max_tokens: Optional[int]) -> int:
+        """Wait for the provider key's budgets and reserve prompt plus output tokens"""
+        limiter = await self._get_rate_limiter()
+        if limiter is None:
+            return 0
+        reserved = estimate_tokens(prompt_text(prompt)) + (max_tokens or 500)
+        await limiter.acquire(provider.limit_key, reserved, provider.rpm_limit, provider.tpm_limit)
+        return reserved
+
+    async def _settle(self, provider: LLMProvider, reserved: int, used: int):
+        # Unreserved calls (hedged requests) are charged what they used
+        if self._rate_limiter is not None:
+            await self._rate_limiter.settle(provider.limit_key, reserved, used)
+
+    async def _observe_response(self, provider: LLMProvider, response: httpx.Response):
+        if self._rate_limiter is not None:
+            await self._rate_limiter.observe(provider.limit_key, response.headers, response.status_code)
+
     async def generate(
         self,
         provider_name: str,
-        prompt: str,
+        prompt: Prompt,
+        sticky_key: Optional[str] = None,
+        task_class: Optional[str] = None,
+        use_cache: Optional[bool] = None,
+        priority: Optional[int] = None,
         **kwargs
     ) -> Dict[str, Any]:
-        """Generate text using specified provider"""
-        provider = self.get_provider(provider_name)
-        if not provider:
-            raise ValueError(f"Provider not found: {provider_name}")
+        """
+        Generate text using specified provider (retried per error class)
+
+        With AUTO_PROVIDER the registered providers are tried in routing
+        order, failing over to the next one when a provider fails.
+        task_class (an LLMTaskClass) selects the key and model for the call.
+        Deterministic calls of cacheable task classes are served from the
+        response cache when it is enabled (use_cache=False bypasses it).
+        priority (an LLMPriority, by default the task class's) orders the
+        call when the provider key's slots are all busy.
+        """
+        candidates = self._candidates(provider_name, sticky_key, task_class)
+        if priority is None:
+            priority = LLMPriority.for_task(task_class)
+        response_cache = None
+        if use_cache is not False and self._is_cacheable(task_class, kwargs):
+            from app.services.llm_response_cache import get_llm_response_cache
+
+            response_cache = await get_llm_response_cache()
+        return await self._generate_routed(
+            candidates, prompt, sticky_key, task_class, priority, kwargs, response_cache
+        )
 
-        return await provider.generate(prompt, **kwargs)
+    @staticmethod
+    def _is_cacheable(task_class: Optional[str], kwargs: Dict[str, Any]) -> bool:
+        return (
+            settings.LLM_RESPONSE_CACHE_ENABLED
+            and task_class in settings.LLM_RESPONSE_CACHE_TASK_CLASSES
+            and kwargs.get("temperature", 0.7) <= settings.LLM_RESPONSE_CACHE_MAX_TEMPERATURE
+        )
+
+    async def _generate_routed(
+        self,
+        candidates: List[Tuple[str, LLMProvider]],
+        prompt: Prompt,
+        sticky_key: Optional[str],
+        task_class: Optional[str],
+        priority: int,
+        kwargs: Dict[str, Any],
+        response_cache: Optional[LLMResponseCache] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate with the first candidate that succeeds
+
+        With a response cache, each candidate's response is cached under its
+        own key and model, so a response is only reused for the provider
+        that would serve the call.
+        """
+        started = time.monotonic()
+        last_error: Optional[Exception] = None
+        for name, provider in candidates:
+            call_kwargs = self._task_kwargs(provider, task_class, kwargs)
+
+            async def call(provider: LLMProvider = provider, call_kwargs: Dict[str, Any] = call_kwargs):
+                async with self.scheduler.slot(provider.limit_key, priority):
+                    result = await self._generate_with(provider, prompt, call_kwargs)
+                self.router.record_success(provider.limit_key)
+                if sticky_key:
+                    self.router.pin(sticky_key, provider.limit_key)
+                usage = self._call_usage(
+                    provider,
+                    prompt,
+                    result.get("content"),
+                    LLMUsage.from_dict(result["usage"]) if result.get("usage") else None,
+                    call_kwargs
+                )
+                self.task_metrics.record(task_class, time.monotonic() - started, usage.total_tokens)
+                return {**result, "tokens": usage.total_tokens, "usage": usage.to_dict()}
+
+            try:
+                if response_cache is None:
+                    return await call()
+                key = response_cache.make_key(
+                    provider.limit_key, call_kwargs.get("model") or provider.model, prompt, call_kwargs
+                )
+                return await response_cache.get_or_compute(key, call)
+            except Exception as e:
+                self.router.record_failure(provider.limit_key)
+                last_error = e
+                if len(candidates) > 1:
+                    logger.warning(f"Provider {name} failed, trying next provider: {e}")
+        self.task_metrics.record(task_class, time.monotonic() - started, ok=False)
+        raise last_error
+
+    @staticmethod
+    def _call_usage(
+        provider: LLMProvider,
+        prompt: Prompt,
+        content: Optional[str],
+        usage: Optional[LLMUsage],
+        kwargs: Dict[str, Any]
+    ) -> LLMUsage:
+        """Usage of a call as reported by the provider, estimated when it reported none"""
+        if usage is None or not usage.total_tokens:
+            usage = LLMUsage(
+                input_tokens=estimate_tokens(prompt_text(prompt)),
+                output_tokens=estimate_tokens(content),
+                model=kwargs.get("model") or provider.model,
+                estimated=True
+            )
+        usage.key_id = provider.key_id
+        return usage
+
+    async def _generate_with(self, provider: LLMProvider, prompt: Prompt, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        breaker = get_circuit_breaker(provider.limit_key)
+        async for attempt in self.resilience.retrying():
+            with attempt:
+                breaker.before_call()
+                reserved = await self._reserve(provider, prompt, kwargs.get("max_tokens"))
+                used = estimate_tokens(prompt_text(prompt))
+                try:
+                    result = await provider.generate(prompt, **kwargs)
+                    used = result.get("tokens") or used + estimate_tokens(result.get("content"))
+                except Exception as e:
+                    breaker.record_failure(e)
+                    raise
+                finally:
+                    await self._settle(provider, reserved, used)
+                breaker.record_success()
+        return result
+
+    async def _metered_stream(self, provider: LLMProvider, prompt: Prompt, kwargs: Dict[str, Any], reserved: int):
+        """
+        One streaming request, charged against the provider key's budgets
+
+        reserved is what _reserve() took for it beforehand; the difference to
+        the tokens actually used is settled when the stream ends.
+        """
+        parts = []
+        usage: Optional[LLMUsage] = None
+        try:
+            async for chunk in provider.generate_stream(prompt, **kwargs):
+                if chunk.content:
+                    parts.append(chunk.content)
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                yield chunk
+        finally:
+            used = usage.total_tokens if usage is not None else 0
+            await self._settle(
+                provider, reserved, used or estimate_tokens(prompt_text(prompt)) + estimate_tokens("".join(parts))
+            )
+
+    async def _open_stream(
+        self,
+        provider: LLMProvider,
+        prompt: Prompt,
+        kwargs: Dict[str, Any],
+        priority: int = LLMPriority.TURN
+    ):
+        """Start a stream on one provider and wait for its first chunk (retried per error class)"""
+        breaker = get_circuit_breaker(provider.limit_key)
+        async for attempt in self.resilience.retrying():
+            with attempt:
+                breaker.before_call()
+                # Wait for the key's budgets before the first-token and hedge
+                # timers start, so throttling doesn't count as a slow provider.
+                # A hedged request doesn't wait again: it is charged for the
+                # tokens it used when it ends.
+                reservations = [await self._reserve(provider, prompt, kwargs.get("max_tokens"))]
+                try:
+                    # A hedged request takes a second slot of the key, if one is free
+                    stream, first = await self.resilience.open_stream(
+                        lambda: self._metered_stream(
+                            provider, prompt, kwargs, reservations.pop() if reservations else 0
+                        ),
+                        acquire_hedge=lambda: self.scheduler.try_acquire(provider.limit_key, priority),
+                        release_hedge=lambda: self.scheduler.release(provider.limit_key)
+                    )
+                except Exception as e:
+                    breaker.record_failure(e)
+                    raise
+        breaker.record_success()
+        return stream, first
 
     async def generate_stream(
         self,
         provider_name: str,
-        prompt: str,
+        prompt: Prompt,
+        sticky_key: Optional[str] = None,
+        task_class: Optional[str] = None,
+        priority: Optional[int] = None,
         **kwargs
     ):
-        """Generate text using specified provider with streaming"""
-        provider = self.get_provider(provider_name)
-        if not provider:
-            raise ValueError(f"Provider not found: {provider_name}")
-
-        async for chunk in provider.generate_stream(prompt, **kwargs):
-            yield chunk
+        """
+        Generate text using specified provider with streaming
+
+        Failures before the first token are retried (and the request hedged
+        if the first token is late), then failed over to the next provider
+        when routing with AUTO_PROVIDER. Once content has been yielded,
+        errors propagate to the caller. task_class (an LLMTaskClass) selects
+        the key and model for the call; priority (an LLMPriority, by default
+        the task class's) orders it while the provider key's slots are busy.
+        The slot is held until the stream ends.
+
+        The stream ends with an is_complete chunk carrying the call's usage
+        (estimated if the provider reported none).
+        """
+        candidates = self._candidates(provider_name, sticky_key, task_class)
+        if priority is None:
+            priority = LLMPriority.for_task(task_class)
+        loop = asyncio.get_running_loop()
+        request_started = loop.time()
+        last_error: Optional[Exception] = None
+        for name, provider in candidates:
+            await self.scheduler.acquire(provider.limit_key, priority)
+            started = loop.time()
+            call_kwargs = self._task_kwargs(provider, task_class, kwargs)
+            try:
+                stream, first = await self._open_stream(provider, prompt, call_kwargs, priority)
+            except BaseException as e:
+                self.scheduler.release(provider.limit_key)
+                if not isinstance(e, Exception):
+                    raise
+                self.router.record_failure(provider.limit_key)
+                last_error = e
+                if len(candidates) > 1:
+                    logger.warning(f"Provider {name} failed before the first token, trying next provider: {e}")
+                continue
+            break
+        else:
+            self.task_metrics.record(task_class, loop.time() - request_started, ok=False)
+            raise last_error
+
+        # The provider key's slot is held until the stream is done, and given
+        # back before the completion chunk (consumers stop iterating there)
+        try:
+            ttft = loop.time() - request_started
+            self.router.record_success(provider.limit_key, ttft=loop.time() - started)
+            if sticky_key:
+                self.router.pin(sticky_key, provider.limit_key)
+            if first is None:
+                completion = StreamChunk(
+                    is_complete=True, usage=self._call_usage(provider, prompt, "", None, call_kwargs)
+                )
+                self.task_metrics.record(task_class, ttft, completion.usage.total_tokens, ttft=ttft)
+            else:
+                breaker = get_circuit_breaker(provider.limit_key)
+                parts = []
+                completion = None
+                ok = True
+                chunks = self.resilience.iter_stream(stream)
+                try:
+                    chunk = first
+                    while not chunk.is_complete:
+                        parts.append(chunk.content)
+                        yield chunk
+                        try:
+                            chunk = await chunks.__anext__()
+                        except StopAsyncIteration:
+                            # The provider ended without a completion chunk
+                            chunk = StreamChunk(is_complete=True)
+                    chunk.usage = self._call_usage(provider, prompt, "".join(parts), chunk.usage, call_kwargs)
+                    completion = chunk
+                except Exception as e:
+                    ok = False
+                    breaker.record_failure(e)
+                    self.router.record_failure(provider.limit_key)
+                    raise
+                finally:
+                    await chunks.aclose()
+                    await stream.aclose()
+                    usage = (
+                        completion.usage if completion is not None
+                        else self._call_usage(provider, prompt, "".join(parts), None, call_kwargs)
+                    )
+                    self.task_metrics.record(
+                        task_class,
+                        loop.time() - request_started,
+                        usage.total_tokens,
+                        ttft=ttft,
+                        ok=ok
+                    )
+        finally:
+            self.scheduler.release(provider.limit_key)
+        yield completion
 
     async def close_all(self):
-        """Close all provider connections"""
+        """Release all providers (their pooled HTTP clients stay in the registry)"""
         for provider in self._providers.values():
             await provider.close()
         self._providers.clear()
@@ -0,0 +1,253 @@
+"""
+Client-side rate limiting of LLM calls per provider key.
+
+Every provider key gets a pair of token buckets in Redis (requests per
+minute and tokens per minute), so discussions and report generation on all
+workers draw from one shared budget. Callers are queued until their
+reservation fits instead of being sent out to collect 429s.
+
+A call reserves one request plus its estimated prompt tokens and its full
+max_tokens up front; the difference to the real usage is settled when the
+call finishes. Rate limit headers returned by the provider lower the
+budgets to what the provider actually grants, and a 429 pauses the key for
+its Retry-After.
+"""
+import asyncio
+import logging
+from typing import Dict, Mapping, Optional
+
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count (CJK characters ~1 token each, other text ~4 characters per token)"""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (len(text) - ascii_chars) + ascii_chars // 4 + 1
+
+
+def _header_int(headers: Mapping[str, str], *names: str) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return int(float(value))
+        except ValueError:
+            continue
+    return None
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str]) -> Dict[str, Optional[int]]:
+    """
+    Extract rate limit state from OpenAI- or Anthropic-style response headers
+
+    Returns:
+        Dict with request_limit, token_limit, requests_remaining,
+        tokens_remaining and retry_after_ms (None where not reported)
+    """
+    retry_after_ms = _header_int(headers, "retry-after-ms")
+    if retry_after_ms is None:
+        retry_after = _header_int(headers, "retry-after")
+        retry_after_ms = retry_after * 1000 if retry_after is not None else None
+    return {
+        "request_limit": _header_int(headers, "x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit"),
+        "token_limit": _header_int(headers, "x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit"),
+        "requests_remaining": _header_int(
+            headers, "x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining"
+        ),
+        "tokens_remaining": _header_int(
+            headers, "x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining"
+        ),
+        "retry_after_ms": retry_after_ms,
+    }
+
+
+class LLMRateLimiter:
+    """Redis-backed RPM/TPM token buckets shared by all workers"""
+
+    KEY_PREFIX = "llm_ratelimit"
+
+    # Refill both buckets, then take one request and the token reservation if
+    # both fit. Returns 0 on success, otherwise the milliseconds to wait.
+    # A configured budget of 0 defers to the limit reported by the provider;
+    # with neither known the bucket is unlimited.
+    _ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cost = tonumber(ARGV[3])
+local s = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts', 'req_limit', 'tok_limit', 'blocked_until')
+local blocked_until = tonumber(s[6]) or 0
+if blocked_until > now then
+    return blocked_until - now
+end
+local function capacity(configured, reported)
+    configured = tonumber(configured)
+    reported = tonumber(reported) or 0
+    if configured > 0 and reported > 0 then return math.min(configured, reported) end
+    if configured > 0 then return configured end
+    return reported
+end
+local req_cap = capacity(ARGV[1], s[4])
+local tok_cap = capacity(ARGV[2], s[5])
+local elapsed = math.max(0, now - (tonumber(s[3]) or now))
+local req = tonumber(s[1]) or req_cap
+local tok = tonumber(s[2]) or tok_cap
+if req_cap > 0 then req = math.min(req_cap, req + elapsed * req_cap / 60000) end
+if tok_cap > 0 then tok = math.min(tok_cap, tok + elapsed * tok_cap / 60000) end
+local wait = 0
+if req_cap > 0 and req < 1 then
+    wait = (1 - req) * 60000 / req_cap
+end
+if tok_cap > 0 then
+    -- A reservation larger than the bucket only waits for a full bucket
+    local need = math.min(cost, tok_cap)
+    if tok < need then
+        wait = math.max(wait, (need - tok) * 60000 / tok_cap)
+    end
+end
+if wait == 0 then
+    if req_cap > 0 then req = req - 1 end
+    if tok_cap > 0 then tok = tok - cost end
+end
+redis.call('HSET', KEYS[1], 'ts', now)
+if req_cap > 0 then redis.call('HSET', KEYS[1], 'req', req) end
+if tok_cap > 0 then redis.call('HSET', KEYS[1], 'tok', tok) end
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return math.ceil(wait)
+"""
+
+    # Apply provider feedback: reported limits, remaining budget and Retry-After.
+    # ARGV: request_limit, token_limit, requests_remaining, tokens_remaining,
+    # retry_after_ms, ttl_ms (-1 = not reported)
+    _OBSERVE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local req_limit = tonumber(ARGV[1])
+local tok_limit = tonumber(ARGV[2])
+local req_remaining = tonumber(ARGV[3])
+local tok_remaining = tonumber(ARGV[4])
+local retry_after = tonumber(ARGV[5])
+if req_limit > 0 then redis.call('HSET', KEYS[1], 'req_limit', req_limit) end
+if tok_limit > 0 then redis.call('HSET', KEYS[1], 'tok_limit', tok_limit) end
+local s = redis.call('HMGET', KEYS[1], 'req', 'tok')
+if req_remaining >= 0 and tonumber(s[1]) and req_remaining < tonumber(s[1]) then
+    redis.call('HSET', KEYS[1], 'req', req_remaining)
+end
+if tok_remaining >= 0 and tonumber(s[2]) and tok_remaining < tonumber(s[2]) then
+    redis.call('HSET', KEYS[1], 'tok', tok_remaining)
+end
+if retry_after > 0 then
+    redis.call('HSET', KEYS[1], 'blocked_until', now + retry_after)
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[6])
+return 1
+"""
+
+    def __init__(self, redis: aioredis.Redis, default_rpm: int = None, default_tpm: int = None):
+        """
+        Initialize rate limiter
+
+        Args:
+            redis: Redis client
+            default_rpm: Requests per minute for keys without their own budget (0 = provider limit)
+            default_tpm: Tokens per minute for keys without their own budget (0 = provider limit)
+        """
+        self.redis = redis
+        self.default_rpm = settings.LLM_DEFAULT_RPM if default_rpm is None else default_rpm
+        self.default_tpm = settings.LLM_DEFAULT_TPM if default_tpm is None else default_tpm
+        self._acquire_script = redis.register_script(self._ACQUIRE_SCRIPT)
+        self._observe_script = redis.register_script(self._OBSERVE_SCRIPT)
+        # Per-key FIFO queues of local callers (asyncio locks wake waiters in order)
+        self._queues: Dict[str, asyncio.Lock] = {}
+        self._ttl_ms = 120000
+
+    def _key(self, limit_key: str) -> str:
+        return f"{self.KEY_PREFIX}:{limit_key}"
+
+    async def acquire(self, limit_key: str, tokens: int, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        """
+        Wait until one request and tokens fit the key's budgets, then take them
+
+        Args:
+            limit_key: Provider key identity (provider type and key fingerprint)
+            tokens: Tokens to reserve (prompt estimate plus max_tokens)
+            rpm: Requests per minute for this key (None = default)
+            tpm: Tokens per minute for this key (None = default)
+        """
+        rpm = self.default_rpm if rpm is None else rpm
+        tpm = self.default_tpm if tpm is None else tpm
+        queue = self._queues.setdefault(limit_key, asyncio.Lock())
+        async with queue:
+            while True:
+                try:
+                    wait_ms = await self._acquire_script(
+                        keys=[self._key(limit_key)],
+                        args=[rpm, tpm, tokens, self._ttl_ms]
+                    )
+                except Exception as e:
+                    # Redis trouble must not stop LLM calls; the provider still enforces its limits
+                    logger.warning(f"LLM rate limiter unavailable, not throttling {limit_key}: {e}")
+                    return
+                if not wait_ms:
+                    return
+                logger.debug(f"LLM rate limit reached for {limit_key}, waiting {wait_ms}ms")
+                await asyncio.sleep(int(wait_ms) / 1000)
+
+    async def settle(self, limit_key: str, reserved: int, used: int):
+        """Return unused reserved tokens to the bucket (or charge an overrun)"""
+        if reserved == used:
+            return
+        try:
+            key = self._key(limit_key)
+            pipe = self.redis.pipeline()
+            pipe.hexists(key, "tok")
+            pipe.hincrbyfloat(key, "tok", reserved - used)
+            exists, _ = await pipe.execute()
+            if not exists:
+                # The bucket expired meanwhile; don't seed it with a partial value
+                await self.redis.hdel(key, "tok")
+        except Exception as e:
+            logger.warning(f"Failed to settle LLM token reservation for {limit_key}: {e}")
+
+    async def observe(self, limit_key: str, headers: Mapping[str, str], status_code: int):
+        """Feed provider rate limit headers (and 429s) back into the key's budgets"""
+        state = parse_rate_limit_headers(headers)
+        retry_after_ms = state["retry_after_ms"]
+        if status_code == 429 and not retry_after_ms:
+            retry_after_ms = 1000
+        if status_code != 429:
+            retry_after_ms = None
+
+        values = [
+            state["request_limit"], state["token_limit"],
+            state["requests_remaining"], state["tokens_remaining"],
+            retry_after_ms
+        ]
+        if all(value is None for value in values):
+            return
+        try:
+            await self._observe_script(
+                keys=[self._key(limit_key)],
+                args=[-1 if value is None else value for value in values] + [self._ttl_ms]
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record LLM rate limit headers for {limit_key}: {e}")
+
+
+# Global singleton instance
+_rate_limiter: Optional[LLMRateLimiter] = None
+
+
+async def get_llm_rate_limiter() -> LLMRateLimiter:
+    """Get the process-wide LLM rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        from app.core.redis import get_redis
+        _rate_limiter = LLMRateLimiter(await get_redis())
+    return _rate_limiter
@@ -0,0 +1,166 @@
+"""
+Process-wide registry of pooled HTTP clients for LLM providers.
+
+Providers no longer own an httpx client. They borrow one from this registry,
+which keeps a single long-lived HTTP/2 keep-alive client per
+(provider type, base_url, API key fingerprint), so discussions and requests
+using the same key share connections instead of paying TCP+TLS setup each
+time. Clients idle for longer than LLM_CLIENT_IDLE_TTL are closed.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ClientKey = Tuple[str, str, str]
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Non-reversible identifier of an API key, safe to keep in memory and logs"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class _PooledClient:
+    """A shared client plus its usage bookkeeping"""
+
+    __slots__ = ("client", "active", "last_used")
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.active = 0
+        self.last_used = time.monotonic()
+
+
+class LLMClientRegistry:
+    """Shares pooled httpx clients between all LLM providers of the process"""
+
+    def __init__(
+        self,
+        max_connections: int = None,
+        max_keepalive_connections: int = None,
+        keepalive_expiry: float = None,
+        timeout: float = None,
+        connect_timeout: float = None,
+        http2: bool = None,
+        idle_ttl: float = None
+    ):
+        """
+        Initialize registry (defaults from settings)
+
+        Args:
+            max_connections: Max open connections per client
+            max_keepalive_connections: Max idle keep-alive connections per client
+            keepalive_expiry: Seconds an idle connection is kept open
+            timeout: Read/write/pool timeout in seconds
+            connect_timeout: Connection setup timeout in seconds
+            http2: Negotiate HTTP/2 where the provider supports it
+            idle_ttl: Seconds without use before a client is closed
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=keepalive_expiry or settings.LLM_HTTP_KEEPALIVE_EXPIRY
+        )
+        self.timeout = httpx.Timeout(
+            timeout or settings.LLM_HTTP_TIMEOUT,
+            connect=connect_timeout or settings.LLM_CONNECT_TIMEOUT
+        )
+        self.http2 = settings.LLM_HTTP2 if http2 is None else http2
+        self.idle_ttl = idle_ttl or settings.LLM_CLIENT_IDLE_TTL
+        self._clients: Dict[ClientKey, _PooledClient] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start closing idle clients in the background"""
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def close(self):
+        """Stop the reaper and close every client"""
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        clients, self._clients = list(self._clients.values()), {}
+        for pooled in clients:
+            await pooled.client.aclose()
+
+    def _get(self, provider_type: str, base_url: str, api_key: str, headers: Dict[str, str]) -> _PooledClient:
+        key = (provider_type, base_url, key_fingerprint(api_key))
+        pooled = self._clients.get(key)
+        if pooled is None or pooled.client.is_closed:
+            pooled = _PooledClient(httpx.AsyncClient(
+                base_url=base_url,
+                headers=headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2
+            ))
+            self._clients[key] = pooled
+            logger.info(f"Opened pooled {provider_type} client for {base_url} (key {key[2]})")
+        return pooled
+
+    @asynccontextmanager
+    async def borrow(
+        self,
+        provider_type: str,
+        base_url: str,
+        api_key: str,
+        headers: Dict[str, str]
+    ) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        Borrow the shared client for a provider key for the duration of a request
+
+        Args:
+            provider_type: Provider family (e.g. "openai", "anthropic")
+            base_url: API base URL
+            api_key: API key the client authenticates with
+            headers: Default headers, used when the client is created
+        """
+        pooled = self._get(provider_type, base_url, api_key, headers)
+        pooled.active += 1
+        try:
+            yield pooled.client
+        finally:
+            pooled.active -= 1
+            pooled.last_used = time.monotonic()
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_ttl / 4))
+            now = time.monotonic()
+            for key, pooled in list(self._clients.items()):
+                if pooled.active == 0 and now - pooled.last_used >= self.idle_ttl:
+                    del self._clients[key]
+                    try:
+                        await pooled.client.aclose()
+                        logger.info(f"Closed idle {key[0]} client for {key[1]} (key {key[2]})")
+                    except Exception as e:
+                        logger.warning(f"Failed to close idle LLM client: {e}")
+
+
+# Global singleton instance
+_registry: Optional[LLMClientRegistry] = None
+
+
+def get_llm_registry() -> LLMClientRegistry:
+    """Get or create the process-wide LLM client registry"""
+    global _registry
+    if _registry is None:
+        _registry = LLMClientRegistry()
+    return _registry
+
+
+async def close_llm_registry():
+    """Close the process-wide LLM client registry"""
+    global _registry
+    if _registry is not None:
+        await _registry.close()
+        _registry = None
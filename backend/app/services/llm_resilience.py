@@ -0,0 +1,307 @@
+"""
+Failure handling for LLM provider calls.
+
+- Errors are classified (connect, timeout, rate limit, server, client) and
+  retried with jittered exponential backoff up to a per-class attempt limit.
+- A circuit breaker per provider key fails calls fast after repeated
+  connection, timeout or server errors, and lets a single probe through once
+  the reset timeout has passed.
+- Streams have their own first-token and inter-token timeouts on top of the
+  HTTP connect timeout, and can optionally be hedged: when the first token is
+  late a second request is started and the slower one is cancelled. The
+  hedged request needs its own scheduler slot and is skipped without one.
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+import httpx
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception, wait_exponential_jitter
+
+from app.core.config import settings
+from app.services.llm_stream import LLMStreamError, StreamChunk
+
+logger = logging.getLogger(__name__)
+
+
+class LLMErrorClass:
+    """Error classes with their own retry budgets"""
+
+    CONNECT = "connect"
+    TIMEOUT = "timeout"
+    RATE_LIMIT = "rate_limit"
+    SERVER = "server"
+    CLIENT = "client"
+    CIRCUIT_OPEN = "circuit_open"
+
+
+class LLMTimeoutError(asyncio.TimeoutError):
+    """A stream did not produce its first or next token in time"""
+
+
+class CircuitOpenError(Exception):
+    """Calls to a provider key are suspended after repeated failures"""
+
+
+def classify_error(exc: BaseException) -> str:
+    """Map an exception raised by a provider call to an LLMErrorClass"""
+    if isinstance(exc, CircuitOpenError):
+        return LLMErrorClass.CIRCUIT_OPEN
+    if isinstance(exc, LLMStreamError):
+        # Errors inside a stream are overload / server side failures
+        return LLMErrorClass.SERVER
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        if status == 429:
+            return LLMErrorClass.RATE_LIMIT
+        if status == 408:
+            return LLMErrorClass.TIMEOUT
+        if status >= 500:
+            return LLMErrorClass.SERVER
+        return LLMErrorClass.CLIENT
+    if isinstance(exc, httpx.ConnectTimeout):
+        return LLMErrorClass.CONNECT
+    if isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError)):
+        return LLMErrorClass.TIMEOUT
+    if isinstance(exc, httpx.TransportError):
+        return LLMErrorClass.CONNECT
+    return LLMErrorClass.CLIENT
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one provider key"""
+
+    # Failures that say something about the provider's health
+    COUNTED = {LLMErrorClass.CONNECT, LLMErrorClass.TIMEOUT, LLMErrorClass.SERVER}
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        """
+        Initialize circuit breaker
+
+        Args:
+            name: Provider key identity (for logs)
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe is allowed
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.LLM_CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.LLM_CIRCUIT_RESET_TIMEOUT
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(f"Circuit open for {self.name}")
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit closed for {self.name}")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self, exc: BaseException):
+        if classify_error(exc) not in self.COUNTED:
+            if self._probing:
+                # The probe got an answer, so the provider is reachable again
+                self.record_success()
+            return
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._probing:
+                logger.warning(f"Circuit opened for {self.name} after {self.failures} failures: {exc}")
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class ResiliencePolicy:
+    """Retry budgets, timeouts and hedging for provider calls"""
+
+    def __init__(
+        self,
+        max_attempts: Optional[Dict[str, int]] = None,
+        backoff_initial: float = None,
+        backoff_max: float = None,
+        first_token_timeout: float = None,
+        inter_token_timeout: float = None,
+        hedge_after: float = None
+    ):
+        """
+        Initialize policy (defaults from settings)
+
+        Args:
+            max_attempts: Attempts per LLMErrorClass (classes not listed are not retried)
+            backoff_initial: First backoff in seconds (doubles per attempt, with jitter)
+            backoff_max: Maximum backoff in seconds
+            first_token_timeout: Seconds a stream may take to produce its first token (0 = off)
+            inter_token_timeout: Seconds allowed between stream tokens (0 = off)
+            hedge_after: Seconds without a first token before a hedged request starts (0 = off)
+        """
+        self.max_attempts = max_attempts or {
+            LLMErrorClass.CONNECT: settings.LLM_RETRY_ATTEMPTS,
+            LLMErrorClass.SERVER: settings.LLM_RETRY_ATTEMPTS,
+            LLMErrorClass.TIMEOUT: settings.LLM_RETRY_TIMEOUT_ATTEMPTS,
+            LLMErrorClass.RATE_LIMIT: settings.LLM_RETRY_RATE_LIMIT_ATTEMPTS,
+        }
+        self.backoff_initial = settings.LLM_RETRY_BACKOFF_INITIAL if backoff_initial is None else backoff_initial
+        self.backoff_max = settings.LLM_RETRY_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.first_token_timeout = (
+            settings.LLM_FIRST_TOKEN_TIMEOUT if first_token_timeout is None else first_token_timeout
+        )
+        self.inter_token_timeout = (
+            settings.LLM_INTER_TOKEN_TIMEOUT if inter_token_timeout is None else inter_token_timeout
+        )
+        self.hedge_after = settings.LLM_HEDGE_AFTER if hedge_after is None else hedge_after
+
+    def _attempts_for(self, exc: BaseException) -> int:
+        return self.max_attempts.get(classify_error(exc), 1)
+
+    def _stop(self, retry_state: RetryCallState) -> bool:
+        return retry_state.attempt_number >= self._attempts_for(retry_state.outcome.exception())
+
+    def _log_retry(self, retry_state: RetryCallState):
+        exc = retry_state.outcome.exception()
+        logger.warning(
+            f"LLM call failed ({classify_error(exc)}: {exc}), "
+            f"retrying attempt {retry_state.attempt_number + 1}"
+        )
+
+    def retrying(self) -> AsyncRetrying:
+        """Tenacity controller for one logical call"""
+        return AsyncRetrying(
+            retry=retry_if_exception(lambda exc: self._attempts_for(exc) > 1),
+            stop=self._stop,
+            wait=wait_exponential_jitter(initial=self.backoff_initial, max=self.backoff_max),
+            before_sleep=self._log_retry,
+            reraise=True
+        )
+
+    async def open_stream(
+        self,
+        start: Callable[[], AsyncIterator[StreamChunk]],
+        acquire_hedge: Optional[Callable[[], bool]] = None,
+        release_hedge: Optional[Callable[[], None]] = None
+    ) -> Tuple[AsyncIterator[StreamChunk], Optional[StreamChunk]]:
+        """
+        Start a stream and wait for its first chunk, hedging if it is late
+
+        Args:
+            start: Creates a new stream (called again for the hedged request)
+            acquire_hedge: Takes a slot for the hedged request without waiting;
+                the hedge is skipped when it returns False (None = no slot needed)
+            release_hedge: Returns that slot once the race is decided
+
+        Returns:
+            (stream, first chunk); the chunk is None if the stream was empty
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.first_token_timeout if self.first_token_timeout > 0 else None
+        hedged = self.hedge_after <= 0
+        hedge_slot = False
+        pending: Dict[asyncio.Task, AsyncIterator[StreamChunk]] = {}
+
+        def launch():
+            stream = start()
+            pending[asyncio.ensure_future(stream.__anext__())] = stream
+
+        launch()
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                now = loop.time()
+                timeouts = []
+                if deadline is not None:
+                    timeouts.append(deadline - now)
+                if not hedged:
+                    timeouts.append(started + self.hedge_after - now)
+                done, _ = await asyncio.wait(
+                    list(pending),
+                    timeout=max(0.0, min(timeouts)) if timeouts else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    stream = pending.pop(task)
+                    try:
+                        return stream, task.result()
+                    except StopAsyncIteration:
+                        return stream, None
+                    except Exception as e:
+                        error = e
+
+                now = loop.time()
+                if not done and deadline is not None and now >= deadline:
+                    raise LLMTimeoutError(f"No first token within {self.first_token_timeout}s")
+                if not done and not hedged and now >= started + self.hedge_after:
+                    hedged = True
+                    if acquire_hedge is not None and not acquire_hedge():
+                        logger.info(f"First token late after {self.hedge_after}s, no free slot to hedge")
+                        continue
+                    hedge_slot = acquire_hedge is not None
+                    logger.info(f"First token late after {self.hedge_after}s, sending hedged request")
+                    launch()
+            raise error
+        finally:
+            # Cancel whatever lost the race
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for stream in pending.values():
+                try:
+                    await stream.aclose()
+                except Exception:
+                    pass
+            # One stream at most survives, holding the caller's slot
+            if hedge_slot and release_hedge is not None:
+                release_hedge()
+
+    async def iter_stream(self, stream: AsyncIterator[StreamChunk]) -> AsyncIterator[StreamChunk]:
+        """Iterate the rest of a stream, enforcing the inter-token timeout"""
+        timeout = self.inter_token_timeout if self.inter_token_timeout > 0 else None
+        loop = asyncio.get_running_loop()
+        try:
+            # One timeout re-armed per read (no task per token); it is
+            # disarmed while the consumer handles a chunk
+            try:
+                async with asyncio.timeout(None) as deadline:
+                    while True:
+                        if timeout is not None:
+                            deadline.reschedule(loop.time() + timeout)
+                        try:
+                            chunk = await stream.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        deadline.reschedule(None)
+                        yield chunk
+            except TimeoutError as e:
+                raise LLMTimeoutError(f"No token within {self.inter_token_timeout}s") from e
+        finally:
+            await stream.aclose()
+
+
+# Circuit breakers by provider key (per process)
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(limit_key: str) -> CircuitBreaker:
+    """Get the circuit breaker of a provider key"""
+    breaker = _breakers.get(limit_key)
+    if breaker is None:
+        breaker = _breakers[limit_key] = CircuitBreaker(limit_key)
+    return breaker
@@ -0,0 +1,184 @@
+"""
+Content-addressed cache of LLM responses.
+
+Deterministic calls (low temperature, task classes such as summaries and
+report sections) are cached in Redis under a hash of the provider key,
+model, prompt and parameters, so regenerating a report over an unchanged
+transcript does not call the provider again. Identical calls in flight are
+collapsed: within a worker they await the same task, across workers a
+short Redis lock lets one worker compute while the others wait for its
+result.
+
+Entries expire after LLM_RESPONSE_CACHE_TTL, and the oldest entries are
+evicted once more than LLM_RESPONSE_CACHE_MAX_ENTRIES are stored.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+from app.services.llm_messages import ChatPrompt, Prompt
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """Redis response cache with single-flight and hit/miss counters"""
+
+    KEY_PREFIX = "llm_cache"
+
+    # Store an entry, index it by time (dropping expired index entries) and
+    # evict the oldest entries beyond max
+    _STORE_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', tonumber(ARGV[3]) - tonumber(ARGV[2]))
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if excess > 0 then
+    local evicted = redis.call('ZPOPMIN', KEYS[2], excess)
+    for i = 1, #evicted, 2 do
+        redis.call('DEL', evicted[i])
+    end
+    redis.call('HINCRBY', KEYS[3], 'evictions', excess)
+end
+return excess
+"""
+
+    def __init__(self, redis: aioredis.Redis, ttl: int = None, max_entries: int = None):
+        """
+        Initialize response cache
+
+        Args:
+            redis: Redis client (decode_responses=True)
+            ttl: Seconds an entry is kept
+            max_entries: Entries kept before the oldest are evicted
+        """
+        self.redis = redis
+        self.ttl = ttl or settings.LLM_RESPONSE_CACHE_TTL
+        self.max_entries = max_entries or settings.LLM_RESPONSE_CACHE_MAX_ENTRIES
+        self.lock_ttl = settings.LLM_HTTP_TIMEOUT
+        self._store_script = redis.register_script(self._STORE_SCRIPT)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.KEY_PREFIX}:index"
+
+    @property
+    def _stats_key(self) -> str:
+        return f"{self.KEY_PREFIX}:stats"
+
+    def make_key(self, provider_key: str, model: str, prompt: Prompt, params: Dict[str, Any]) -> str:
+        """Cache key of a call"""
+        if isinstance(prompt, ChatPrompt):
+            prompt_part = [prompt.system_text, prompt.user_text]
+        else:
+            prompt_part = prompt
+        material = json.dumps(
+            [provider_key, model, prompt_part, params],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str
+        )
+        return f"{self.KEY_PREFIX}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+    async def _count(self, field: str):
+        try:
+            await self.redis.hincrby(self._stats_key, field, 1)
+        except Exception:
+            pass
+
+    async def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self.redis.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Return the cached response for key, or compute, store and return it
+
+        Hits and calls that joined an in-flight request come back with
+        "cached": True and no token usage (nothing is metered for them).
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            await self._count("shared")
+            return {**await asyncio.shield(task), "tokens": 0, "usage": None, "cached": True}
+
+        task = asyncio.ensure_future(self._lookup_or_compute(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return dict(await asyncio.shield(task))
+
+    async def _lookup_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        lock_key = f"{key}:lock"
+        locked = False
+        try:
+            cached = await self._load(key)
+            if cached is not None:
+                await self._count("hits")
+                return {**cached, "tokens": 0, "usage": None, "cached": True}
+
+            # Another worker may be computing the same call; wait for its result
+            locked = await self.redis.set(lock_key, "1", nx=True, px=int(self.lock_ttl * 1000))
+            deadline = time.monotonic() + self.lock_ttl
+            while not locked and time.monotonic() < deadline:
+                await asyncio.sleep(0.2)
+                cached = await self._load(key)
+                if cached is not None:
+                    await self._count("shared")
+                    return {**cached, "tokens": 0, "usage": None, "cached": True}
+                locked = await self.redis.set(lock_key, "1", nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.warning(f"LLM response cache unavailable: {e}")
+            return await compute()
+
+        await self._count("misses")
+        try:
+            result = await compute()
+            try:
+                await self._store_script(
+                    keys=[key, self._index_key, self._stats_key],
+                    args=[json.dumps(result, ensure_ascii=False), self.ttl, time.time(), self.max_entries]
+                )
+            except Exception as e:
+                logger.warning(f"Failed to store LLM response in cache: {e}")
+            return result
+        finally:
+            if locked:
+                try:
+                    await self.redis.delete(lock_key)
+                except Exception:
+                    pass
+
+    async def stats(self) -> Dict[str, int]:
+        """Hit, miss, shared (single-flight) and eviction counters across workers"""
+        counters = await self.redis.hgetall(self._stats_key)
+        stats = {field: int(counters.get(field, 0)) for field in ("hits", "misses", "shared", "evictions")}
+        stats["entries"] = await self.redis.zcard(self._index_key)
+        return stats
+
+
+# Global singleton instance
+_response_cache: Optional[LLMResponseCache] = None
+
+
+async def get_llm_response_cache() -> LLMResponseCache:
+    """Get the process-wide LLM response cache"""
+    global _response_cache
+    if _response_cache is None:
+        from app.core.redis import get_redis
+        _response_cache = LLMResponseCache(await get_redis())
+    return _response_cache
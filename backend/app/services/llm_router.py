@@ -0,0 +1,132 @@
+"""
+Latency-aware choice between a user's LLM providers.
+
+The router keeps an exponentially weighted moving average of time to first
+token and of the error rate per provider key (shared by all orchestrators of
+the process). Requests routed with the "auto" provider try the registered
+providers fastest first and fail over to the next one on error. A sticky key
+(e.g. one participant of a discussion) keeps using the provider that served
+it last unless that provider becomes much slower than the best one.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.llm_resilience import get_circuit_breaker
+
+
+class ProviderStats:
+    """Live latency and error statistics of one provider key"""
+
+    __slots__ = ("ttft", "error_rate", "samples")
+
+    def __init__(self):
+        self.ttft: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+
+class LLMRouter:
+    """Ranks providers by observed latency and errors"""
+
+    def __init__(
+        self,
+        alpha: float = None,
+        error_penalty: float = None,
+        sticky_ttl: float = None,
+        switch_ratio: float = None
+    ):
+        """
+        Initialize router (defaults from settings)
+
+        Args:
+            alpha: EWMA weight of the newest sample
+            error_penalty: Latency multiplier (and seconds added) per unit of error rate
+            sticky_ttl: Seconds a sticky key remembers its provider
+            switch_ratio: How much slower than the best a sticky provider may be before switching
+        """
+        self.alpha = alpha or settings.LLM_ROUTER_EWMA_ALPHA
+        self.error_penalty = settings.LLM_ROUTER_ERROR_PENALTY if error_penalty is None else error_penalty
+        self.sticky_ttl = sticky_ttl or settings.LLM_ROUTER_STICKY_TTL
+        self.switch_ratio = switch_ratio or settings.LLM_ROUTER_SWITCH_RATIO
+        self._stats: Dict[str, ProviderStats] = {}
+        # sticky key -> (provider key, expiry)
+        self._sticky: Dict[str, Tuple[str, float]] = {}
+
+    def _get_stats(self, key: str) -> ProviderStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ProviderStats()
+        return stats
+
+    def record_success(self, key: str, ttft: Optional[float] = None):
+        """Record a successful call (ttft: seconds to the first token, for streams)"""
+        stats = self._get_stats(key)
+        stats.samples += 1
+        stats.error_rate *= 1 - self.alpha
+        if ttft is not None:
+            stats.ttft = ttft if stats.ttft is None else stats.ttft + self.alpha * (ttft - stats.ttft)
+
+    def record_failure(self, key: str):
+        """Record a failed call"""
+        stats = self._get_stats(key)
+        stats.samples += 1
+        stats.error_rate += self.alpha * (1 - stats.error_rate)
+
+    def score(self, key: str) -> float:
+        """Expected cost of sending a request to a provider key (lower is better)"""
+        if get_circuit_breaker(key).state == "open":
+            return float("inf")
+        stats = self._stats.get(key)
+        if stats is None:
+            # Unmeasured providers go first so they get measured
+            return 0.0
+        penalty = self.error_penalty * stats.error_rate
+        return (stats.ttft or 0.0) * (1 + penalty) + penalty
+
+    def rank(self, providers: Dict[str, str], sticky_key: Optional[str] = None) -> List[str]:
+        """
+        Order providers for a request
+
+        Args:
+            providers: Provider name -> provider key
+            sticky_key: Keeps requests with the same key on the same provider
+
+        Returns:
+            Provider names, preferred first
+        """
+        scores = {name: self.score(key) for name, key in providers.items()}
+        ranked = sorted(providers, key=scores.__getitem__)
+        if not sticky_key or len(ranked) < 2:
+            return ranked
+
+        pinned = self._sticky.get(sticky_key)
+        if pinned is None or pinned[1] < time.monotonic():
+            return ranked
+        for name in ranked:
+            if providers[name] == pinned[0]:
+                best = scores[ranked[0]]
+                if scores[name] != float("inf") and scores[name] <= best * self.switch_ratio + 1e-9:
+                    ranked.remove(name)
+                    ranked.insert(0, name)
+                break
+        return ranked
+
+    def pin(self, sticky_key: str, key: str):
+        """Remember the provider key that served a sticky key"""
+        now = time.monotonic()
+        if len(self._sticky) > 10000:
+            self._sticky = {k: v for k, v in self._sticky.items() if v[1] >= now}
+        self._sticky[sticky_key] = (key, now + self.sticky_ttl)
+
+
+# Global singleton instance
+_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    """Get the process-wide LLM router"""
+    global _router
+    if _router is None:
+        _router = LLMRouter()
+    return _router
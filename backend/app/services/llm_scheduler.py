@@ -0,0 +1,217 @@
+"""
+Priority scheduling of LLM calls per provider key.
+
+Each provider key gets a fixed number of concurrent call slots in this
+worker. When they are all taken, calls wait in a priority queue:
+
+    turn > injected-question reply > round summary > report
+
+so a background report cannot hold back the turn a user is watching.
+Waiting calls age: a call is ordered by its enqueue time plus
+LLM_SCHEDULER_AGING_SECONDS per priority level, so a lower class gains a
+level for every aging interval it waits and is never starved.
+
+Queue depth and wait times per priority class are exported through
+snapshot() (GET /health/llm).
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.llm_tasks import LLMTaskClass
+
+
+class LLMPriority:
+    """Priority classes of LLM calls (lower is served first)"""
+
+    TURN = 0
+    INJECTED_REPLY = 1
+    SUMMARY = 2
+    REPORT = 3
+
+    NAMES = {TURN: "turn", INJECTED_REPLY: "injected_reply", SUMMARY: "summary", REPORT: "report"}
+
+    # Default priority of each task class
+    _BY_TASK_CLASS = {
+        LLMTaskClass.TURN: TURN,
+        LLMTaskClass.ROUND_SUMMARY: SUMMARY,
+        LLMTaskClass.REPORT_SECTION: REPORT,
+        LLMTaskClass.EXTRACTION: REPORT,
+    }
+
+    @classmethod
+    def for_task(cls, task_class: Optional[str]) -> int:
+        """Priority of a call of task_class (unclassified calls rank with turns)"""
+        return cls._BY_TASK_CLASS.get(task_class, cls.TURN)
+
+
+class PriorityMetrics:
+    """Wait statistics of one priority class"""
+
+    __slots__ = ("waiting", "granted", "queued", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.waiting = 0  # Calls queued now
+        self.granted = 0  # Slots granted
+        self.queued = 0  # Grants that had to wait
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class _ProviderSlots:
+    """Slots and wait queue of one provider key"""
+
+    __slots__ = ("limit", "active", "waiters")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        # Heap of [order, seq, future, priority, enqueued_at]
+        self.waiters: List[list] = []
+
+
+class LLMScheduler:
+    """Per-provider-key concurrency slots handed out by priority with aging"""
+
+    def __init__(self, slots_per_key: int = None, aging_seconds: float = None):
+        """
+        Initialize scheduler
+
+        Args:
+            slots_per_key: Concurrent calls per provider key (0 = unlimited)
+            aging_seconds: Wait that raises a queued call by one priority level
+        """
+        self.slots_per_key = settings.LLM_SCHEDULER_SLOTS_PER_KEY if slots_per_key is None else slots_per_key
+        self.aging_seconds = settings.LLM_SCHEDULER_AGING_SECONDS if aging_seconds is None else aging_seconds
+        self._providers: Dict[str, _ProviderSlots] = {}
+        self._metrics: Dict[int, PriorityMetrics] = {}
+        self._seq = itertools.count()
+
+    def _slots(self, limit_key: str) -> _ProviderSlots:
+        slots = self._providers.get(limit_key)
+        if slots is None:
+            slots = self._providers[limit_key] = _ProviderSlots(self.slots_per_key)
+        return slots
+
+    def _priority_metrics(self, priority: int) -> PriorityMetrics:
+        metrics = self._metrics.get(priority)
+        if metrics is None:
+            metrics = self._metrics[priority] = PriorityMetrics()
+        return metrics
+
+    def _record_grant(self, priority: int, waited: Optional[float]):
+        metrics = self._priority_metrics(priority)
+        metrics.granted += 1
+        if waited is not None:
+            metrics.waiting -= 1
+            metrics.queued += 1
+            metrics.wait_total += waited
+            metrics.wait_max = max(metrics.wait_max, waited)
+
+    async def acquire(self, limit_key: str, priority: int = LLMPriority.TURN):
+        """Wait for a slot of a provider key (release() it when the call is done)"""
+        slots = self._slots(limit_key)
+        if slots.limit <= 0 or (slots.active < slots.limit and not slots.waiters):
+            slots.active += 1
+            self._record_grant(priority, None)
+            return
+
+        # Aging: ordering by enqueue time plus a fixed delay per level is the
+        # same as lowering the priority by one level per aging interval waited
+        enqueued_at = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            slots.waiters,
+            [enqueued_at + priority * self.aging_seconds, next(self._seq), future, priority, enqueued_at]
+        )
+        self._priority_metrics(priority).waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted as we were cancelled; pass it on
+                self.release(limit_key)
+            else:
+                future.cancel()
+                self._priority_metrics(priority).waiting -= 1
+            raise
+
+    def try_acquire(self, limit_key: str, priority: int = LLMPriority.TURN) -> bool:
+        """Take a free slot without waiting; False if none is free or calls are queued"""
+        slots = self._slots(limit_key)
+        if slots.limit > 0 and (slots.active >= slots.limit or slots.waiters):
+            return False
+        slots.active += 1
+        self._record_grant(priority, None)
+        return True
+
+    def release(self, limit_key: str):
+        """Return a slot, handing it to the most urgent waiter"""
+        slots = self._slots(limit_key)
+        slots.active -= 1
+        while slots.waiters and slots.active < slots.limit:
+            _, _, future, priority, enqueued_at = heapq.heappop(slots.waiters)
+            if future.done():
+                continue  # Cancelled while waiting
+            slots.active += 1
+            self._record_grant(priority, time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    def slot(self, limit_key: str, priority: int = LLMPriority.TURN) -> "_Slot":
+        """async with scheduler.slot(key, priority): ... holds a slot for the block"""
+        return _Slot(self, limit_key, priority)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue depth per provider key and wait statistics per priority class"""
+        classes = {}
+        for priority, metrics in sorted(self._metrics.items()):
+            classes[LLMPriority.NAMES.get(priority, str(priority))] = {
+                "waiting": metrics.waiting,
+                "granted": metrics.granted,
+                "queued": metrics.queued,
+                "avg_wait_ms": round(metrics.wait_total * 1000 / metrics.queued, 1) if metrics.queued else 0.0,
+                "max_wait_ms": round(metrics.wait_max * 1000, 1),
+            }
+        providers = {
+            limit_key: {
+                "active": slots.active,
+                "limit": slots.limit,
+                "queued": sum(1 for waiter in slots.waiters if not waiter[2].done()),
+            }
+            for limit_key, slots in self._providers.items()
+            if slots.active or slots.waiters
+        }
+        return {"priorities": classes, "providers": providers}
+
+
+class _Slot:
+    """Async context manager around acquire/release"""
+
+    __slots__ = ("scheduler", "limit_key", "priority")
+
+    def __init__(self, scheduler: LLMScheduler, limit_key: str, priority: int):
+        self.scheduler = scheduler
+        self.limit_key = limit_key
+        self.priority = priority
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.limit_key, self.priority)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.scheduler.release(self.limit_key)
+
+
+# Global singleton instance
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Get the process-wide LLM call scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler()
+    return _scheduler
@@ -0,0 +1,242 @@
+"""
+Incremental decoding of LLM provider event streams.
+
+Providers stream Server-Sent Events. SSEDecoder works on raw bytes as they
+arrive: lines are split in one reusable buffer, multi-line data fields are
+joined, and event, id and retry fields are handled per the SSE spec. The
+decoder is pull-based (aiter_sse reads the next network chunk only when
+the consumer asks for more), so a slow consumer applies backpressure to the
+HTTP stream instead of events piling up in memory.
+
+Event payloads are parsed with orjson when it is installed, falling back to
+the standard library.
+"""
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+try:
+    import orjson
+
+    def json_loads(data: bytes) -> Any:
+        """Parse JSON bytes (orjson backend)"""
+        return orjson.loads(data)
+except ImportError:  # pragma: no cover - depends on the environment
+    def json_loads(data: bytes) -> Any:
+        """Parse JSON bytes (standard library backend)"""
+        return json.loads(data)
+
+
+class LLMStreamError(Exception):
+    """The provider reported an error inside the event stream"""
+
+
+class LLMUsage:
+    """Token usage of one provider call (input_tokens excludes cached input)"""
+
+    __slots__ = (
+        "input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens",
+        "model", "key_id", "estimated"
+    )
+
+    def __init__(
+        self,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        model: str = "",
+        key_id: Optional[str] = None,
+        estimated: bool = False
+    ):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cache_read_tokens = cache_read_tokens
+        self.cache_write_tokens = cache_write_tokens
+        self.model = model
+        self.key_id = key_id  # UserAPIKey id, when the provider was registered from one
+        self.estimated = estimated  # Counted locally because the provider reported nothing
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens + self.cache_read_tokens + self.cache_write_tokens
+
+    @classmethod
+    def from_openai(cls, usage: Dict[str, Any], model: str = "") -> "LLMUsage":
+        """From a Chat Completions usage object (prompt_tokens includes cached tokens)"""
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        return cls(
+            input_tokens=(usage.get("prompt_tokens") or 0) - cached,
+            output_tokens=usage.get("completion_tokens") or 0,
+            cache_read_tokens=cached,
+            model=model
+        )
+
+    def update_anthropic(self, usage: Dict[str, Any]):
+        """Merge a Messages API usage object (message_start and message_delta carry parts of it)"""
+        if "input_tokens" in usage:
+            self.input_tokens = usage["input_tokens"] or 0
+        if "cache_read_input_tokens" in usage:
+            self.cache_read_tokens = usage["cache_read_input_tokens"] or 0
+        if "cache_creation_input_tokens" in usage:
+            self.cache_write_tokens = usage["cache_creation_input_tokens"] or 0
+        if "output_tokens" in usage:
+            self.output_tokens = usage["output_tokens"] or 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LLMUsage":
+        return cls(**{field: data[field] for field in cls.__slots__ if field in data})
+
+    def __repr__(self) -> str:
+        return (
+            f"LLMUsage(input={self.input_tokens}, output={self.output_tokens}, "
+            f"cache_read={self.cache_read_tokens}, cache_write={self.cache_write_tokens}, model={self.model!r})"
+        )
+
+
+class StreamChunk:
+    """A piece of streamed output (the completion chunk carries the call's usage)"""
+
+    __slots__ = ("content", "is_complete", "finish_reason", "usage")
+
+    def __init__(
+        self,
+        content: str = "",
+        is_complete: bool = False,
+        finish_reason: Optional[str] = None,
+        usage: Optional[LLMUsage] = None
+    ):
+        self.content = content
+        self.is_complete = is_complete
+        self.finish_reason = finish_reason
+        self.usage = usage
+
+    def __repr__(self) -> str:
+        return f"StreamChunk(content={self.content!r}, is_complete={self.is_complete}, finish_reason={self.finish_reason!r})"
+
+
+class SSEEvent:
+    """A dispatched Server-Sent Event (data kept as raw bytes until needed)"""
+
+    __slots__ = ("event", "raw", "id", "retry")
+
+    def __init__(self, event: str, raw: bytes, id: str = "", retry: Optional[int] = None):
+        self.event = event
+        self.raw = raw
+        self.id = id
+        self.retry = retry
+
+    @property
+    def data(self) -> str:
+        return self.raw.decode("utf-8")
+
+    def json(self) -> Any:
+        """Parse the data as JSON (raises ValueError if it is not)"""
+        return json_loads(self.raw)
+
+
+class SSEDecoder:
+    """Byte-oriented incremental SSE parser"""
+
+    __slots__ = ("_buffer", "_data", "_event", "_retry", "_pending_cr", "last_event_id")
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._data: List[bytes] = []
+        self._event: Optional[str] = None
+        self._retry: Optional[int] = None
+        self._pending_cr = False
+        self.last_event_id = ""
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """Add received bytes; returns the events completed by them"""
+        buffer = self._buffer
+        if self._pending_cr or b"\r" in chunk:
+            # Rare CR / CRLF line endings: normalize to LF, keeping a trailing
+            # CR back in case its LF arrives with the next chunk
+            buffer += chunk
+            self._pending_cr = buffer.endswith(b"\r")
+            end = len(buffer) - 1 if self._pending_cr else len(buffer)
+            buffer[:end] = buffer[:end].replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        else:
+            buffer += chunk
+
+        events = []
+        start = 0
+        find = buffer.find
+        while True:
+            newline = find(b"\n", start)
+            if newline < 0:
+                break
+            event = self._process_line(bytes(buffer[start:newline]))
+            start = newline + 1
+            if event is not None:
+                events.append(event)
+        if start:
+            # Compact in place so the buffer's storage is reused
+            del buffer[:start]
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        """Process whatever is left when the stream ends"""
+        events = []
+        if self._buffer:
+            line = bytes(self._buffer.rstrip(b"\r"))
+            self._buffer.clear()
+            self._pending_cr = False
+            event = self._process_line(line)
+            if event is not None:
+                events.append(event)
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _process_line(self, line: bytes) -> Optional[SSEEvent]:
+        if not line:
+            return self._dispatch()
+        if line[0] == 58:  # ":" comment / keep-alive
+            return None
+
+        colon = line.find(b":")
+        if colon < 0:
+            field, value = line, b""
+        else:
+            field, value = line[:colon], line[colon + 1:]
+            if value[:1] == b" ":
+                value = value[1:]
+
+        if field == b"data":
+            self._data.append(value)
+        elif field == b"event":
+            self._event = value.decode("utf-8")
+        elif field == b"id":
+            if b"\0" not in value:
+                self.last_event_id = value.decode("utf-8")
+        elif field == b"retry":
+            if value.isdigit():
+                self._retry = int(value)
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        data = self._data
+        if not data:
+            self._event = None
+            return None
+        raw = data[0] if len(data) == 1 else b"\n".join(data)
+        event = SSEEvent(self._event or "message", raw, self.last_event_id, self._retry)
+        data.clear()
+        self._event = None
+        return event
+
+
+async def aiter_sse(byte_stream: AsyncIterator[bytes]) -> AsyncIterator[SSEEvent]:
+    """Decode an async byte stream (e.g. httpx Response.aiter_bytes()) into events"""
+    decoder = SSEDecoder()
+    async for chunk in byte_stream:
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.flush():
+        yield event
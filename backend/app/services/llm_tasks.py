@@ -0,0 +1,107 @@
+"""
+Task classes of LLM calls.
+
+Character turns need the main model, but round summaries, report sections
+and JSON extraction are fine on smaller, faster models. Each call names its
+task class, which selects the provider and model:
+
+1. A user key whose task_models maps the class serves it with that model.
+2. Otherwise the requested provider serves it, with the model configured
+   for the class and provider type in LLM_TASK_MODELS (if any).
+
+Latency and token metrics are recorded per class.
+"""
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class LLMTaskClass:
+    """Kinds of LLM calls made by the application"""
+
+    TURN = "turn"
+    ROUND_SUMMARY = "round_summary"
+    REPORT_SECTION = "report_section"
+    EXTRACTION = "extraction"
+
+    ALL = (TURN, ROUND_SUMMARY, REPORT_SECTION, EXTRACTION)
+
+
+def global_task_model(task_class: Optional[str], provider_type: str) -> Optional[str]:
+    """Model configured in LLM_TASK_MODELS for a task class and provider type"""
+    if not task_class:
+        return None
+    return settings.LLM_TASK_MODELS.get(task_class, {}).get(provider_type)
+
+
+class TaskMetrics:
+    """Counters of one task class"""
+
+    __slots__ = ("calls", "errors", "latency_total", "ttft_total", "ttft_count", "tokens")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.ttft_total = 0.0
+        self.ttft_count = 0
+        self.tokens = 0
+
+
+class LLMTaskMetrics:
+    """Per-task-class latency and token usage of this process"""
+
+    def __init__(self):
+        self._metrics: Dict[str, TaskMetrics] = {}
+        self.started_at = time.time()
+
+    def record(
+        self,
+        task_class: Optional[str],
+        latency: float,
+        tokens: int = 0,
+        ttft: Optional[float] = None,
+        ok: bool = True
+    ):
+        """Record one call (latency and ttft in seconds)"""
+        key = task_class or "unclassified"
+        metrics = self._metrics.get(key)
+        if metrics is None:
+            metrics = self._metrics[key] = TaskMetrics()
+        metrics.calls += 1
+        metrics.latency_total += latency
+        metrics.tokens += tokens
+        if ttft is not None:
+            metrics.ttft_total += ttft
+            metrics.ttft_count += 1
+        if not ok:
+            metrics.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Totals and averages per task class"""
+        classes = {}
+        for key, metrics in self._metrics.items():
+            classes[key] = {
+                "calls": metrics.calls,
+                "errors": metrics.errors,
+                "tokens": metrics.tokens,
+                "avg_latency_ms": round(metrics.latency_total * 1000 / metrics.calls, 1),
+                "avg_ttft_ms": (
+                    round(metrics.ttft_total * 1000 / metrics.ttft_count, 1) if metrics.ttft_count else None
+                ),
+                "avg_tokens": round(metrics.tokens / metrics.calls, 1),
+            }
+        return {"since": self.started_at, "task_classes": classes}
+
+
+# Global singleton instance
+_task_metrics: Optional[LLMTaskMetrics] = None
+
+
+def get_llm_task_metrics() -> LLMTaskMetrics:
+    """Get the process-wide task class metrics"""
+    global _task_metrics
+    if _task_metrics is None:
+        _task_metrics = LLMTaskMetrics()
+    return _task_metrics
@@ -0,0 +1,275 @@
+"""
+Write-behind buffer for messages that are still being streamed.
+
+Partial content is appended to Redis on a fixed interval instead of being
+written to Postgres; the finished message is persisted with a single INSERT.
+Drafts left behind by a crashed worker are recovered as partial messages.
+
+A store opened with a discussion lease writes drafts only while the lease is
+held (checked atomically in Redis), so a loop that lost its discussion to
+another worker cannot keep writing drafts the new owner has recovered.
+"""
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from redis import asyncio as aioredis
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.message import DiscussionMessage
+from app.services.discussion_scheduler import DiscussionLease, LeaseLostError
+
+logger = logging.getLogger(__name__)
+
+
+class MessageDraft:
+    """Content of one in-flight message, flushed to Redis periodically"""
+
+    def __init__(self, store: "MessageDraftStore", discussion_id: UUID, message_id: UUID, meta: Dict[str, Any]):
+        self.store = store
+        self.discussion_id = discussion_id
+        self.message_id = message_id
+        self.meta = meta
+        self.parts: List[str] = []
+        self.flush_count = 0
+        self._flushed_parts = 0
+        self._last_flush = time.monotonic()
+
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
+
+    async def append(self, delta: str):
+        """Add streamed content; flushes to Redis once the interval has elapsed"""
+        self.parts.append(delta)
+        if time.monotonic() - self._last_flush >= self.store.flush_interval:
+            await self.flush()
+
+    async def flush(self):
+        """Append unflushed content to the Redis draft"""
+        self._last_flush = time.monotonic()
+        if self._flushed_parts == len(self.parts):
+            return
+        flushed = len(self.parts)
+        pending = "".join(self.parts[self._flushed_parts:flushed])
+        try:
+            await self.store.append(self.message_id, pending)
+            # Only now: content of a failed append is retried by the next flush
+            self._flushed_parts = flushed
+            self.flush_count += 1
+        except LeaseLostError:
+            raise
+        except Exception as e:
+            # Drafts only matter for crash recovery; keep streaming
+            logger.warning(f"Failed to flush draft for message {self.message_id}: {e}")
+
+    def build_message(self, content: Optional[str] = None, **fields) -> DiscussionMessage:
+        """Build the final message row from the draft metadata"""
+        fields.setdefault("created_at", datetime.fromisoformat(self.meta["started_at"]))
+        return DiscussionMessage(
+            id=self.message_id,
+            discussion_id=self.discussion_id,
+            participant_id=UUID(self.meta["participant_id"]),
+            round=self.meta["round"],
+            phase=self.meta["phase"],
+            content=self.content if content is None else content,
+            is_injected_question=False,
+            **fields
+        )
+
+    async def discard(self):
+        """Drop the Redis draft once the message has been persisted"""
+        try:
+            await self.store.discard(self.discussion_id, self.message_id)
+        except Exception as e:
+            logger.warning(f"Failed to discard draft for message {self.message_id}: {e}")
+
+
+class MessageDraftStore:
+    """Redis-backed storage for in-flight message drafts"""
+
+    # Register a draft only while KEYS[1] (the lease) holds ARGV[1] (its owner)
+    _FENCED_OPEN_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+    # Append draft content only while the lease is held
+    _FENCED_APPEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('APPEND', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        flush_interval: float = None,
+        ttl: int = None,
+        lease: Optional[DiscussionLease] = None
+    ):
+        """
+        Initialize draft store
+
+        Args:
+            redis: Redis client
+            flush_interval: Seconds between draft flushes (default from settings)
+            ttl: Seconds an unfinished draft is kept (default from settings)
+            lease: Discussion lease that must be held for draft writes (None = unfenced)
+        """
+        self.redis = redis
+        self.flush_interval = flush_interval if flush_interval is not None else settings.MESSAGE_DRAFT_FLUSH_INTERVAL
+        self.ttl = ttl or settings.MESSAGE_DRAFT_TTL
+        self.lease = lease
+        if lease is not None:
+            self._fenced_open = redis.register_script(self._FENCED_OPEN_SCRIPT)
+            self._fenced_append = redis.register_script(self._FENCED_APPEND_SCRIPT)
+
+    def _fenced(self, written) -> None:
+        if not written:
+            self.lease.mark_lost()
+            raise LeaseLostError(f"Lease {self.lease.key} is no longer held by {self.lease.owner}")
+
+    def _index_key(self, discussion_id: UUID) -> str:
+        return f"message_drafts:{discussion_id}"
+
+    def _content_key(self, message_id: UUID) -> str:
+        return f"message_draft:{message_id}"
+
+    async def open(
+        self,
+        discussion_id: UUID,
+        message_id: UUID,
+        participant_id: UUID,
+        round: int,
+        phase: str,
+        **extra
+    ) -> MessageDraft:
+        """Register a new draft for a message that is about to be streamed"""
+        meta = {
+            "participant_id": str(participant_id),
+            "round": round,
+            "phase": phase,
+            "started_at": datetime.utcnow().isoformat(),
+            **extra
+        }
+        draft = MessageDraft(self, discussion_id, message_id, meta)
+        try:
+            index_key = self._index_key(discussion_id)
+            if self.lease is not None:
+                self._fenced(await self._fenced_open(
+                    keys=[self.lease.key, index_key],
+                    args=[self.lease.owner, str(message_id), json.dumps(meta), self.ttl]
+                ))
+            else:
+                pipe = self.redis.pipeline()
+                pipe.hset(index_key, str(message_id), json.dumps(meta))
+                pipe.expire(index_key, self.ttl)
+                await pipe.execute()
+        except LeaseLostError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to open draft for message {message_id}: {e}")
+        return draft
+
+    async def append(self, message_id: UUID, content: str):
+        content_key = self._content_key(message_id)
+        if self.lease is not None:
+            self._fenced(await self._fenced_append(
+                keys=[self.lease.key, content_key], args=[self.lease.owner, content, self.ttl]
+            ))
+            return
+        pipe = self.redis.pipeline()
+        pipe.append(content_key, content)
+        pipe.expire(content_key, self.ttl)
+        await pipe.execute()
+
+    async def discard(self, discussion_id: UUID, message_id: UUID):
+        pipe = self.redis.pipeline()
+        pipe.hdel(self._index_key(discussion_id), str(message_id))
+        pipe.delete(self._content_key(message_id))
+        await pipe.execute()
+
+    async def get_drafts(self, discussion_id: UUID) -> List[Dict[str, Any]]:
+        """Get in-flight drafts of a discussion (metadata plus flushed content)"""
+        index = await self.redis.hgetall(self._index_key(discussion_id))
+        if not index:
+            return []
+
+        message_ids = list(index.keys())
+        contents = await self.redis.mget([self._content_key(mid) for mid in message_ids])
+
+        drafts = []
+        for message_id, content in zip(message_ids, contents):
+            draft = json.loads(index[message_id])
+            draft["message_id"] = message_id
+            draft["content"] = content or ""
+            drafts.append(draft)
+        drafts.sort(key=lambda d: d["started_at"])
+        return drafts
+
+    async def recover(self, db: AsyncSession, discussion_id: UUID) -> int:
+        """
+        Persist drafts orphaned by a crashed or cancelled loop as partial messages
+
+        A loop cancelled between saving a message and discarding its draft
+        leaves a draft whose message already exists; such drafts are only
+        discarded. The insert also skips ids saved concurrently (e.g. by a
+        loop that has just lost its lease).
+
+        Returns:
+            Number of recovered messages
+        """
+        drafts = await self.get_drafts(discussion_id)
+        if not drafts:
+            return 0
+        if self.lease is not None:
+            await self.lease.check()
+
+        result = await db.execute(
+            select(DiscussionMessage.id).where(
+                DiscussionMessage.id.in_([UUID(draft["message_id"]) for draft in drafts])
+            )
+        )
+        saved = set(result.scalars().all())
+
+        rows = [
+            {
+                "id": UUID(draft["message_id"]),
+                "discussion_id": discussion_id,
+                "participant_id": UUID(draft["participant_id"]),
+                "round": draft["round"],
+                "phase": draft["phase"],
+                "content": draft["content"],
+                "token_count": 0,
+                "is_injected_question": False,
+                "meta_data": {"partial": True},
+                "created_at": datetime.fromisoformat(draft["started_at"]),
+            }
+            for draft in drafts
+            if draft["content"] and UUID(draft["message_id"]) not in saved
+        ]
+        recovered = 0
+        if rows:
+            result = await db.execute(
+                insert(DiscussionMessage).values(rows).on_conflict_do_nothing(index_elements=["id"])
+            )
+            await db.commit()
+            recovered = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(rows)
+            logger.info(f"Recovered {recovered} partial messages for discussion {discussion_id}")
+        for draft in drafts:
+            await self.discard(discussion_id, UUID(draft["message_id"]))
+        return recovered
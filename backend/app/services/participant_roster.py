@@ -0,0 +1,109 @@
+"""
+Cached participant roster of a discussion.
+
+Maps each participant id to the character speaking through it. The roster is
+loaded with one query per discussion, cached in Redis, and invalidated when
+participants or their characters change.
+"""
+import logging
+from typing import Any, Dict, List
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import CacheService
+from app.models.participant import DiscussionParticipant
+from app.models.character import Character
+
+logger = logging.getLogger(__name__)
+
+# Participant id used for questions injected by the user
+INJECTED_QUESTION_PARTICIPANT_ID = UUID("00000000-0000-0000-0000-000000000000")
+
+
+class ParticipantRosterService:
+    """Loads and caches participant -> character info per discussion"""
+
+    KEY_PREFIX = "participant_roster"
+
+    def __init__(self, cache: CacheService, ttl: int = 3600):
+        self.cache = cache
+        self.ttl = ttl
+
+    def _key(self, discussion_id: UUID) -> str:
+        return f"{self.KEY_PREFIX}:{discussion_id}"
+
+    async def get_roster(self, db: AsyncSession, discussion_id: UUID) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the roster of a discussion
+
+        Returns:
+            Dict of participant id (str) -> {"character_id", "character_name",
+            "character_avatar_url", "position", "stance"}
+        """
+        try:
+            roster = await self.cache.get(self._key(discussion_id))
+            if roster is not None:
+                return roster
+        except Exception as e:
+            logger.warning(f"Failed to read participant roster for {discussion_id}: {e}")
+
+        result = await db.execute(
+            select(
+                DiscussionParticipant.id,
+                DiscussionParticipant.position,
+                DiscussionParticipant.stance,
+                Character.id,
+                Character.name,
+                Character.avatar_url
+            )
+            .join(Character, DiscussionParticipant.character_id == Character.id)
+            .where(DiscussionParticipant.discussion_id == discussion_id)
+        )
+        roster = {
+            str(participant_id): {
+                "character_id": str(character_id),
+                "character_name": name,
+                "character_avatar_url": avatar_url,
+                "position": position,
+                "stance": stance
+            }
+            for participant_id, position, stance, character_id, name, avatar_url in result.all()
+        }
+
+        try:
+            await self.cache.set(self._key(discussion_id), roster, ttl=self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to cache participant roster for {discussion_id}: {e}")
+        return roster
+
+    async def invalidate(self, discussion_id: UUID):
+        """Drop the cached roster of a discussion"""
+        try:
+            await self.cache.delete(self._key(discussion_id))
+        except Exception as e:
+            logger.warning(f"Failed to invalidate participant roster for {discussion_id}: {e}")
+
+    async def invalidate_for_character(self, db: AsyncSession, character_id: UUID):
+        """Drop cached rosters of every discussion a character takes part in"""
+        result = await db.execute(
+            select(DiscussionParticipant.discussion_id)
+            .where(DiscussionParticipant.character_id == character_id)
+            .distinct()
+        )
+        discussion_ids: List[UUID] = list(result.scalars().all())
+        if not discussion_ids:
+            return
+        try:
+            await self.cache.redis.delete(*[self._key(d) for d in discussion_ids])
+        except Exception as e:
+            logger.warning(f"Failed to invalidate participant rosters for character {character_id}: {e}")
+
+    @staticmethod
+    def speaker_name(roster: Dict[str, Dict[str, Any]], participant_id: UUID, is_injected_question: bool = False) -> str:
+        """Display name of a message's speaker"""
+        if is_injected_question or participant_id == INJECTED_QUESTION_PARTICIPANT_ID:
+            return "User"
+        entry = roster.get(str(participant_id))
+        return entry["character_name"] if entry else "Unknown"
@@ -11,6 +11,8 @@ from app.models.participant import DiscussionParticipant
 from app.models.character import Character
 from app.models.topic import Topic
 from app.services.llm_orchestrator import LLMOrchestrator
+from app.services.llm_tasks import LLMTaskClass
+from app.services.round_summaries import get_round_summaries
 import json
 
 
@@ -62,12 +64,17 @@ class ReportGeneratorService:
         )
         messages = list(messages_result.scalars().all())
 
+        # Per-round summaries written in the background while the discussion ran
+        round_summaries = await get_round_summaries(self.db, discussion_id)
+
         # Get LLM provider for summarization
         provider_name = discussion.llm_provider or "default"
 
         # Generate report sections with LLM
         overview = await self._generate_overview(discussion, topic, messages)
-        summary = await self._generate_summary_with_llm(discussion, topic, participants_data, messages, provider_name)
+        summary = await self._generate_summary_with_llm(
+            discussion, topic, participants_data, messages, provider_name, round_summaries
+        )
         viewpoints_summary = await self._generate_viewpoints_summary(participants_data, messages)
         consensus = await self._generate_consensus_with_llm(participants_data, messages, topic, provider_name)
         controversies = await self._generate_controversies_with_llm(participants_data, messages, topic, provider_name)
@@ -162,12 +169,19 @@ class ReportGeneratorService:
         topic: Topic,
         participants_data: List[Dict[str, Any]],
         messages: List[DiscussionMessage],
-        provider_name: str
+        provider_name: str,
+        round_summaries: Optional[Dict[int, str]] = None
     ) -> str:
         """Generate comprehensive summary using LLM"""
         if not topic:
             return ""
 
+        # Stored round summaries cover the whole discussion, not just its end
+        round_summary_text = "\n\n".join(
+            f"### 第 {round_num + 1} 轮\n{text}"
+            for round_num, text in sorted((round_summaries or {}).items())
+        ) or "（无）"
+
         # Build participant list
         participant_list = "\n".join([
             f"- {data['character'].name}: {data['character'].config.get('profession', 'N/A')}"
@@ -194,6 +208,9 @@ class ReportGeneratorService:
 - 总消息数: {len(messages)}
 - 讨论时长: {discussion.started_at and discussion.completed_at}
 
+## 各轮摘要
+{round_summary_text}
+
 ## 最近对话片段
 {conversation_snippet}
 
@@ -224,6 +241,7 @@ class ReportGeneratorService:
             response = await self.llm_orchestrator.generate(
                 provider_name,
                 prompt,
+                task_class=LLMTaskClass.REPORT_SECTION,
                 max_tokens=2000,
                 temperature=0.5
             )
@@ -276,6 +294,7 @@ class ReportGeneratorService:
             response = await self.llm_orchestrator.generate(
                 provider_name,
                 prompt,
+                task_class=LLMTaskClass.EXTRACTION,
                 max_tokens=1000,
                 temperature=0.3
             )
@@ -337,6 +356,7 @@ class ReportGeneratorService:
             response = await self.llm_orchestrator.generate(
                 provider_name,
                 prompt,
+                task_class=LLMTaskClass.EXTRACTION,
                 max_tokens=1000,
                 temperature=0.3
             )
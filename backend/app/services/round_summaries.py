@@ -0,0 +1,209 @@
+"""
+Background summarization of completed discussion rounds.
+
+As soon as a round completes, its messages are summarized off the critical
+path and stored in the round_summaries table. Prompt building and report
+generation only read the stored summaries.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import select, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.message import DiscussionMessage
+from app.models.participant import DiscussionParticipant
+from app.models.character import Character
+from app.models.round_summary import RoundSummary
+from app.services.llm_orchestrator import LLMOrchestrator
+from app.services.llm_stream import LLMUsage
+from app.services.llm_tasks import LLMTaskClass
+from app.services.usage_meter import get_usage_meter
+
+logger = logging.getLogger(__name__)
+
+
+PHASE_LABELS = {
+    'opening': 'Opening',
+    'development': 'Development',
+    'debate': 'Debate',
+    'closing': 'Closing'
+}
+
+
+async def get_round_summaries(
+    db: AsyncSession,
+    discussion_id: UUID,
+    before_round: Optional[int] = None
+) -> Dict[int, str]:
+    """Stored summaries of a discussion, by round"""
+    query = select(RoundSummary.round, RoundSummary.content).where(RoundSummary.discussion_id == discussion_id)
+    if before_round is not None:
+        query = query.where(RoundSummary.round < before_round)
+    result = await db.execute(query)
+    return {round_num: content for round_num, content in result.all()}
+
+
+class RoundSummaryService:
+    """Summarizes completed rounds in the background and stores the result"""
+
+    def __init__(self, llm_orchestrator: LLMOrchestrator, session_factory: async_sessionmaker):
+        self.llm_orchestrator = llm_orchestrator
+        self.session_factory = session_factory
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(
+        self,
+        discussion_id: UUID,
+        round_num: int,
+        provider_name: str,
+        on_done: Optional[Callable[[int, str], None]] = None
+    ):
+        """Summarize a round in the background; on_done receives (round, summary)"""
+        task = asyncio.create_task(self._run(discussion_id, round_num, provider_name, on_done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self):
+        """Wait for scheduled summaries (before the LLM clients are closed)"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def _run(
+        self,
+        discussion_id: UUID,
+        round_num: int,
+        provider_name: str,
+        on_done: Optional[Callable[[int, str], None]]
+    ):
+        try:
+            async with self.session_factory() as db:
+                summary = await self.summarize_round(db, discussion_id, round_num, provider_name)
+            if summary is not None and on_done:
+                on_done(round_num, summary)
+        except Exception as e:
+            logger.error(f"Failed to summarize round {round_num} of discussion {discussion_id}: {e}")
+
+    async def summarize_round(
+        self,
+        db: AsyncSession,
+        discussion_id: UUID,
+        round_num: int,
+        provider_name: str
+    ) -> Optional[str]:
+        """
+        Summarize a round and store it (no-op if it is already stored)
+
+        Returns:
+            The summary (an unsaved excerpt if the LLM call failed), or
+            None if the round has no messages
+        """
+        existing = await db.execute(
+            select(RoundSummary.content).where(
+                and_(
+                    RoundSummary.discussion_id == discussion_id,
+                    RoundSummary.round == round_num
+                )
+            )
+        )
+        stored = existing.scalar_one_or_none()
+        if stored is not None:
+            return stored
+
+        result = await db.execute(
+            select(DiscussionMessage.phase, DiscussionMessage.content, DiscussionMessage.is_injected_question, Character.name)
+            .outerjoin(DiscussionParticipant, DiscussionMessage.participant_id == DiscussionParticipant.id)
+            .outerjoin(Character, DiscussionParticipant.character_id == Character.id)
+            .where(
+                and_(
+                    DiscussionMessage.discussion_id == discussion_id,
+                    DiscussionMessage.round == round_num
+                )
+            )
+            .order_by(DiscussionMessage.created_at.asc())
+        )
+        rows = result.all()
+        if not rows:
+            return None
+
+        # Build conversation text for this round
+        round_messages: Dict[str, list] = {}
+        for phase, content, is_injected_question, name in rows:
+            speaker = "User" if is_injected_question else (name or "Unknown")
+            round_messages.setdefault(phase, []).append(f"{speaker}: {content}")
+
+        conversation_parts = []
+        for phase_name in ['opening', 'development', 'debate', 'closing']:
+            if phase_name in round_messages:
+                conversation_parts.append(f"\n[{PHASE_LABELS[phase_name]} Phase]")
+                conversation_parts.extend(round_messages[phase_name])
+        conversation_text = "\n".join(conversation_parts)
+
+        summary = await self._generate_summary(conversation_text, round_num, provider_name, discussion_id)
+        if summary is None:
+            # Don't persist the excerpt; the round is summarized again on resume
+            excerpt = conversation_text[:1000] + "..." if len(conversation_text) > 1000 else conversation_text
+            return f"[Round {round_num + 1} discussion excerpt]\n{excerpt}"
+
+        await db.execute(
+            insert(RoundSummary)
+            .values(discussion_id=discussion_id, round=round_num, content=summary, message_count=len(rows))
+            .on_conflict_do_nothing(index_elements=["discussion_id", "round"])
+        )
+        await db.commit()
+        logger.info(f"Stored summary for round {round_num + 1} of discussion {discussion_id}")
+        return summary
+
+    async def _generate_summary(
+        self,
+        conversation_text: str,
+        round_num: int,
+        provider_name: str,
+        discussion_id: UUID
+    ) -> Optional[str]:
+        """Summarize a round's conversation using LLM (None if the call failed)"""
+        # Build summarization prompt
+        summary_prompt = f"""Please summarize the following discussion round (Round {round_num + 1}) in Chinese.
+Focus on:
+1. Key arguments presented by each participant
+2. Main points of agreement and disagreement
+3. Important conclusions reached
+
+Keep the summary under 500 words. Preserve the names of participants.
+
+Discussion to summarize:
+{conversation_text}
+
+Summary:"""
+
+        try:
+            logger.info(f"Generating summary for round {round_num + 1} using LLM")
+            response = await self.llm_orchestrator.generate(
+                provider_name,
+                summary_prompt,
+                task_class=LLMTaskClass.ROUND_SUMMARY,
+                max_tokens=800,
+                temperature=0.5
+            )
+
+            if isinstance(response, dict):
+                summary = response.get("content", "").strip()
+                if response.get("usage"):
+                    # Summaries count towards the discussion's tokens and cost
+                    meter = await get_usage_meter()
+                    await meter.record(LLMUsage.from_dict(response["usage"]), discussion_id=discussion_id)
+            else:
+                summary = str(response).strip()
+
+            if not summary:
+                # Leave the round unsummarized so a later pass retries it
+                logger.warning(f"Empty summary for round {round_num + 1} of discussion {discussion_id}")
+                return None
+            return summary
+
+        except Exception as e:
+            logger.error(f"Error summarizing round {round_num}: {e}")
+            return None
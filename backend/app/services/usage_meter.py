@@ -0,0 +1,273 @@
+"""
+Batched metering of LLM token usage.
+
+Every completed call records its usage with a single pipelined round trip
+to Redis: pending counters per discussion and participant, plus running
+totals per user and API key. A background loop drains the pending
+counters atomically and applies them to Postgres in one transaction per
+batch (Discussion.total_tokens_used / estimated_cost_usd,
+DiscussionParticipant.total_tokens / message_count), so streaming adds no
+per-chunk or per-message UPDATEs. Drained counters that fail to reach
+Postgres are put back for the next flush.
+
+Costs come from LLM_MODEL_PRICES and are counted in micro-dollars; only
+whole 1/10000 dollars (the column's precision) are flushed, the remainder
+stays pending.
+"""
+import asyncio
+import logging
+from decimal import Decimal
+from typing import Dict, Optional
+from uuid import UUID
+
+from redis import asyncio as aioredis
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.services.llm_stream import LLMUsage
+
+logger = logging.getLogger(__name__)
+
+# Counters kept per scope
+USAGE_FIELDS = (
+    "calls", "messages", "tokens", "input_tokens", "output_tokens",
+    "cache_read_tokens", "cache_write_tokens", "cost_micros"
+)
+
+# Micro-dollars per unit of Discussion.estimated_cost_usd (Numeric(10, 4))
+_COST_UNIT_MICROS = 100
+
+
+def model_prices(model: str) -> Dict[str, float]:
+    """USD per million tokens for a model (longest matching prefix in LLM_MODEL_PRICES)"""
+    best = ""
+    for prefix in settings.LLM_MODEL_PRICES:
+        if model.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    return settings.LLM_MODEL_PRICES.get(best, {})
+
+
+def usage_cost_micros(usage: LLMUsage) -> int:
+    """Cost of a call in micro-dollars (0 for models without a price)"""
+    prices = model_prices(usage.model or "")
+    if not prices:
+        return 0
+    input_price = prices.get("input", 0.0)
+    return round(
+        usage.input_tokens * input_price
+        + usage.output_tokens * prices.get("output", 0.0)
+        + usage.cache_read_tokens * prices.get("cache_read", input_price)
+        + usage.cache_write_tokens * prices.get("cache_write", input_price)
+    )
+
+
+class UsageMeter:
+    """Redis aggregation of token usage with periodic flushes to Postgres"""
+
+    KEY_PREFIX = "llm_usage"
+
+    # Pop a batch of dirty scopes and take their pending counters atomically
+    _DRAIN_SCRIPT = """
+local members = redis.call('SPOP', KEYS[1], ARGV[1])
+local result = {}
+for _, member in ipairs(members) do
+    local key = ARGV[2] .. member
+    result[#result + 1] = member
+    result[#result + 1] = redis.call('HGETALL', key)
+    redis.call('DEL', key)
+end
+return result
+"""
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        session_factory: async_sessionmaker,
+        flush_interval: float = None,
+        batch_size: int = None
+    ):
+        """
+        Initialize usage meter
+
+        Args:
+            redis: Redis client (decode_responses=True)
+            session_factory: Session factory for the flushes
+            flush_interval: Seconds between flushes to Postgres
+            batch_size: Scopes drained per flush batch
+        """
+        self.redis = redis
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval or settings.LLM_USAGE_FLUSH_INTERVAL
+        self.batch_size = batch_size or settings.LLM_USAGE_FLUSH_BATCH
+        self._drain = redis.register_script(self._DRAIN_SCRIPT)
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def _dirty_key(self) -> str:
+        return f"{self.KEY_PREFIX}:dirty"
+
+    @property
+    def _pending_prefix(self) -> str:
+        return f"{self.KEY_PREFIX}:pending:"
+
+    def _total_key(self, scope: str, scope_id) -> str:
+        return f"{self.KEY_PREFIX}:total:{scope}:{scope_id}"
+
+    async def record(
+        self,
+        usage: LLMUsage,
+        discussion_id: Optional[UUID] = None,
+        participant_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+        messages: int = 0
+    ):
+        """Add a call's usage (and the messages it produced) to every scope it belongs to"""
+        counters = {
+            "calls": 1,
+            "messages": messages,
+            "tokens": usage.total_tokens,
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "cache_read_tokens": usage.cache_read_tokens,
+            "cache_write_tokens": usage.cache_write_tokens,
+            "cost_micros": usage_cost_micros(usage),
+        }
+        pipe = self.redis.pipeline(transaction=False)
+        for scope, scope_id in (("discussion", discussion_id), ("participant", participant_id)):
+            if scope_id is not None:
+                member = f"{scope}:{scope_id}"
+                self._increment(pipe, f"{self._pending_prefix}{member}", counters)
+                pipe.sadd(self._dirty_key, member)
+        for scope, scope_id in (("user", user_id), ("key", usage.key_id)):
+            if scope_id is not None:
+                self._increment(pipe, self._total_key(scope, scope_id), counters)
+        try:
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to meter LLM usage: {e}")
+
+    @staticmethod
+    def _increment(pipe, key: str, counters: Dict[str, int]):
+        for field, value in counters.items():
+            if value:
+                pipe.hincrby(key, field, value)
+
+    async def totals(self, scope: str, scope_id) -> Dict[str, int]:
+        """Running totals of a user ("user") or API key ("key")"""
+        values = await self.redis.hgetall(self._total_key(scope, scope_id))
+        return {field: int(values.get(field, 0)) for field in USAGE_FIELDS}
+
+    async def flush(self) -> int:
+        """Apply pending usage to Postgres; returns the number of scopes flushed"""
+        flushed = 0
+        while True:
+            drained = await self._drain(
+                keys=[self._dirty_key], args=[self.batch_size, self._pending_prefix]
+            )
+            if not drained:
+                return flushed
+            batch = {}
+            for member, values in zip(drained[::2], drained[1::2]):
+                counters = {field: int(value) for field, value in zip(values[::2], values[1::2])}
+                if counters:
+                    batch[member] = counters
+            try:
+                await self._apply(batch)
+            except Exception:
+                await self._restore(batch, dirty=True)
+                raise
+            flushed += len(batch)
+            if len(drained) // 2 < self.batch_size:
+                return flushed
+
+    async def _apply(self, batch: Dict[str, Dict[str, int]]):
+        from app.models.discussion import Discussion
+        from app.models.participant import DiscussionParticipant
+
+        remainders = {}
+        async with self.session_factory() as db:
+            for member, counters in batch.items():
+                scope, scope_id = member.split(":", 1)
+                if scope == "discussion":
+                    cost_micros = counters.get("cost_micros", 0)
+                    remainder = cost_micros % _COST_UNIT_MICROS
+                    if remainder:
+                        remainders[member] = {"cost_micros": remainder}
+                    await db.execute(
+                        update(Discussion)
+                        .where(Discussion.id == UUID(scope_id))
+                        .values(
+                            total_tokens_used=Discussion.total_tokens_used + counters.get("tokens", 0),
+                            estimated_cost_usd=Discussion.estimated_cost_usd
+                            + Decimal(cost_micros - remainder) / 1_000_000
+                        )
+                    )
+                elif scope == "participant":
+                    await db.execute(
+                        update(DiscussionParticipant)
+                        .where(DiscussionParticipant.id == UUID(scope_id))
+                        .values(
+                            total_tokens=DiscussionParticipant.total_tokens + counters.get("tokens", 0),
+                            message_count=DiscussionParticipant.message_count + counters.get("messages", 0)
+                        )
+                    )
+            await db.commit()
+        # Sub-unit costs wait for the discussion's next flush
+        await self._restore(remainders, dirty=False)
+
+    async def _restore(self, batch: Dict[str, Dict[str, int]], dirty: bool):
+        """Put drained counters back as pending"""
+        if not batch:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for member, counters in batch.items():
+            self._increment(pipe, f"{self._pending_prefix}{member}", counters)
+            if dirty:
+                pipe.sadd(self._dirty_key, member)
+        try:
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Lost metered LLM usage of {len(batch)} scopes: {e}")
+
+    def start(self):
+        """Start the periodic flush loop"""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush loop after a final flush"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Final LLM usage flush failed: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                flushed = await self.flush()
+                if flushed:
+                    logger.debug(f"Flushed LLM usage of {flushed} discussions/participants")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"LLM usage flush failed: {e}")
+
+
+# Global singleton instance
+_usage_meter: Optional[UsageMeter] = None
+
+
+async def get_usage_meter() -> UsageMeter:
+    """Get the process-wide usage meter"""
+    global _usage_meter
+    if _usage_meter is None:
+        from app.core.database import async_session_factory
+        from app.core.redis import get_redis
+        _usage_meter = UsageMeter(await get_redis(), async_session_factory)
+    return _usage_meter
@@ -0,0 +1,12 @@
+-- Columns added to existing tables
+-- Tables are created by SQLAlchemy (create_all), which never alters an existing
+-- table; init_db() also runs this file after create_all, so every statement
+-- must be idempotent. Run it by hand with psql to upgrade a database offline.
+
+-- discussions: pacing mode of the discussion loop
+ALTER TABLE IF EXISTS discussions ADD COLUMN IF NOT EXISTS pacing VARCHAR(20) NOT NULL DEFAULT 'realtime';
+
+-- user_api_keys: per-key rate limit budgets (NULL = default) and task routing
+ALTER TABLE IF EXISTS user_api_keys ADD COLUMN IF NOT EXISTS rpm_limit INTEGER;
+ALTER TABLE IF EXISTS user_api_keys ADD COLUMN IF NOT EXISTS tpm_limit INTEGER;
+ALTER TABLE IF EXISTS user_api_keys ADD COLUMN IF NOT EXISTS task_models JSONB;
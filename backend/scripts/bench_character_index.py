@@ -0,0 +1,89 @@
+"""
+Recall and latency of the approximate character index.
+
+Builds the exact and the IVF character index over the same vectors and
+reports, for each nprobe, the recall@k of the IVF top k against the exact
+top k (blended recommendation score) and the mean query latency.
+
+Usage (from backend/):
+    python -m scripts.bench_character_index [--size N] [--dim D] [--k K] [--nprobe 4,8,16,32]
+
+Vectors are synthetic: points scattered around --topics random centers,
+which is closer to real character embeddings than uniform noise (uniform
+high-dimensional vectors have no cluster structure and are the worst case
+for IVF). Use --vectors with a .npy file of stored embeddings to measure
+real data.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.character_index import CharacterVectorIndex, IVFCharacterIndex
+
+
+def synthetic_vectors(size: int, dim: int, topics: int, spread: float, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((topics, dim), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = centers[rng.integers(0, topics, size)]
+    vectors += rng.standard_normal((size, dim), dtype=np.float32) * (spread / np.sqrt(dim))
+    return vectors
+
+
+def timed_queries(search, queries: np.ndarray):
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        results.append([character_id for character_id, _, _ in search(query)])
+    return results, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000, help="Characters in the index")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--vectors", help=".npy file of embeddings to index instead of synthetic ones")
+    parser.add_argument("--topics", type=int, default=2000, help="Cluster centers of the synthetic vectors")
+    parser.add_argument("--spread", type=float, default=1.0, help="Noise around each synthetic center")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = square root of size)")
+    parser.add_argument("--nprobe", default="1,4,8,16,32,64", help="Comma-separated lists probed per query")
+    parser.add_argument("--dtype", default="float32", choices=("float32", "float16"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.size, args.dim, args.topics, args.spread, rng)
+    size, dim = vectors.shape
+    ids = list(range(size))
+    features = (rng.integers(0, 300, size), rng.uniform(0, 5, size), rng.integers(0, 30, size))
+    # Queries: perturbed indexed vectors, like a topic close to some characters
+    queries = vectors[rng.integers(0, size, args.queries)]
+    queries = queries + rng.standard_normal(queries.shape, dtype=np.float32) * (args.spread / np.sqrt(dim))
+
+    exact = CharacterVectorIndex(ids, vectors, dtype=args.dtype)
+    exact.set_features(ids, *features)
+    started = time.perf_counter()
+    ivf = IVFCharacterIndex(ids, vectors, dtype=args.dtype, nlist=args.nlist, min_size=0, seed=args.seed)
+    build_seconds = time.perf_counter() - started
+    ivf.set_features(ids, *features)
+    del vectors
+
+    print(
+        f"{size} x {dim} {args.dtype}, {len(ivf.centroids)} lists "
+        f"(trained in {build_seconds:.1f}s), k={args.k}, {args.queries} queries"
+    )
+    truth, exact_ms = timed_queries(lambda q: exact.top_k(q, args.k), queries)
+    print(f"{'exact':<12} {'recall@k':>9} {1.0:>9.3f} {exact_ms:>9.2f} ms/query")
+    for nprobe in (int(n) for n in args.nprobe.split(",")):
+        found, ivf_ms = timed_queries(lambda q: ivf.top_k(q, args.k, nprobe=nprobe), queries)
+        recall = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(truth, found) if a])
+        print(f"{'nprobe=' + str(nprobe):<12} {'recall@k':>9} {recall:>9.3f} {ivf_ms:>9.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Microbenchmark of the LLM stream decoder.
+
+Replays recorded provider streams through the SSE decoder and the provider
+chunk parsing, in network-sized pieces, and reports decoded chunks per
+second and memory traced per chunk. The previous line-based parser
+(aiter_lines + json.loads per line) is measured alongside for comparison.
+
+Usage (from backend/):
+    python -m scripts.bench_llm_stream [--repeat N] [--piece-size BYTES] [recorded.sse ...]
+
+Without files, synthetic OpenAI- and Anthropic-style recordings are used.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app.services.llm_stream import SSEDecoder, StreamChunk, json_loads
+
+
+def record_openai(tokens: int) -> bytes:
+    lines = []
+    for i in range(tokens):
+        data = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "model": "gpt-4",
+            "choices": [{"index": 0, "delta": {"content": f"词{i} "}, "finish_reason": None}],
+        }
+        lines.append(f"data: {json.dumps(data, ensure_ascii=False)}\n\n")
+    lines.append('data: {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}\n\n')
+    lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode("utf-8")
+
+
+def record_anthropic(tokens: int) -> bytes:
+    lines = ['event: message_start\ndata: {"type": "message_start", "message": {"id": "msg_bench"}}\n\n']
+    for i in range(tokens):
+        data = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": f"词{i} "}}
+        lines.append(f"event: content_block_delta\ndata: {json.dumps(data, ensure_ascii=False)}\n\n")
+        if i % 50 == 0:
+            lines.append('event: ping\ndata: {"type": "ping"}\n\n')
+    lines.append('event: message_stop\ndata: {"type": "message_stop"}\n\n')
+    return "".join(lines).encode("utf-8")
+
+
+def split(recording: bytes, piece_size: int) -> List[bytes]:
+    return [recording[i:i + piece_size] for i in range(0, len(recording), piece_size)]
+
+
+def decode_current(pieces: List[bytes]) -> int:
+    """SSEDecoder + StreamChunk, as the providers use them"""
+    decoder = SSEDecoder()
+    chunks = 0
+    for piece in pieces:
+        for event in decoder.feed(piece):
+            if event.raw == b"[DONE]":
+                continue
+            try:
+                data = json_loads(event.raw)
+            except ValueError:
+                continue
+            text = None
+            if "choices" in data:
+                text = (data["choices"][0].get("delta") or {}).get("content")
+            elif data.get("type") == "content_block_delta":
+                text = data["delta"].get("text")
+            if text:
+                StreamChunk(text)
+                chunks += 1
+    return chunks
+
+
+def decode_legacy(pieces: List[bytes]) -> int:
+    """Line-based parsing with a dict per chunk (the previous implementation)"""
+    pending = ""
+    chunks = 0
+    for piece in pieces:
+        pending += piece.decode("utf-8", errors="ignore")
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if not line.startswith("data: "):
+                continue
+            data_str = line[6:]
+            if data_str == "[DONE]":
+                continue
+            try:
+                data = json.loads(data_str)
+            except json.JSONDecodeError:
+                continue
+            text = None
+            if "choices" in data:
+                text = data["choices"][0].get("delta", {}).get("content")
+            elif data.get("type") == "content_block_delta":
+                text = data["delta"]["text"]
+            if text:
+                {"content": text, "is_complete": False}
+                chunks += 1
+    return chunks
+
+
+def measure(decode: Callable[[List[bytes]], int], pieces: List[bytes], repeat: int) -> Dict[str, float]:
+    decode(pieces)  # warm up
+    started = time.perf_counter()
+    chunks = 0
+    for _ in range(repeat):
+        chunks += decode(pieces)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    per_run = decode(pieces)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "chunks_per_sec": chunks / elapsed if elapsed else float("inf"),
+        "peak_bytes_per_chunk": peak / per_run if per_run else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="*", help="Raw SSE bodies captured from providers")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--piece-size", type=int, default=512, help="Bytes per simulated network read")
+    parser.add_argument("--tokens", type=int, default=2000, help="Tokens per synthetic recording")
+    args = parser.parse_args()
+
+    if args.recordings:
+        recordings = {}
+        for path in args.recordings:
+            with open(path, "rb") as f:
+                recordings[path] = f.read()
+    else:
+        recordings = {
+            "openai (synthetic)": record_openai(args.tokens),
+            "anthropic (synthetic)": record_anthropic(args.tokens),
+        }
+
+    print(f"{'recording':<24} {'decoder':<8} {'chunks/s':>12} {'peak B/chunk':>14}")
+    for name, recording in recordings.items():
+        pieces = split(recording, args.piece_size)
+        for label, decode in (("current", decode_current), ("legacy", decode_legacy)):
+            result = measure(decode, pieces, args.repeat)
+            print(
+                f"{name:<24} {label:<8} {result['chunks_per_sec']:>12,.0f} "
+                f"{result['peak_bytes_per_chunk']:>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Build or refresh the stored embeddings of template characters.
+
+Only characters whose text changed since their vector was stored (or that
+have none) are embedded, unless --rebuild is given.
+
+Usage (from backend/):
+    python -m scripts.build_character_embeddings [--rebuild]
+"""
+import argparse
+import asyncio
+
+from app.core.database import init_db
+from app.services.character_embeddings import build_character_embeddings
+
+
+async def main(rebuild: bool):
+    await init_db()
+    embedded = await build_character_embeddings(force=rebuild)
+    print(f"Embedded {embedded} characters")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="Re-embed every template character")
+    args = parser.parse_args()
+    asyncio.run(main(args.rebuild))
@@ -0,0 +1,169 @@
+import numpy as np
+import pytest
+
+from app.services.character_index import CharacterVectorIndex, IVFCharacterIndex, create_character_index
+from app.services.embedding_service import compute_weighted_score
+
+SIZE, DIM = 2000, 32
+
+
+def clustered_vectors(rng, size=SIZE, dim=DIM, topics=40):
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    return centers[rng.integers(0, topics, size)] + rng.standard_normal((size, dim)).astype(np.float32) * 0.3
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(rng)
+    ids = [f"c{i}" for i in range(SIZE)]
+    features = {
+        character_id: {
+            "usage_count": int(rng.integers(0, 300)),
+            "rating_avg": float(rng.uniform(0, 5)),
+            "rating_count": int(rng.integers(0, 30)),
+        }
+        for character_id in ids
+    }
+    queries = vectors[rng.integers(0, SIZE, 20)] + rng.standard_normal((20, DIM)).astype(np.float32) * 0.3
+    return ids, vectors, features, queries
+
+
+def with_features(index, features):
+    ids = list(features)
+    index.set_features(
+        ids,
+        [features[i]["usage_count"] for i in ids],
+        [features[i]["rating_avg"] for i in ids],
+        [features[i]["rating_count"] for i in ids],
+    )
+    return index
+
+
+def brute_force(vectors_by_id, features, query, k):
+    """Reference ranking: per-character cosine similarity and compute_weighted_score"""
+    query = query / np.linalg.norm(query)
+    scored = []
+    for character_id, vector in vectors_by_id.items():
+        similarity = float(vector @ query / np.linalg.norm(vector))
+        scored.append((compute_weighted_score(similarity, features[character_id]), character_id))
+    scored.sort(reverse=True)
+    return scored[:k]
+
+
+def assert_matches(result, expected, tolerance=1e-4):
+    assert [character_id for character_id, _, _ in result] == [character_id for _, character_id in expected]
+    np.testing.assert_allclose([score for _, score, _ in result], [score for score, _ in expected], atol=tolerance)
+
+
+def test_exact_top_k_matches_brute_force(data):
+    ids, vectors, features, queries = data
+    index = with_features(CharacterVectorIndex(ids, vectors), features)
+    by_id = dict(zip(ids, vectors))
+
+    for query in queries:
+        assert_matches(index.top_k(query, 10), brute_force(by_id, features, query, 10))
+
+
+def test_float16_scores_stay_close_to_brute_force(data):
+    ids, vectors, features, queries = data
+    index = with_features(CharacterVectorIndex(ids, vectors, dtype="float16"), features)
+    by_id = dict(zip(ids, vectors))
+
+    for query in queries:
+        expected = brute_force(by_id, features, query, 10)
+        np.testing.assert_allclose(
+            [score for _, score, _ in index.top_k(query, 10)], [score for score, _ in expected], atol=2e-3
+        )
+
+
+def test_ivf_probing_every_list_is_exact(data):
+    ids, vectors, features, queries = data
+    exact = with_features(CharacterVectorIndex(ids, vectors), features)
+    ivf = with_features(IVFCharacterIndex(ids, vectors, nlist=20, nprobe=20, min_size=0), features)
+
+    assert ivf.trained and len(ivf.centroids) == 20
+    for query in queries:
+        assert ivf.top_k(query, 10) == exact.top_k(query, 10)
+
+
+def test_ivf_recall_with_few_probes(data):
+    ids, vectors, features, queries = data
+    exact = with_features(CharacterVectorIndex(ids, vectors), features)
+    ivf = with_features(IVFCharacterIndex(ids, vectors, nlist=20, nprobe=4, min_size=0), features)
+
+    recalls = []
+    for query in queries:
+        truth = {character_id for character_id, _, _ in exact.top_k(query, 10)}
+        found = {character_id for character_id, _, _ in ivf.top_k(query, 10)}
+        recalls.append(len(truth & found) / len(truth))
+    assert np.mean(recalls) >= 0.9
+
+
+def test_ivf_scores_exactly_below_min_size(data):
+    ids, vectors, features, queries = data
+    ivf = IVFCharacterIndex(ids[:100], vectors[:100], nlist=10, nprobe=1, min_size=1000)
+
+    assert not ivf.trained
+    assert ivf.top_k(queries[0], 5) == CharacterVectorIndex(ids[:100], vectors[:100]).top_k(queries[0], 5)
+
+
+@pytest.mark.parametrize("make_index", [
+    lambda ids, vectors: CharacterVectorIndex(ids, vectors),
+    lambda ids, vectors: IVFCharacterIndex(ids, vectors, nlist=20, nprobe=20, min_size=0),
+])
+def test_remove_upsert_and_compact_match_brute_force(data, make_index):
+    ids, vectors, features, queries = data
+    index = make_index(ids, vectors)
+    by_id = dict(zip(ids, vectors))
+
+    # A few removals are tombstoned in place
+    removed = ids[:100]
+    assert index.remove(removed + ["missing"]) == 100
+    assert index.size == SIZE - 100 and len(index.matrix) == SIZE
+    # Past a quarter of the rows the arrays are compacted
+    removed += ids[100:600]
+    assert index.remove(ids[100:600]) == 500
+    assert len(index.matrix) == index.size == SIZE - 600
+    assert all(index.ids[position] == character_id for character_id, position in index.positions.items())
+
+    # Updated and new characters
+    rng = np.random.default_rng(1)
+    changed = {ids[700]: rng.standard_normal(DIM).astype(np.float32), "new": rng.standard_normal(DIM).astype(np.float32)}
+    index.upsert(list(changed), np.stack(list(changed.values())))
+    features = {**features, "new": {"usage_count": 0, "rating_avg": 0.0, "rating_count": 0}}
+    for character_id in removed:
+        del by_id[character_id]
+    by_id.update(changed)
+    with_features(index, {character_id: features[character_id] for character_id in by_id})
+
+    for query in list(queries) + list(changed.values()):
+        result = index.top_k(query, 10)
+        assert not {character_id for character_id, _, _ in result} & set(removed)
+        assert_matches(result, brute_force(by_id, features, query, 10))
+
+
+def test_characters_without_features_are_not_recommended(data):
+    ids, vectors, features, queries = data
+    index = with_features(CharacterVectorIndex(ids, vectors), {i: features[i] for i in ids[:5]})
+
+    assert {character_id for character_id, _, _ in index.top_k(queries[0], 10)} == set(ids[:5])
+
+
+def test_create_character_index_reuses_comparable_centroids(data, monkeypatch):
+    from app.core.config import settings
+
+    ids, vectors, _, _ = data
+    monkeypatch.setattr(settings, "CHARACTER_INDEX_IVF_MIN_SIZE", 0)
+    monkeypatch.setattr(settings, "CHARACTER_INDEX_IVF_NLIST", 20)
+    first = create_character_index(ids, vectors, backend="ivf", dtype="float32")
+    second = create_character_index(ids[:1500], vectors[:1500], previous=first, backend="ivf", dtype="float32")
+    small = create_character_index(ids[:500], vectors[:500], previous=first, backend="ivf", dtype="float32")
+
+    # Comparable size: the lists are kept; much smaller: retrained
+    assert np.array_equal(second.centroids, first.centroids)
+    assert second.trained_size == 1500
+    assert small.trained_size == 500 and not np.array_equal(small.centroids, first.centroids)
+    assert isinstance(create_character_index(ids, vectors, backend="exact", dtype="float32"), CharacterVectorIndex)
+    with pytest.raises(ValueError):
+        create_character_index(ids, vectors, backend="hnsw")
@@ -0,0 +1,30 @@
+import asyncio
+
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.core import database
+from app.models import Discussion, UserAPIKey
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(" ".join(str(statement).split()))
+
+
+def test_schema_upgrades_add_every_column_added_to_existing_tables():
+    conn = RecordingConnection()
+    asyncio.run(database.apply_schema_upgrades(conn))
+
+    assert conn.statements == [
+        "ALTER TABLE IF EXISTS discussions ADD COLUMN IF NOT EXISTS pacing VARCHAR(20) NOT NULL DEFAULT 'realtime'",
+        "ALTER TABLE IF EXISTS user_api_keys ADD COLUMN IF NOT EXISTS rpm_limit INTEGER",
+        "ALTER TABLE IF EXISTS user_api_keys ADD COLUMN IF NOT EXISTS tpm_limit INTEGER",
+        "ALTER TABLE IF EXISTS user_api_keys ADD COLUMN IF NOT EXISTS task_models JSONB",
+    ]
+    # Matches the models
+    assert Discussion.__table__.c.pacing.server_default.arg == "realtime"
+    assert UserAPIKey.__table__.c.rpm_limit.nullable and UserAPIKey.__table__.c.tpm_limit.nullable
+    assert isinstance(UserAPIKey.__table__.c.task_models.type, JSONB)
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.services.discussion_control import DiscussionRunControl
+from app.services.discussion_engine import DiscussionEngineService
+
+
+class FakeCache:
+    def __init__(self):
+        self.redis = None
+        self.values = {}
+
+    async def set(self, key, value, ttl=None):
+        self.values[key] = (value, ttl)
+
+
+class FakeBroker:
+    def __init__(self):
+        self.events = []
+
+    async def publish(self, discussion_id, event_type, data):
+        self.events.append((event_type, data))
+
+
+def engine_with_fakes():
+    cache = FakeCache()
+    engine = DiscussionEngineService(None, None, cache)
+    engine.event_broker = FakeBroker()
+    return engine, cache
+
+
+def discussion(status="running"):
+    return SimpleNamespace(
+        id=uuid4(), status=status, current_round=1, max_rounds=3, current_phase="debate"
+    )
+
+
+def test_loop_state_carries_a_pause_its_row_has_not_seen():
+    engine, cache = engine_with_fakes()
+    row = discussion()
+    engine.control = DiscussionRunControl(row.id)
+    engine.control.apply_status("paused")
+
+    asyncio.run(engine._cache_discussion_state(row))
+
+    state, ttl = cache.values[f"discussion_state:{row.id}"]
+    assert state["status"] == "paused" and ttl == 86400
+    assert engine.event_broker.events[0][1]["status"] == "paused"
+    # The row itself is not changed (a later commit must not write the status back)
+    assert row.status == "running"
+
+
+def test_status_set_by_the_loop_wins_over_its_control():
+    engine, cache = engine_with_fakes()
+    row = discussion(status="completed")
+    engine.control = DiscussionRunControl(row.id)
+
+    asyncio.run(engine._cache_discussion_state(row))
+
+    assert cache.values[f"discussion_state:{row.id}"][0]["status"] == "completed"
+
+
+def test_state_outside_a_loop_uses_the_row():
+    engine, cache = engine_with_fakes()
+    row = discussion()
+
+    asyncio.run(engine._cache_discussion_state(row))
+
+    assert cache.values[f"discussion_state:{row.id}"] == (engine.build_discussion_state(row), 3600)
@@ -0,0 +1,139 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+import app.core.redis as core_redis
+import app.services.api_key_service as api_key_service
+import app.services.discussion_engine as discussion_engine
+from app.services.discussion_scheduler import DiscussionScheduler, LeaseLostError
+
+
+class FakeRedis:
+    """The subset of redis.asyncio used by the scheduler, with its Lua scripts emulated"""
+
+    def __init__(self):
+        self.strings = {}
+        self.hashes = {}
+        self.zsets = {}
+
+    def register_script(self, script):
+        async def run(keys, args):
+            if "PEXPIRE" in script:
+                return int(self.strings.get(keys[0]) == args[0])
+            if "'DEL', KEYS[1]" in script:
+                if self.strings.get(keys[0]) == args[0]:
+                    del self.strings[keys[0]]
+                    return 1
+                return 0
+            # Finish: drop the job if its token still matches
+            if self.hashes.get(keys[1], {}).get("token") == args[1]:
+                self.zsets.get(keys[0], {}).pop(args[0], None)
+                self.hashes.pop(keys[1], None)
+                return 1
+            return 0
+        return run
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def zadd(self, key, mapping, xx=False):
+        zset = self.zsets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not xx or member in zset:
+                zset[member] = score
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeOrchestrator:
+    async def close_all(self):
+        pass
+
+
+class FakeAPIKeyService:
+    def __init__(self, db):
+        pass
+
+    async def build_orchestrator(self, user_id):
+        return FakeOrchestrator()
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    async def get_cache_service():
+        return None
+
+    monkeypatch.setattr(api_key_service, "APIKeyService", FakeAPIKeyService)
+    monkeypatch.setattr(core_redis, "get_cache_service", get_cache_service)
+    return DiscussionScheduler(FakeRedis(), FakeSession, lease_ttl=30, concurrency=1)
+
+
+def run_job(scheduler, monkeypatch, run_loop):
+    """Run one claimed job whose engine loop is run_loop(on_phase_complete)"""
+    class FakeEngine:
+        def __init__(self, *args, **kwargs):
+            self.lease = kwargs.get("lease")
+
+        async def _run_discussion_loop(self, discussion_id, provider_name, on_phase_complete=None):
+            await run_loop(on_phase_complete)
+
+    monkeypatch.setattr(discussion_engine, "DiscussionEngineService", FakeEngine)
+    redis = scheduler.redis
+    discussion_id = uuid4()
+    job_key = scheduler._job_key(discussion_id)
+    redis.hashes[job_key] = {"user_id": str(uuid4()), "provider_name": "openai", "token": "t1"}
+    redis.zsets[scheduler.QUEUE_KEY] = {str(discussion_id): 0.0}
+    redis.strings[scheduler._lease_key(discussion_id)] = scheduler.worker_id
+    asyncio.run(scheduler._run_job(discussion_id))
+    return discussion_id, job_key
+
+
+def take_over(redis):
+    """Another worker claims the discussion (its job keeps the same token)"""
+    for key in list(redis.strings):
+        redis.strings[key] = "other-worker"
+
+
+def test_job_taken_over_at_a_checkpoint_is_left_to_the_new_owner(scheduler, monkeypatch):
+    async def loop(on_phase_complete):
+        take_over(scheduler.redis)
+        if not await on_phase_complete():
+            raise LeaseLostError("lost at checkpoint")
+
+    discussion_id, job_key = run_job(scheduler, monkeypatch, loop)
+
+    assert scheduler.redis.hashes[job_key]["token"] == "t1"
+    assert str(discussion_id) in scheduler.redis.zsets[scheduler.QUEUE_KEY]
+    assert scheduler.redis.strings[scheduler._lease_key(discussion_id)] == "other-worker"
+
+
+def test_job_is_kept_even_if_the_loop_returns_after_losing_its_lease(scheduler, monkeypatch):
+    async def loop(on_phase_complete):
+        take_over(scheduler.redis)
+        await on_phase_complete()
+
+    discussion_id, job_key = run_job(scheduler, monkeypatch, loop)
+
+    assert job_key in scheduler.redis.hashes
+    assert str(discussion_id) in scheduler.redis.zsets[scheduler.QUEUE_KEY]
+
+
+def test_finished_job_is_removed(scheduler, monkeypatch):
+    async def loop(on_phase_complete):
+        assert await on_phase_complete()
+
+    discussion_id, job_key = run_job(scheduler, monkeypatch, loop)
+
+    assert job_key not in scheduler.redis.hashes
+    assert str(discussion_id) not in scheduler.redis.zsets[scheduler.QUEUE_KEY]
+    assert not scheduler.redis.strings
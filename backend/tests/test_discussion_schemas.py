@@ -0,0 +1,23 @@
+from typing import get_args
+from uuid import uuid4
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.discussion import DiscussionCreate
+from app.services.discussion_pacing import PacingMode
+
+
+def create(**fields):
+    return DiscussionCreate(topic_id=uuid4(), character_ids=[uuid4() for _ in range(3)], **fields)
+
+
+def test_pacing_accepts_every_pacing_mode():
+    assert set(get_args(get_args(DiscussionCreate.model_fields["pacing"].annotation)[0])) == set(PacingMode.ALL)
+    assert create(pacing="batch").pacing == "batch"
+    assert create().pacing is None
+
+
+def test_unknown_pacing_is_rejected():
+    with pytest.raises(ValidationError):
+        create(pacing="turbo")
@@ -0,0 +1,117 @@
+import asyncio
+
+import httpx
+import numpy as np
+
+from app.services.embedding_service import EmbeddingService
+
+
+class FakeProvider:
+    """Stands in for _post_embeddings: records requests, rejects some inputs"""
+
+    def __init__(self, limit: int = None, bad=(), delay: float = 0.0):
+        self.limit = limit
+        self.bad = set(bad)
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, texts):
+        self.requests.append(list(texts))
+        await asyncio.sleep(self.delay)
+        if (self.limit and len(texts) > self.limit) or self.bad & set(texts):
+            request = httpx.Request("POST", "http://test/embeddings")
+            response = httpx.Response(400, request=request, json={"error": "bad request"})
+            raise httpx.HTTPStatusError("400 Bad Request", request=request, response=response)
+        return [np.array([float(len(text)), 1.0], dtype=np.float32) for text in texts]
+
+
+def make_service(provider: FakeProvider, batch_size: int = 10, max_batch_size: int = 64) -> EmbeddingService:
+    service = EmbeddingService("key", "http://test", "model", batch_size=batch_size, max_batch_size=max_batch_size)
+    service._post_embeddings = provider
+    return service
+
+
+def embed(service: EmbeddingService, texts):
+    return service._embed_texts(texts, [service._cache_key(text) for text in texts])
+
+
+def test_identical_texts_are_sent_once():
+    provider = FakeProvider()
+    service = make_service(provider)
+    texts = ["a", "bb", "a", "ccc", "bb"]
+
+    result = asyncio.run(embed(service, texts))
+
+    assert sorted(text for request in provider.requests for text in request) == ["a", "bb", "ccc"]
+    assert [embedding[0] for embedding in result] == [1.0, 2.0, 1.0, 3.0, 2.0]
+
+
+def test_concurrent_calls_share_one_request():
+    provider = FakeProvider(delay=0.01)
+    service = make_service(provider)
+
+    async def run():
+        return await asyncio.gather(*(embed(service, ["same topic"]) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert provider.requests == [["same topic"]]
+    assert all(result[0][0] == 10.0 for result in results)
+    assert service._inflight == {}
+
+
+def test_cancelled_waiter_does_not_cancel_shared_request():
+    provider = FakeProvider(delay=0.02)
+    service = make_service(provider)
+
+    async def run():
+        owner = asyncio.create_task(embed(service, ["topic"]))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(embed(service, ["topic"]))
+        await asyncio.sleep(0.005)
+        waiter.cancel()
+        return await owner
+
+    assert asyncio.run(run())[0][0] == 5.0
+    assert len(provider.requests) == 1
+
+
+def test_batch_size_grows_and_learns_provider_limit():
+    provider = FakeProvider(limit=10)
+    service = make_service(provider, batch_size=10, max_batch_size=64)
+    texts = [f"text {i}" for i in range(40)]
+
+    asyncio.run(embed(service, texts[:20]))
+    assert service.batch_size == 20
+
+    result = asyncio.run(embed(service, texts[20:]))
+    assert all(embedding is not None for embedding in result)
+    assert (service.batch_size, service.max_batch_size) == (10, 10)
+
+
+def test_bad_input_does_not_shrink_batch_size():
+    provider = FakeProvider(bad={"bad"})
+    service = make_service(provider, batch_size=10, max_batch_size=64)
+
+    result = asyncio.run(embed(service, [f"good {i}" for i in range(9)] + ["bad"]))
+
+    assert result[-1] is None
+    assert all(embedding is not None for embedding in result[:-1])
+    assert service.max_batch_size == 64
+    assert service.batch_size == 10
+
+    for round_ in range(3):
+        asyncio.run(embed(service, [f"clean {round_} {i}" for i in range(40)]))
+    assert service.batch_size > 10
+
+
+def test_learned_limit_expires():
+    provider = FakeProvider(limit=10)
+    service = make_service(provider, batch_size=20, max_batch_size=64)
+
+    asyncio.run(embed(service, [f"text {i}" for i in range(20)]))
+    assert service.max_batch_size == 10
+
+    service._batch_limit_expires = 0.0
+    asyncio.run(embed(service, [f"more {i}" for i in range(10)]))
+    assert service.max_batch_size == 64
@@ -0,0 +1,47 @@
+import asyncio
+
+from app.core.redis import DiscussionEventBus
+
+
+class FakePubSub:
+    def __init__(self, bus, messages):
+        self.bus = bus
+        self.messages = list(messages)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        if not self.messages:
+            # Nothing left to deliver: let the listener loop end
+            self.bus._handlers.clear()
+            return None
+        return self.messages.pop(0)
+
+
+class FakeRedis:
+    def register_script(self, script):
+        return None
+
+
+def message(channel, data):
+    return {"type": "message", "channel": channel, "data": data}
+
+
+def test_listener_survives_malformed_events_and_failing_handlers():
+    bus = DiscussionEventBus(FakeRedis())
+    channel = bus._channel("d1")
+    received = []
+
+    def failing(event):
+        raise RuntimeError("handler bug")
+
+    bus._handlers[channel] = {failing, received.append}
+    bus._pubsub = FakePubSub(bus, [
+        message(channel, "no separators"),
+        message(channel, "1-0\ntoken\n{not json"),
+        message(channel, '1-1\ntoken\n{"delta": "a"}'),
+        message(channel, '1-2\ntoken\n{"delta": "b"}'),
+    ])
+
+    asyncio.run(bus._listen())
+
+    assert [event["id"] for event in received] == ["1-1", "1-2"]
+    assert received[0] == {"id": "1-1", "type": "token", "data": {"delta": "a"}}
@@ -0,0 +1,162 @@
+import asyncio
+
+from app.services.llm_orchestrator import LLMOrchestrator
+from app.services.llm_response_cache import LLMResponseCache
+from app.services.llm_resilience import ResiliencePolicy
+from app.services.llm_scheduler import LLMScheduler
+from app.services.llm_stream import StreamChunk
+
+
+class ThrottledLimiter:
+    """Rate limiter whose key is out of budget for a while"""
+
+    def __init__(self, wait):
+        self.wait = wait
+        self.acquired = []
+        self.settled = []
+
+    async def acquire(self, limit_key, tokens, rpm=None, tpm=None):
+        self.acquired.append(tokens)
+        await asyncio.sleep(self.wait)
+
+    async def settle(self, limit_key, reserved, used):
+        self.settled.append((reserved, used))
+
+
+class FakeProvider:
+    limit_key = "fake:key"
+    rpm_limit = None
+    tpm_limit = None
+
+    def __init__(self, first_token_delay=0.0):
+        self.first_token_delay = first_token_delay
+        self.requests = 0
+
+    async def generate_stream(self, prompt, **kwargs):
+        self.requests += 1
+        await asyncio.sleep(self.first_token_delay)
+        yield StreamChunk(content="hello")
+
+
+def open_stream(limiter, provider, policy):
+    orchestrator = LLMOrchestrator(
+        rate_limiter=limiter, resilience=policy, scheduler=LLMScheduler(slots_per_key=4), router=object()
+    )
+
+    async def run():
+        stream, first = await orchestrator._open_stream(provider, "prompt", {"max_tokens": 10})
+        await stream.aclose()
+        return first
+
+    return asyncio.run(run())
+
+
+def test_rate_limit_wait_is_not_a_late_first_token():
+    limiter = ThrottledLimiter(wait=0.2)
+    provider = FakeProvider()
+    policy = ResiliencePolicy(first_token_timeout=0.1, hedge_after=0.05)
+
+    first = open_stream(limiter, provider, policy)
+
+    assert first.content == "hello"
+    assert provider.requests == 1
+    assert len(limiter.acquired) == 1
+    assert limiter.settled[0][0] == limiter.acquired[0]
+
+
+def test_hedged_request_is_charged_without_waiting_for_budgets():
+    limiter = ThrottledLimiter(wait=0.0)
+    provider = FakeProvider(first_token_delay=0.2)
+    policy = ResiliencePolicy(first_token_timeout=0, hedge_after=0.05)
+
+    open_stream(limiter, provider, policy)
+
+    assert provider.requests == 2
+    assert len(limiter.acquired) == 1
+    # One stream settles the reservation, the other is charged what it used
+    assert sorted(reserved for reserved, _ in limiter.settled) == [0, limiter.acquired[0]]
+    assert all(used > 0 for _, used in limiter.settled)
+
+
+class FakeResponseCache:
+    """In-memory stand-in for LLMResponseCache (same keys, no single-flight)"""
+
+    KEY_PREFIX = LLMResponseCache.KEY_PREFIX
+
+    def __init__(self):
+        self.entries = {}
+
+    def make_key(self, *args):
+        return LLMResponseCache.make_key(self, *args)
+
+    async def get_or_compute(self, key, compute):
+        if key in self.entries:
+            return {**self.entries[key], "tokens": 0, "usage": None, "cached": True}
+        self.entries[key] = await compute()
+        return self.entries[key]
+
+
+class FakeRouter:
+    def rank(self, limit_keys, sticky_key=None):
+        return list(limit_keys)
+
+    def record_success(self, limit_key, ttft=None):
+        pass
+
+    def record_failure(self, limit_key):
+        pass
+
+    def pin(self, sticky_key, limit_key):
+        pass
+
+
+class FakeCompletionProvider:
+    provider_type = "openai"
+    task_models = {}
+    key_id = None
+    rpm_limit = None
+    tpm_limit = None
+
+    def __init__(self, name):
+        self.limit_key = f"cache-test:{name}"
+        self.model = f"model-{name}"
+        self.failing = False
+        self.calls = 0
+
+    async def generate(self, prompt, **kwargs):
+        self.calls += 1
+        if self.failing:
+            raise ValueError("provider down")
+        return {"content": f"from {self.model}"}
+
+
+def test_response_cache_is_keyed_by_the_provider_that_served_the_call(monkeypatch):
+    import app.services.llm_response_cache as llm_response_cache
+    from app.core.config import settings
+
+    cache = FakeResponseCache()
+
+    async def get_llm_response_cache():
+        return cache
+
+    monkeypatch.setattr(llm_response_cache, "get_llm_response_cache", get_llm_response_cache)
+    monkeypatch.setattr(settings, "LLM_RESPONSE_CACHE_ENABLED", True)
+    orchestrator = LLMOrchestrator(
+        rate_limiter=ThrottledLimiter(wait=0), resilience=ResiliencePolicy(), router=FakeRouter(),
+        scheduler=LLMScheduler(slots_per_key=4)
+    )
+    first, second = FakeCompletionProvider("a"), FakeCompletionProvider("b")
+    orchestrator._providers = {"a": first, "b": second}
+
+    async def generate():
+        return await orchestrator.generate("auto", "prompt", task_class="round_summary", temperature=0)
+
+    # The preferred provider fails over to the second one
+    first.failing = True
+    assert asyncio.run(generate())["content"] == "from model-b"
+    # Once it is back, it must not be served the other model's cached answer
+    first.failing = False
+    result = asyncio.run(generate())
+    assert result["content"] == "from model-a" and not result.get("cached")
+    assert asyncio.run(generate())["cached"]
+    assert (first.calls, second.calls) == (2, 1)
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_resilience import LLMTimeoutError, ResiliencePolicy
+
+
+async def token_stream(delays, closed):
+    try:
+        for i, delay in enumerate(delays):
+            await asyncio.sleep(delay)
+            yield f"token-{i}"
+    finally:
+        closed.append(True)
+
+
+def collect(policy, delays, consume_delay=0.0):
+    closed = []
+
+    async def run():
+        chunks = []
+        async for chunk in policy.iter_stream(token_stream(delays, closed)):
+            chunks.append(chunk)
+            await asyncio.sleep(consume_delay)
+        return chunks
+
+    return asyncio.run(run()), closed
+
+
+def test_iter_stream_yields_every_chunk():
+    chunks, closed = collect(ResiliencePolicy(inter_token_timeout=0.5), [0, 0.01, 0.01])
+
+    assert chunks == ["token-0", "token-1", "token-2"]
+    assert closed == [True]
+
+
+def test_iter_stream_times_out_between_tokens():
+    closed = []
+    policy = ResiliencePolicy(inter_token_timeout=0.05)
+
+    async def run():
+        chunks = []
+        with pytest.raises(LLMTimeoutError):
+            async for chunk in policy.iter_stream(token_stream([0, 0.01, 1.0], closed)):
+                chunks.append(chunk)
+        return chunks
+
+    assert asyncio.run(run()) == ["token-0", "token-1"]
+    assert closed == [True]
+
+
+def test_iter_stream_does_not_count_time_spent_by_the_consumer():
+    chunks, _ = collect(ResiliencePolicy(inter_token_timeout=0.05), [0, 0.01, 0.01], consume_delay=0.1)
+
+    assert chunks == ["token-0", "token-1", "token-2"]
+
+
+def test_iter_stream_without_timeout():
+    chunks, _ = collect(ResiliencePolicy(inter_token_timeout=0), [0, 0.02])
+
+    assert chunks == ["token-0", "token-1"]
+
+
+def hedged_open(policy, acquire_results):
+    """Open a stream whose first request is slow; returns (stream starts, slot calls, first chunk)"""
+    starts = []
+    slot_calls = []
+
+    async def slow_then_fast(index):
+        await asyncio.sleep(0.2 if index == 0 else 0.01)
+        yield f"first-{index}"
+
+    def start():
+        starts.append(len(starts))
+        return slow_then_fast(starts[-1])
+
+    def acquire():
+        slot_calls.append("acquire")
+        return acquire_results.pop(0)
+
+    async def run():
+        stream, first = await policy.open_stream(
+            start, acquire_hedge=acquire, release_hedge=lambda: slot_calls.append("release")
+        )
+        await stream.aclose()
+        return first
+
+    first = asyncio.run(run())
+    return starts, slot_calls, first
+
+
+def test_hedged_request_takes_and_returns_a_slot():
+    policy = ResiliencePolicy(first_token_timeout=0, hedge_after=0.02)
+    starts, slot_calls, first = hedged_open(policy, [True])
+
+    assert starts == [0, 1]
+    assert first == "first-1"
+    assert slot_calls == ["acquire", "release"]
+
+
+def test_hedge_is_skipped_without_a_free_slot():
+    policy = ResiliencePolicy(first_token_timeout=0, hedge_after=0.02)
+    starts, slot_calls, first = hedged_open(policy, [False])
+
+    assert starts == [0]
+    assert first == "first-0"
+    assert slot_calls == ["acquire"]
+
+
+def test_scheduler_try_acquire_only_takes_free_slots():
+    from app.services.llm_scheduler import LLMScheduler
+
+    scheduler = LLMScheduler(slots_per_key=2, aging_seconds=1.0)
+
+    async def run():
+        await scheduler.acquire("key")
+        assert scheduler.try_acquire("key")
+        assert not scheduler.try_acquire("key")
+        scheduler.release("key")
+        assert scheduler.try_acquire("key")
+
+    asyncio.run(run())
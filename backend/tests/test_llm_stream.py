@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_stream import SSEDecoder, aiter_sse
+
+OPENAI_STREAM = (
+    ': keep-alive\n\n'
+    'data: {"choices": [{"delta": {"content": "你好"}}]}\n\n'
+    'event: update\n'
+    'id: 42\n'
+    'data: first line\n'
+    'data: second line\n\n'
+    'data: [DONE]\n\n'
+).encode("utf-8")
+
+
+def decode(chunks):
+    decoder = SSEDecoder()
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    events.extend(decoder.flush())
+    return [(event.event, event.data, event.id) for event in events]
+
+
+EXPECTED = [
+    ("message", '{"choices": [{"delta": {"content": "你好"}}]}', ""),
+    ("update", "first line\nsecond line", "42"),
+    ("message", "[DONE]", "42"),
+]
+
+
+def test_decodes_events_fields_and_comments():
+    assert decode([OPENAI_STREAM]) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_events_do_not_depend_on_chunk_boundaries(size):
+    # Splits land inside fields, line endings and multi-byte characters
+    chunks = [OPENAI_STREAM[i:i + size] for i in range(0, len(OPENAI_STREAM), size)]
+    assert decode(chunks) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_crlf_and_cr_line_endings(size):
+    stream = OPENAI_STREAM.replace(b"\n", b"\r\n")
+    chunks = [stream[i:i + size] for i in range(0, len(stream), size)]
+    assert decode(chunks) == EXPECTED
+    assert decode([OPENAI_STREAM.replace(b"\n", b"\r")]) == EXPECTED
+
+
+def test_flush_dispatches_an_unterminated_event():
+    assert decode([b"data: partial"]) == [("message", "partial", "")]
+    assert decode([b"data: a\ndata: b\n"]) == [("message", "a\nb", "")]
+
+
+def test_events_without_data_are_not_dispatched():
+    assert decode([b"event: ping\n\nid: 7\n\n: comment\n\n"]) == []
+
+
+def test_field_parsing_edge_cases():
+    decoder = SSEDecoder()
+    events = decoder.feed(b"data\ndata:no-space\ndata:  two spaces\nretry: 1500\nunknown: x\n\n")
+    assert [event.data for event in events] == ["\nno-space\n two spaces"]
+    assert events[0].retry == 1500
+    assert decoder.feed(b'data: {"a": [1, 2]}\n\n')[0].json() == {"a": [1, 2]}
+
+
+def test_aiter_sse_decodes_a_byte_stream():
+    async def byte_stream():
+        for i in range(0, len(OPENAI_STREAM), 5):
+            yield OPENAI_STREAM[i:i + 5]
+
+    async def run():
+        return [(event.event, event.data, event.id) async for event in aiter_sse(byte_stream())]
+
+    assert asyncio.run(run()) == EXPECTED
@@ -0,0 +1,204 @@
+import asyncio
+import json
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Insert, Select
+
+import pytest
+
+from app.services.discussion_scheduler import DiscussionLease, LeaseLostError
+from app.services.message_drafts import MessageDraftStore
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.ops]
+
+
+class FakeRedis:
+    """The subset of redis.asyncio used by the draft store (decode_responses=True)"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.strings = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hdel(self, key, field):
+        return self.hashes.get(key, {}).pop(field, None) is not None
+
+    async def append(self, key, value):
+        self.strings[key] = self.strings.get(key, "") + value
+
+    async def mget(self, keys):
+        return [self.strings.get(key) for key in keys]
+
+    async def delete(self, key):
+        return self.strings.pop(key, None) is not None
+
+    async def expire(self, key, ttl):
+        return True
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    def register_script(self, script):
+        """Emulates the draft store's fenced scripts: write only while KEYS[1] == ARGV[1]"""
+        async def run(keys, args):
+            if self.strings.get(keys[0]) != args[0]:
+                return 0
+            if "HSET" in script:
+                await self.hset(keys[1], args[1], args[2])
+            else:
+                await self.append(keys[1], args[1])
+            return 1
+        return run
+
+
+class FakeResult:
+    def __init__(self, ids=(), rowcount=-1):
+        self.ids = list(ids)
+        self.rowcount = rowcount
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.ids
+
+
+class FakeSession:
+    """Answers the id lookup with existing message ids and records inserts"""
+
+    def __init__(self, existing_ids):
+        self.existing_ids = set(existing_ids)
+        self.inserted = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        if isinstance(statement, Select):
+            wanted = statement.compile(dialect=postgresql.dialect()).params["id_1"]
+            return FakeResult([i for i in wanted if i in self.existing_ids])
+        assert isinstance(statement, Insert)
+        params = statement.compile(dialect=postgresql.dialect()).params
+        rows = []
+        while f"id_m{len(rows)}" in params:
+            suffix = f"_m{len(rows)}"
+            rows.append({key[:-len(suffix)]: value for key, value in params.items() if key.endswith(suffix)})
+        new = [row for row in rows if row["id"] not in self.existing_ids]
+        self.inserted.extend(new)
+        return FakeResult(rowcount=len(new))
+
+    async def commit(self):
+        self.commits += 1
+
+
+async def open_draft(store, discussion_id, content):
+    draft = await store.open(discussion_id, uuid4(), participant_id=uuid4(), round=0, phase="opening")
+    if content:
+        await draft.append(content)
+        await draft.flush()
+    return draft
+
+
+def test_recover_skips_messages_that_were_already_saved():
+    redis = FakeRedis()
+    store = MessageDraftStore(redis, flush_interval=0, ttl=60)
+    discussion_id = uuid4()
+
+    async def run():
+        saved = await open_draft(store, discussion_id, "already saved")
+        orphaned = await open_draft(store, discussion_id, "partial content")
+        await open_draft(store, discussion_id, "")
+        db = FakeSession(existing_ids={saved.message_id})
+        recovered = await store.recover(db, discussion_id)
+        return saved, orphaned, db, recovered
+
+    saved, orphaned, db, recovered = asyncio.run(run())
+
+    assert recovered == 1
+    assert [row["id"] for row in db.inserted] == [orphaned.message_id]
+    assert db.inserted[0]["content"] == "partial content"
+    assert db.inserted[0]["meta_data"] == {"partial": True}
+    assert db.commits == 1
+    # Every draft is discarded, including the one whose message existed
+    assert asyncio.run(store.get_drafts(discussion_id)) == []
+
+
+def test_recover_without_drafts_does_not_touch_the_database():
+    store = MessageDraftStore(FakeRedis(), flush_interval=0, ttl=60)
+    db = FakeSession(existing_ids=())
+
+    assert asyncio.run(store.recover(db, uuid4())) == 0
+    assert db.commits == 0
+
+
+def test_draft_metadata_is_json():
+    redis = FakeRedis()
+    store = MessageDraftStore(redis, flush_interval=0, ttl=60)
+    discussion_id = uuid4()
+    draft = asyncio.run(open_draft(store, discussion_id, "x"))
+
+    meta = json.loads(redis.hashes[f"message_drafts:{discussion_id}"][str(draft.message_id)])
+    assert meta["round"] == 0 and meta["phase"] == "opening"
+
+
+def test_fenced_store_stops_writing_once_the_lease_is_lost():
+    redis = FakeRedis()
+    redis.strings["discussion_lease:1"] = "worker-a"
+    lease = DiscussionLease(redis, "discussion_lease:1", "worker-a")
+    store = MessageDraftStore(redis, flush_interval=0, ttl=60, lease=lease)
+    discussion_id = uuid4()
+
+    draft = asyncio.run(open_draft(store, discussion_id, "before"))
+    # Another worker takes the discussion over
+    redis.strings["discussion_lease:1"] = "worker-b"
+
+    with pytest.raises(LeaseLostError):
+        asyncio.run(draft.append(" after"))
+    assert lease.lost
+    assert redis.strings[f"message_draft:{draft.message_id}"] == "before"
+    with pytest.raises(LeaseLostError):
+        asyncio.run(store.recover(FakeSession(existing_ids=()), discussion_id))
+
+
+def test_content_of_a_failed_flush_is_flushed_again():
+    redis = FakeRedis()
+    store = MessageDraftStore(redis, flush_interval=0, ttl=60)
+    failing = [True]
+    append = redis.append
+
+    async def flaky_append(key, value):
+        if failing.pop(0) if failing else False:
+            raise ConnectionError("redis down")
+        await append(key, value)
+
+    redis.append = flaky_append
+
+    async def run():
+        draft = await store.open(uuid4(), uuid4(), participant_id=uuid4(), round=0, phase="opening")
+        await draft.append("lost? ")
+        await draft.append("no")
+        return draft
+
+    draft = asyncio.run(run())
+
+    assert redis.strings[f"message_draft:{draft.message_id}"] == "lost? no"
+    assert draft.flush_count == 1
@@ -0,0 +1,25 @@
+import asyncio
+from uuid import uuid4
+
+from app.services.round_summaries import RoundSummaryService
+
+
+class FakeOrchestrator:
+    def __init__(self, content):
+        self.content = content
+
+    async def generate(self, provider_name, prompt, **kwargs):
+        return {"content": self.content}
+
+
+def generate_summary(content):
+    service = RoundSummaryService(FakeOrchestrator(content), session_factory=None)
+    return asyncio.run(service._generate_summary("Alice: hi", 0, "openai", uuid4()))
+
+
+def test_empty_summary_is_not_returned_as_a_summary():
+    assert generate_summary("   ") is None
+
+
+def test_summary_is_stripped():
+    assert generate_summary("  Alice said hi.\n") == "Alice said hi."